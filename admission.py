@@ -0,0 +1,206 @@
+# admission.py
+"""
+Admission control for the expensive routes (POST /questions/post and
+/questions/accept by default), so an overload sheds requests quickly instead of
+queueing them until everything times out.
+
+    app.add_middleware(AdmissionMiddleware)
+
+At most `limit` expensive requests run at once. Up to ADMISSION_QUEUE more wait
+(FIFO, at most ADMISSION_QUEUE_TIMEOUT seconds) for a slot. Anything beyond
+that gets an immediate 503 with a Retry-After estimated from the queue length
+and the mean service time. Other routes are never held: a GET /questions/{id}
+does not wait behind queued matches for the threadpool or the CPU.
+
+The limit adapts to the observed service time of the admitted requests (a
+gradient limiter). After every window of completions:
+
+    gradient  = clamp(target / window mean, 0.5, 1)
+    new limit = limit * gradient + sqrt(limit)       (growth only if the limit was reached)
+    limit     = 0.8 * limit + 0.2 * new limit, within [ADMISSION_MIN_LIMIT, ADMISSION_MAX_LIMIT]
+
+target is ADMISSION_TARGET_MS, or by default ADMISSION_TOLERANCE times the
+lowest window mean seen, which is the latency without contention. When
+concurrency only adds waiting for the CPU (the ML stages are CPU-bound), the
+mean grows past the target and the limit shrinks back.
+
+State is per process (each serve.py worker has its own controller) and shows
+up on GET /metrics: counters admission.*, gauges admission.limit / in_flight /
+queued / target_ms.
+"""
+import os
+import math
+import time
+import asyncio
+import collections
+
+import metrics
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_ROUTES = os.environ.get("ADMISSION_ROUTES", "POST /questions/post,POST /questions/accept")
+ADMISSION_INITIAL_LIMIT = float(os.environ.get("ADMISSION_INITIAL_LIMIT", "4"))
+ADMISSION_MIN_LIMIT = float(os.environ.get("ADMISSION_MIN_LIMIT", "1"))
+ADMISSION_MAX_LIMIT = float(os.environ.get("ADMISSION_MAX_LIMIT", "32"))
+ADMISSION_QUEUE = int(os.environ.get("ADMISSION_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_TARGET_MS = float(os.environ.get("ADMISSION_TARGET_MS", "0"))   # 0 = tolerance * best window
+ADMISSION_TOLERANCE = float(os.environ.get("ADMISSION_TOLERANCE", "2"))
+WINDOW_MIN_SAMPLES = 10
+WINDOW_SECONDS = 1.0
+SMOOTHING = 0.2
+
+_BUSY_BODY = b'{"detail":"Server busy, retry later"}'
+
+
+def parse_routes(spec: str):
+    """'POST /a,GET /b' -> {("POST", "/a"), ("GET", "/b")}"""
+    out = set()
+    for item in spec.split(","):
+        method, _, path = item.strip().partition(" ")
+        if path:
+            out.add((method.upper(), path.strip()))
+    return out
+
+
+class AdmissionController:
+    """Adaptive concurrency limit + bounded FIFO wait queue. Used from the event loop only."""
+
+    def __init__(self, limit=ADMISSION_INITIAL_LIMIT, min_limit=ADMISSION_MIN_LIMIT, max_limit=ADMISSION_MAX_LIMIT,
+                 queue_size=ADMISSION_QUEUE, queue_timeout=ADMISSION_QUEUE_TIMEOUT, target_ms=ADMISSION_TARGET_MS,
+                 tolerance=ADMISSION_TOLERANCE):
+        self.limit = float(limit)
+        self.min_limit, self.max_limit = float(min_limit), float(max_limit)
+        self.queue_size, self.queue_timeout = queue_size, queue_timeout
+        self.target_ms, self.tolerance = target_ms, tolerance
+        self.in_flight = 0
+        self.waiters = collections.deque()
+        self.best_ms = None           # lowest window mean seen
+        self.mean_ms = 0.0            # latest window mean, for Retry-After
+        self._window = []
+        self._window_start = time.monotonic()
+        self._saturated = False       # the limit was reached during this window
+        self._publish()
+
+    def _capacity(self):
+        return max(1, int(self.limit))
+
+    def _publish(self):
+        metrics.set_gauge("admission.limit", round(self.limit, 2))
+        metrics.set_gauge("admission.in_flight", self.in_flight)
+        metrics.set_gauge("admission.queued", len(self.waiters))
+        metrics.set_gauge("admission.target_ms", round(self.target(), 1))
+
+    def target(self) -> float:
+        if self.target_ms:
+            return self.target_ms
+        return self.best_ms * self.tolerance if self.best_ms else 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained."""
+        per_slot = (self.mean_ms or self.target() or 1000.0) / 1000.0
+        return max(1, math.ceil(per_slot * (len(self.waiters) + 1) / self._capacity()))
+
+    async def acquire(self) -> bool:
+        """Wait for a slot -> False if the request must be shed (queue full or waited too long)."""
+        if self.in_flight < self._capacity() and not self.waiters:
+            self.in_flight += 1
+            self._saturated |= self.in_flight >= self._capacity()
+            self._publish()
+            return True
+        if len(self.waiters) >= self.queue_size:
+            metrics.incr("admission.rejected")
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.append(fut)
+        self._publish()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                pass   # handed a slot just as the wait ran out: take it
+            else:
+                fut.cancel()
+                self._remove(fut)
+                metrics.incr("admission.timed_out")
+                return False
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(None)   # pass the slot on
+            else:
+                fut.cancel()
+                self._remove(fut)
+            raise
+        metrics.observe("admission.wait_ms", (time.perf_counter() - start) * 1000)
+        return True
+
+    def _remove(self, fut):
+        try:
+            self.waiters.remove(fut)
+        except ValueError:
+            pass
+        self._publish()
+
+    def release(self, service_ms):
+        """Free a slot (handing it to the oldest waiter) and feed the limiter with service_ms (None: skip)."""
+        if service_ms is not None:
+            self._record(service_ms)
+        while self.waiters and self.in_flight <= self._capacity():
+            fut = self.waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)   # the slot moves to the waiter: in_flight unchanged
+                self._saturated = True
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def _record(self, service_ms):
+        self._window.append(service_ms)
+        if len(self._window) < WINDOW_MIN_SAMPLES or time.monotonic() - self._window_start < WINDOW_SECONDS:
+            return
+        mean = sum(self._window) / len(self._window)
+        self.mean_ms = mean
+        self.best_ms = mean if self.best_ms is None else min(self.best_ms, mean)
+        gradient = min(1.0, max(0.5, self.target() / mean))
+        new = self.limit * gradient
+        if self._saturated and gradient >= 1.0:
+            new += math.sqrt(self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit, (1 - SMOOTHING) * self.limit + SMOOTHING * new))
+        self._window = []
+        self._window_start = time.monotonic()
+        self._saturated = self.in_flight >= self._capacity()
+        self._publish()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to the configured (method, path) routes."""
+
+    def __init__(self, app, routes: str = ADMISSION_ROUTES, controller: AdmissionController = None):
+        self.app = app
+        self.routes = parse_routes(routes)
+        self.enabled = ADMISSION_ENABLED
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if (not self.enabled or scope["type"] != "http"
+                or (scope["method"], scope["path"].rstrip("/") or "/") not in self.routes):
+            await self.app(scope, receive, send)
+            return
+        if not await self.controller.acquire():
+            await self._busy(send)
+            return
+        metrics.incr("admission.admitted")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release((time.perf_counter() - start) * 1000)
+
+    async def _busy(self, send):
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(_BUSY_BODY)).encode()),
+            (b"retry-after", str(self.controller.retry_after()).encode()),
+        ]})
+        await send({"type": "http.response.body", "body": _BUSY_BODY})
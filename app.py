@@ -1,14 +1,37 @@
 # app.py
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, mentors, questions, students
+from routers import auth, export, mentors, questions, stats, students
 from ml.train import ensure_model_trained
+from migrations import run_migrations
+from admission import AdmissionMiddleware
+import worker
+import metrics
+from schemas import MessageOut, MetricsOut
 
 # ensure model exists before app starts (non-blocking simple check)
 ensure_model_trained()
 
-app = FastAPI(title="Expert Link (SQLite)")
+# bring an existing expert_link.db up to the current schema
+run_migrations()
+
+# in-process match workers for async posting (POST_MODE=async / async_match); 0 = only external worker.py
+MATCH_WORKER_THREADS = int(os.environ.get("MATCH_WORKER_THREADS", "1"))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    stop = worker.start_threads(MATCH_WORKER_THREADS)
+    yield
+    stop.set()
+
+
+app = FastAPI(title="Expert Link (SQLite)", lifespan=lifespan)
+
+# sheds overload on the ML-heavy POST routes; added first so CORS headers wrap its 503s
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,8 +45,16 @@ app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(mentors.router, prefix="/mentors", tags=["mentors"])
 app.include_router(students.router, prefix="/students", tags=["students"])
 app.include_router(questions.router, prefix="/questions", tags=["questions"])
+app.include_router(stats.router, prefix="/stats", tags=["stats"])
+app.include_router(export.router, prefix="/export", tags=["export"])
 
 
-@app.get("/")
+@app.get("/", response_model=MessageOut)
 def index():
     return {"message": "Expert Link backend (SQLite) running"}
+
+
+@app.get("/metrics", response_model=MetricsOut)
+def get_metrics():
+    """Process-local counters and timings (metrics.py)."""
+    return metrics.snapshot()
@@ -0,0 +1,89 @@
+# archive.py
+"""
+Moves old accepted / closed questions out of the hot `questions` table into
+`questions_archive`, in batches:
+
+    python archive.py                     # older than ARCHIVE_AFTER_DAYS (30)
+    python archive.py --days 7 --batch 2000
+
+A question is archived once it is accepted or closed and its accepted_at (or
+created_at) is older than the cutoff; rows from before those columns existed
+have neither and count as old. Each batch copies the rows with INSERT ... SELECT,
+drops their near-duplicate signatures and match jobs, deletes them from
+`questions` and commits, so the hot table and its indexes only hold recent and
+open questions. The questions_fts triggers drop archived rows from /questions/search.
+
+Reads consult the archive only when asked: GET /questions/{id} and
+GET /questions/student/{id} take ?include_archived=true.
+"""
+import os
+import argparse
+
+from sqlalchemy import select, insert, delete, func, or_, and_
+
+from db import SessionLocal
+from models import Question, QuestionArchive, QuestionSignature, QuestionLSH, MatchJob
+
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+ARCHIVABLE_STATUSES = ("accepted", "closed")
+
+_COLUMNS = [c.name for c in Question.__table__.columns]
+
+
+def archive_batch(db, older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                  after_id: int = 0):
+    """Move up to batch_size archivable questions with id > after_id; returns their ids. Does not commit."""
+    cutoff = func.datetime("now", f"{-older_than_days:+g} days")
+    ids = db.execute(
+        select(Question.id)
+        .where(Question.id > after_id,
+               Question.status.in_(ARCHIVABLE_STATUSES),
+               or_(func.coalesce(Question.accepted_at, Question.created_at) < cutoff,
+                   and_(Question.accepted_at.is_(None), Question.created_at.is_(None))))
+        .order_by(Question.id)
+        .limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        return ids
+    db.execute(insert(QuestionArchive).from_select(
+        _COLUMNS, select(*Question.__table__.c).where(Question.id.in_(ids))))
+    for model in (QuestionLSH, QuestionSignature, MatchJob):
+        db.execute(delete(model).where(model.question_id.in_(ids)))
+    db.execute(delete(Question).where(Question.id.in_(ids)))
+    return ids
+
+
+def archive_questions(db, older_than_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                      max_batches: int = None) -> int:
+    """Archive batch by batch, committing after each, until nothing is left; returns rows moved."""
+    total, batches, last_id = 0, 0, 0
+    while max_batches is None or batches < max_batches:
+        # resume after the previous batch instead of rescanning the rows it skipped
+        ids = archive_batch(db, older_than_days, batch_size, after_id=last_id)
+        db.commit()
+        if not ids:
+            break
+        total += len(ids)
+        batches += 1
+        last_id = ids[-1]
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=float, default=ARCHIVE_AFTER_DAYS)
+    ap.add_argument("--batch", type=int, default=ARCHIVE_BATCH_SIZE)
+    ap.add_argument("--max-batches", type=int, default=None)
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        n = archive_questions(db, args.days, args.batch, args.max_batches)
+    finally:
+        db.close()
+    print(f"archived {n} questions")
+
+
+if __name__ == "__main__":
+    main()
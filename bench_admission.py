@@ -0,0 +1,178 @@
+# bench_admission.py
+"""
+Overload test of POST /questions/post with and without admission control
+(admission.py).
+
+serve.py is started with one worker on a copy of expert_link.db, first with
+ADMISSION_ENABLED=0, then with ADMISSION_ENABLED=1. The bench measures the
+sequential service time of a post, then offers posts open-loop (Poisson
+arrivals) at OVERLOAD times that capacity for DURATION seconds (the rate
+calibrated on the first run is reused for the second). Meanwhile a
+probe reads GET /questions/{id} every 100 ms. Every post has a distinct
+random text, so near-duplicate reuse does not make the load cheaper.
+
+Reports, per mode: posts that succeeded, were shed (503) or timed out on the
+client; latency percentiles of the successful posts and of all responses; the
+probe latency; and the admission limit the controller settled on.
+
+    python bench_admission.py
+    python bench_admission.py --overload 4 --duration 30
+"""
+import os
+import csv
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CLIENT_TIMEOUT = 30.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None):
+    """-> (status, seconds, response headers); status 0 = client timeout / connection error."""
+    t = time.perf_counter()
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=CLIENT_TIMEOUT)
+    try:
+        data = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=data, headers={"content-type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status, time.perf_counter() - t, dict(resp.getheaders())
+    except OSError:
+        return 0, time.perf_counter() - t, {}
+    finally:
+        conn.close()
+
+
+def question_texts(seed=7):
+    vocab = {}
+    with open(os.path.join(HERE, "data", "synthetic_questions.csv"), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            vocab.setdefault(row["subject"], set()).update(row["text"].split())
+    vocab = {subj: sorted(words) for subj, words in vocab.items()}
+    rng = random.Random(seed)
+    subjects = sorted(vocab)
+    while True:
+        subj = rng.choice(subjects)
+        words = rng.sample(vocab[subj], min(12, len(vocab[subj])))
+        yield subj, f"please explain {' '.join(words)} {rng.randrange(10 ** 9)}"
+
+
+def pct(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def run(mode, args, texts, rate=None):
+    """-> the offered rate (posts/s), calibrated on the first run and reused."""
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(HERE, "expert_link.db"), tmp)
+    port = free_port()
+    env = dict(os.environ, PYTHONUNBUFFERED="1", MATCH_WORKER_THREADS="0", POST_MODE="sync",
+               ADMISSION_ENABLED="1" if mode == "admission" else "0")
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--workers", "1", "--port", str(port)],
+                            cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        for line in proc.stdout:
+            if "workers ready" in line:
+                break
+        threading.Thread(target=lambda: [None for _ in proc.stdout], daemon=True).start()
+
+        texts_lock = threading.Lock()
+
+        def post():
+            with texts_lock:
+                subj, text = next(texts)
+            return request(port, "POST", "/questions/post", {"student_id": args.student, "text": text,
+                                                             "subject": subj})
+
+        calib = [post()[1] for _ in range(25)][5:]
+        service = float(np.median(calib))
+        rate = rate or args.overload / service
+
+        stop = threading.Event()
+        probes = []
+
+        def probe():
+            while not stop.is_set():
+                status, s, _ = request(port, "GET", "/questions/1")
+                probes.append((status, s))
+                stop.wait(0.1)
+
+        probe_thread = threading.Thread(target=probe)
+        probe_thread.start()
+        rng = random.Random(1)
+        futures = []
+        with ThreadPoolExecutor(max_workers=256) as pool:
+            t_end = time.perf_counter() + args.duration
+            next_at = time.perf_counter()
+            while next_at < t_end:
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                futures.append(pool.submit(post))
+                next_at += rng.expovariate(rate)
+            results = [f.result() for f in futures]
+        stop.set()
+        probe_thread.join()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=CLIENT_TIMEOUT)
+            conn.request("GET", "/metrics")
+            gauges = json.loads(conn.getresponse().read()).get("gauges", {})
+            conn.close()
+        except OSError:
+            gauges = {}   # still working through the backlog of abandoned posts
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    ok = [s for status, s, _ in results if status == 200]
+    shed = [s for status, s, _ in results if status == 503]
+    failed = [s for status, s, _ in results if status not in (200, 503)]
+    retry = [int(h.get("retry-after", 0)) for status, _, h in results if status == 503]
+    probe_s = [s for status, s in probes if status == 200]
+    elapsed_all = [s for _, s, _ in results]
+    print(f"\n{mode}: sequential service {service * 1000:.0f} ms/post, offered {rate:.1f} posts/s "
+          f"for {args.duration:g}s -> {len(results)} posts")
+    print(f"  ok {len(ok)} ({len(ok) / args.duration:.1f}/s)   shed 503 {len(shed)}"
+          f"{f' (Retry-After {min(retry)}-{max(retry)}s)' if retry else ''}   "
+          f"timeouts/errors {len(failed)}")
+    print(f"  ok latency ms     p50 {pct(ok, 50):8.0f}  p99 {pct(ok, 99):8.0f}  max {pct(ok, 100):8.0f}")
+    print(f"  all responses ms  p50 {pct(elapsed_all, 50):8.0f}  p99 {pct(elapsed_all, 99):8.0f}")
+    print(f"  GET /questions/1  p50 {pct(probe_s, 50):8.0f}  p99 {pct(probe_s, 99):8.0f}  "
+          f"({len(probe_s)}/{len(probes)} ok)")
+    if gauges:
+        print(f"  admission limit {gauges.get('admission.limit')}  target {gauges.get('admission.target_ms')} ms")
+    return rate
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--overload", type=float, default=3.0, help="offered load as a multiple of capacity")
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--student", type=int, default=6)
+    args = ap.parse_args()
+    texts = question_texts()
+    rate = None
+    for mode in ("no admission", "admission"):
+        rate = run(mode, args, texts, rate)
+
+
+if __name__ == "__main__":
+    main()
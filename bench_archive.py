@@ -0,0 +1,89 @@
+# bench_archive.py
+"""
+Hot-table size and hot-read latency before and after archive.py, at 1M
+questions by default (the bench_hot_queries.py data set: 90% accepted, 2% closed).
+90% of the questions are backdated past ARCHIVE_AFTER_DAYS, so archival moves
+most accepted / closed rows into questions_archive.
+
+Reports the on-disk size of `questions` and its indexes (dbstat), archival
+throughput, and median latency of the mentor inbox scan and a student history
+read, with and without ?include_archived.
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_archive.py
+    python bench_archive.py --questions 200000 --batch 10000
+"""
+import os
+import time
+import argparse
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import queries
+import archive
+from models import Base
+from bench_hot_queries import populate, timed
+
+
+def table_bytes(db, table):
+    """Bytes of the table and its indexes, from dbstat."""
+    return db.execute(text(
+        "SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name = :t "
+        "OR name IN (SELECT name FROM sqlite_schema WHERE type = 'index' AND tbl_name = :t)"
+    ), {"t": table}).scalar()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=1000000)
+    ap.add_argument("--students", type=int, default=50000)
+    ap.add_argument("--mentors", type=int, default=10000)
+    ap.add_argument("--batch", type=int, default=archive.ARCHIVE_BATCH_SIZE)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_archive.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    populate(db, args.questions, args.students, args.mentors)
+    old = int(args.questions * 0.9)
+    db.execute(text("UPDATE questions SET created_at = datetime('now', '-90 days'), "
+                    "accepted_at = CASE WHEN status = 'accepted' THEN datetime('now', '-89 days') END "
+                    "WHERE id <= :old"), {"old": old})
+    db.commit()
+    db.execute(text("VACUUM"))
+    print(f"{args.questions} questions loaded, {old} backdated ({path})")
+
+    student_id = args.mentors + 1
+    reads = {
+        "mentor inbox": lambda: queries.open_question_matches(db),
+        "student history": lambda: queries.questions_by_student(db, student_id),
+        "student history +archive": lambda: (queries.questions_by_student(db, student_id),
+                                             queries.archived_questions_by_student(db, student_id)),
+    }
+    hot_rows = lambda: db.execute(text("SELECT count(*) FROM questions")).scalar()
+
+    before_rows, before_bytes = hot_rows(), table_bytes(db, "questions")
+    before = {name: timed(fn, args.repeat) for name, fn in reads.items()}
+
+    t = time.perf_counter()
+    moved = archive.archive_questions(db, batch_size=args.batch)
+    elapsed = time.perf_counter() - t
+    db.execute(text("VACUUM"))
+    after_rows, after_bytes = hot_rows(), table_bytes(db, "questions")
+    after = {name: timed(fn, args.repeat) for name, fn in reads.items()}
+
+    print(f"archived {moved} rows in {elapsed:.1f}s ({moved / elapsed:.0f} rows/s, batch {args.batch})")
+    print(f"questions rows      {before_rows:>12} -> {after_rows}")
+    print(f"questions + indexes {before_bytes / 2**20:>10.1f} MB -> {after_bytes / 2**20:.1f} MB")
+    print(f"{'':26} {'before':>10} {'after':>10}   (median ms)")
+    for name in reads:
+        print(f"{name:26} {before[name]:10.3f} {after[name]:10.3f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
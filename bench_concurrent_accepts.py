@@ -0,0 +1,160 @@
+# bench_concurrent_accepts.py
+"""
+Concurrent accepts: throughput and balance correctness of the accept bookkeeping.
+
+  legacy   the old accept: load question and mentor, check, set accepted_mentor,
+           mentor.balance += price in Python, flush, re-check, commit
+  ledger   the current accept: conditional UPDATE claim, solved_count + 1 in SQL,
+           one earnings_ledger INSERT (routers/questions.py, earnings.py)
+
+THREADS threads work through the same shuffled list of (question, mentor)
+attempts, every question offered to several mentors (few mentors, so many
+concurrent accepts hit the same mentor). An attempt that fails with a database
+error ("database is locked") is retried, like a client would. Afterwards each
+mentor's balance is checked against the prices of the questions it actually
+holds, and every question must have been paid exactly once.
+
+Runs on throw-away SQLite files, never on expert_link.db:
+    python bench_concurrent_accepts.py
+    python bench_concurrent_accepts.py --threads 16 --questions 5000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+from sqlalchemy import create_engine, func, update, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import earnings
+import queries
+from models import Base, User, Question
+
+
+def setup(n_mentors, n_questions):
+    path = os.path.join(tempfile.mkdtemp(), "bench_accepts.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    random.seed(42)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "name": f"Mentor {i}", "email": f"m{i}@bench.local", "password": "x",
+             "role": "mentor", "balance": 0.0, "solved_count": 0} for i in range(1, n_mentors + 1)]
+            + [{"id": n_mentors + 1, "name": "Student", "email": "s@bench.local", "password": "x",
+                "role": "student", "balance": 0.0, "solved_count": 0}])
+        conn.execute(Question.__table__.insert(), [
+            {"id": q, "student_id": n_mentors + 1, "text": f"question {q}", "subject": "math",
+             "price": round(random.uniform(10, 300), 2), "status": "matched"} for q in range(1, n_questions + 1)])
+    return engine
+
+
+def legacy_accept(db, qid, mid):
+    q = db.query(Question).filter(Question.id == qid).first()
+    if q.accepted_mentor:
+        return False
+    mentor = db.query(User).filter(User.id == mid).first()
+    q.accepted_mentor = mid
+    q.status = "accepted"
+    mentor.solved_count = (mentor.solved_count or 0) + 1
+    mentor.balance = (mentor.balance or 0.0) + (q.price or 0.0)
+    db.flush()
+    recheck = db.query(Question).filter(Question.id == qid).first()
+    if recheck.accepted_mentor and recheck.accepted_mentor != mid:
+        db.rollback()
+        return False
+    db.commit()
+    return True
+
+
+def ledger_accept(db, qid, mid):
+    q = queries.question_by_id(db, qid)
+    if q.accepted_mentor:
+        return False
+    claimed = db.execute(update(Question).where(Question.id == qid, Question.accepted_mentor.is_(None))
+                         .values(accepted_mentor=mid, status="accepted", accepted_at=func.now())).rowcount
+    if claimed != 1:
+        db.rollback()
+        return False
+    db.execute(update(User).where(User.id == mid).values(solved_count=func.coalesce(User.solved_count, 0) + 1))
+    earnings.record_earning(db, mid, qid, q.price)
+    db.commit()
+    return True
+
+
+def run(mode, accept, args):
+    engine = setup(args.mentors, args.questions)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    attempts = [(q, m) for q in range(1, args.questions + 1)
+                for m in random.sample(range(1, args.mentors + 1), args.contenders)]
+    random.shuffle(attempts)
+    lock = threading.Lock()
+    counts = {"accepted": 0, "collisions": 0, "retries": 0}
+
+    def work():
+        db = Session()
+        while True:
+            with lock:
+                if not attempts:
+                    break
+                qid, mid = attempts.pop()
+            while True:
+                try:
+                    ok = accept(db, qid, mid)
+                    break
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        counts["retries"] += 1
+            with lock:
+                counts["accepted" if ok else "collisions"] += 1
+        db.close()
+
+    threads = [threading.Thread(target=work) for _ in range(args.threads)]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t
+
+    db = Session()
+    if mode == "ledger":
+        earnings.rollup(db)
+        db.commit()
+    expected = dict(db.execute(text(
+        "SELECT accepted_mentor, sum(price) FROM questions WHERE accepted_mentor IS NOT NULL "
+        "GROUP BY accepted_mentor")).all())
+    wrong = 0
+    for mid in range(1, args.mentors + 1):
+        if mode == "ledger":
+            balance = earnings.get_balance(db, mid)
+        else:
+            balance = db.execute(text("SELECT balance FROM users WHERE id = :m"), {"m": mid}).scalar()
+        wrong += abs(balance - expected.get(mid, 0.0)) > 1e-6
+    paid = (db.execute(text("SELECT count(*) FROM earnings_ledger")).scalar() if mode == "ledger"
+            else db.execute(text("SELECT sum(solved_count) FROM users")).scalar())
+    db.close()
+    print(f"{mode:7} {counts['accepted']:6} accepted {counts['collisions']:6} collisions "
+          f"{counts['retries']:6} retries  {elapsed:6.2f}s  {counts['accepted'] / elapsed:7.0f} accepts/s  "
+          f"payouts {paid}/{args.questions}  wrong balances {wrong}/{args.mentors}")
+    return wrong == 0 and paid == args.questions
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--mentors", type=int, default=5)
+    ap.add_argument("--questions", type=int, default=2000)
+    ap.add_argument("--contenders", type=int, default=3, help="mentors offered each question")
+    args = ap.parse_args()
+    print(f"{args.threads} threads, {args.questions} questions x {args.contenders} mentors, {args.mentors} mentors")
+    ok = {mode: run(mode, accept, args) for mode, accept in (("legacy", legacy_accept), ("ledger", ledger_accept))}
+    if not ok["ledger"]:
+        raise SystemExit("ledger balances are wrong")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_deadline.py
+"""
+Post latency and matching tier under different time budgets
+(matching_service: MATCH_BUDGET_MS / QuestionIn.budget_ms, deadline.py).
+
+For each budget sends POSTS sequential POST /questions/post with that budget_ms
+(distinct random texts, so no near-duplicate reuse). Every LONG_EVERY-th post
+is a long question (LONG_PARTS random questions run together), where YAKE
+dominates the pipeline. Reports, for short and long questions, p50 / p99 of
+the matching pipeline (match_question, what the budget covers) and of the whole
+post as the client sees it, the share of pipelines over the budget, and how
+often each tier and the fast keyword extractor were used.
+
+Runs the app in-process on a copy of expert_link.db in a temp directory:
+    python bench_deadline.py
+    python bench_deadline.py --budgets 0 100 20 --strategy tfidf
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import collections
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _pcts(values, width):
+    cell = f"{np.percentile(values, 50):.1f} / {np.percentile(values, 99):.1f}" if values else "-"
+    return f"{cell:>{width}}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=80)
+    ap.add_argument("--budgets", type=float, nargs="+", default=[0, 250, 50, 10, 2])
+    ap.add_argument("--strategy", default=None)
+    ap.add_argument("--long-every", type=int, default=4)
+    ap.add_argument("--long-parts", type=int, default=40)
+    ap.add_argument("--student", type=int, default=6)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(HERE, "expert_link.db"), tmp)
+    os.chdir(tmp)   # db.py opens ./expert_link.db
+    os.environ.setdefault("MATCH_WORKER_THREADS", "0")
+    from fastapi.testclient import TestClient
+    from app import app
+    import metrics
+    import routers.questions
+    from matching_service import TIERS
+    from bench_admission import question_texts
+
+    pipeline_ms = []
+    match_question = routers.questions.match_question
+
+    def timed_match_question(*a, **kw):
+        t = time.perf_counter()
+        try:
+            return match_question(*a, **kw)
+        finally:
+            pipeline_ms.append((time.perf_counter() - t) * 1000)
+    routers.questions.match_question = timed_match_question
+
+    texts = question_texts()
+    print(f"{args.posts} sequential posts per budget, strategy {args.strategy or 'default'}, "
+          f"every {args.long_every}th a long question ({args.long_parts} questions run together)")
+    print(f"{'':>10} {'--- pipeline p50 / p99 ms ---':>31} {'-- post p50 / p99 ms --':>25}")
+    print(f"{'budget ms':>10} {'short':>15} {'long':>15} {'short':>12} {'long':>12} {'over':>6}  "
+          + " ".join(f"{t:>8}" for t in TIERS) + f" {'kw fast':>8}")
+    with TestClient(app) as c:
+        for _ in range(5):   # warm-up, also teaches deadline.py the stage costs
+            subj, text = next(texts)
+            c.post("/questions/post", json={"student_id": args.student, "subject": subj, "text": text})
+        for budget in args.budgets:
+            for name in [f"match.tier.{t}" for t in TIERS] + ["match.keywords_fast"]:
+                metrics._counters.pop(name, None)
+            ms = {"short": [], "long": []}
+            pipe = {"short": [], "long": []}
+            tiers = collections.Counter()
+            for i in range(args.posts):
+                kind = "long" if args.long_every and i % args.long_every == args.long_every - 1 else "short"
+                subj, text = next(texts)
+                if kind == "long":
+                    text = " ".join([text] + [next(texts)[1] for _ in range(args.long_parts - 1)])
+                body = {"student_id": args.student, "subject": subj, "text": text, "budget_ms": budget}
+                if args.strategy:
+                    body["strategy"] = args.strategy
+                t = time.perf_counter()
+                r = c.post("/questions/post", json=body)
+                ms[kind].append((time.perf_counter() - t) * 1000)
+                pipe[kind].append(pipeline_ms.pop())
+                assert r.status_code == 200, r.text
+                tiers[r.json().get("tier")] += 1
+            every = pipe["short"] + pipe["long"]
+            over = sum(m > budget for m in every) / len(every) if budget > 0 else float("nan")
+            cols = " ".join(f"{_pcts(v, 15 if d is pipe else 12)}" for d in (pipe, ms) for v in d.values())
+            label = f"{budget:g}" if budget > 0 else "none"
+            print(f"{label:>10} {cols} {over:6.0%}  " + " ".join(f"{tiers[t]:8}" for t in TIERS)
+                  + f" {metrics.count('match.keywords_fast'):8}")
+    os.chdir(HERE)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# bench_export.py
+"""
+Peak Python memory and throughput of export.py against loading the rows with
+.all() first, at growing table sizes (bench_hot_queries.py data set). The
+streaming export's peak should stay flat while .all() grows with the table.
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_export.py
+    python bench_export.py --sizes 100000 1000000 --gzip
+"""
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import export
+from models import Base
+from bench_hot_queries import populate
+
+
+def measure(fn):
+    tracemalloc.start()
+    t = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, elapsed, peak
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[50000, 200000, 800000])
+    ap.add_argument("--format", choices=export.EXPORT_FORMATS, default="ndjson")
+    ap.add_argument("--gzip", action="store_true")
+    args = ap.parse_args()
+
+    print(f"{'rows':>8} {'stream MB':>10} {'stream s':>9} {'output MB':>10} {'.all() MB':>10}")
+    for n in args.sizes:
+        path = os.path.join(tempfile.mkdtemp(), "bench_export.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        populate(db, n, n_students=max(1, n // 20), n_mentors=1000)
+        stmt = export.questions_stmt()
+
+        size, elapsed, peak = measure(lambda: sum(len(c) for c in export.stream(
+            stmt, export.QUESTION_COLUMNS, args.format, args.gzip, db=db)))
+        _, _, peak_all = measure(lambda: len(db.execute(stmt).all()))
+        print(f"{n:8} {peak / 2**20:10.1f} {elapsed:9.2f} {size / 2**20:10.1f} {peak_all / 2**20:10.1f}")
+        db.close()
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
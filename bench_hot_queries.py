@@ -0,0 +1,152 @@
+# bench_hot_queries.py
+"""
+Query plans and latency of the routers' hot reads, at 1M questions by default:
+  mentor list      role = 'mentor' ORDER BY id                  (ix_users_role_id)
+  student history  student_id = ? ORDER BY id DESC              (ix_questions_student_id_id)
+  mentor inbox     accepted_mentor IS NULL AND status != 'closed' (ix_questions_open, covering
+                   for the (id, matched_mentors) membership scan)
+  question by id   primary key
+
+Each query is timed three ways: ORM query without the composite indexes, ORM
+query with them, and the cached queries.py statement with them. The SQL that
+queries.py actually emits is captured and its EXPLAIN QUERY PLAN is asserted to
+use the expected index; the script exits non-zero if one does not.
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_hot_queries.py                   # 1M questions
+    python bench_hot_queries.py --questions 200000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, Question
+import queries
+
+HOT_INDEXES = ["ix_users_role_id", "ix_questions_student_id_id", "ix_questions_open"]
+SUBJECTS = ["math", "physics", "chemistry", "cs", "biology"]
+
+
+def populate(db, n_questions, n_students, n_mentors, chunk=50000):
+    random.seed(42)
+    users = [{"id": i, "name": f"Mentor {i}", "email": f"m{i}@bench.local", "password": "x",
+              "role": "mentor", "subjects": random.choice(SUBJECTS)} for i in range(1, n_mentors + 1)]
+    users += [{"id": n_mentors + i, "name": f"Student {i}", "email": f"s{i}@bench.local", "password": "x",
+               "role": "student", "subjects": None} for i in range(1, n_students + 1)]
+    db.execute(User.__table__.insert(), users)
+    for start in range(1, n_questions + 1, chunk):
+        rows = []
+        for qid in range(start, min(start + chunk, n_questions + 1)):
+            matched = random.sample(range(1, n_mentors + 1), 5)
+            r = random.random()
+            accepted = matched[0] if r < 0.90 else None          # 90% accepted, 8% open, 2% closed
+            status = "accepted" if accepted else ("closed" if r > 0.98 else "matched")
+            rows.append({"id": qid, "student_id": n_mentors + random.randint(1, n_students),
+                         "text": f"question {qid} about {random.choice(SUBJECTS)}",
+                         "subject": random.choice(SUBJECTS), "keywords": "a,b", "price": 50.0,
+                         "accepted_mentor": accepted, "matched_mentors": ",".join(map(str, matched)),
+                         "status": status})
+        db.execute(Question.__table__.insert(), rows)
+    db.commit()
+
+
+def timed(fn, repeat):
+    ms = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return statistics.median(ms)
+
+
+def captured_plan(engine, db, fn):
+    """Run fn, capture the last SELECT it emitted and return its EXPLAIN QUERY PLAN."""
+    seen = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            seen.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    statement, parameters = seen[-1]
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return " | ".join(r[-1] for r in rows)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--questions", type=int, default=1000000)
+    ap.add_argument("--students", type=int, default=50000)
+    ap.add_argument("--mentors", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_hot.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for name in HOT_INDEXES:
+        db.execute(text(f"DROP INDEX {name}"))
+    t = time.perf_counter()
+    populate(db, args.questions, args.students, args.mentors)
+    print(f"{args.questions} questions loaded in {time.perf_counter() - t:.1f}s ({path})")
+
+    student_id = args.mentors + 1
+    question_id = args.questions // 2
+    orm = {
+        "mentor list": lambda: db.query(User).filter(User.role == "mentor").all(),
+        "student history": lambda: db.query(Question).filter(
+            Question.student_id == student_id).order_by(Question.id.desc()).all(),
+        "mentor inbox": lambda: db.query(Question).filter(
+            Question.accepted_mentor.is_(None), Question.status != "closed").all(),
+        "question by id": lambda: db.query(Question).filter(Question.id == question_id).first(),
+    }
+    cached = {
+        "mentor list": lambda: queries.mentors(db),
+        "student history": lambda: queries.questions_by_student(db, student_id),
+        "mentor inbox": lambda: queries.open_question_matches(db),
+        "question by id": lambda: queries.question_by_id(db, question_id),
+    }
+    expected = {"mentor list": "ix_users_role_id", "student history": "ix_questions_student_id_id",
+                "mentor inbox": "COVERING INDEX ix_questions_open", "question by id": "INTEGER PRIMARY KEY"}
+
+    before = {name: timed(fn, args.repeat) for name, fn in orm.items()}
+    db.expunge_all()
+    t = time.perf_counter()
+    for table in (User.__table__, Question.__table__):
+        for index in table.indexes:
+            if index.name in HOT_INDEXES:
+                index.create(bind=db.connection())
+    db.commit()
+    print(f"composite indexes built in {time.perf_counter() - t:.1f}s")
+    after_orm = {name: timed(fn, args.repeat) for name, fn in orm.items()}
+    db.expunge_all()
+    after = {name: timed(fn, args.repeat) for name, fn in cached.items()}
+
+    failed = False
+    for name, fn in cached.items():
+        plan = captured_plan(engine, db, fn)
+        ok = expected[name] in plan
+        failed |= not ok
+        print(f"{name:16} plan {'OK ' if ok else 'BAD'} {plan}")
+    print(f"{'':16} {'no index (ORM)':>16} {'index (ORM)':>12} {'index (cached)':>15}   (median ms)")
+    for name in orm:
+        print(f"{name:16} {before[name]:16.3f} {after_orm[name]:12.3f} {after[name]:15.3f}")
+    db.close()
+    if failed:
+        sys.exit("query plan assertion failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench_idempotency.py
+"""
+Cost of a retried POST /questions/post and /questions/accept with and without
+an Idempotency-Key (idempotency.py):
+
+  without key   every retry inserts another question (its match is reused from
+                the original by near-duplicate detection, or the ML pipeline
+                runs again once the original is out of the reuse window); a
+                retried accept fails with 400 "Already accepted"
+  with key      a retry is one primary-key lookup on idempotency_keys and
+                replays the stored response
+
+Also sends RACERS concurrent copies of one keyed post (a client retrying
+before the first attempt answered) and counts the questions they created.
+
+Runs the app in-process on a copy of expert_link.db in a temp directory:
+    python bench_idempotency.py
+    python bench_idempotency.py --posts 100
+"""
+import os
+import time
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=40)
+    ap.add_argument("--racers", type=int, default=4)
+    ap.add_argument("--student", type=int, default=6)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(HERE, "expert_link.db"), tmp)
+    os.chdir(tmp)   # db.py opens ./expert_link.db
+    os.environ.setdefault("MATCH_WORKER_THREADS", "0")
+    from fastapi.testclient import TestClient
+    from app import app
+
+    def count():
+        with sqlite3.connect("expert_link.db") as conn:
+            return conn.execute("SELECT count(*) FROM questions").fetchone()[0]
+
+    def timed(fn):
+        t = time.perf_counter()
+        r = fn()
+        return r, (time.perf_counter() - t) * 1000
+
+    from bench_admission import question_texts
+    texts = question_texts()
+
+    with TestClient(app) as c:
+        def post(question, key=None):
+            subject, text = question
+            body = {"student_id": args.student, "subject": subject, "text": text}
+            return c.post("/questions/post", json=body, headers={"Idempotency-Key": key} if key else {})
+
+        post(next(texts))   # warm-up
+        rows = {}
+        for mode in ("without key", "with key"):
+            tag = mode.replace(" ", "-")
+            first, retry, accept_first, accept_retry, statuses = [], [], [], [], []
+            before = count()
+            for i in range(args.posts):
+                key = f"{tag}-{i}" if mode == "with key" else None
+                question = next(texts)
+                r, ms = timed(lambda: post(question, key))
+                first.append(ms)
+                _, ms = timed(lambda: post(question, key))
+                retry.append(ms)
+                body = {"question_id": r.json()["question_id"], "mentor_id": r.json()["matched"][0]["id"]}
+                headers = {"Idempotency-Key": f"acc-{key}"} if key else {}
+                _, ms = timed(lambda: c.post("/questions/accept", json=body, headers=headers))
+                accept_first.append(ms)
+                ra, ms = timed(lambda: c.post("/questions/accept", json=body, headers=headers))
+                accept_retry.append(ms)
+                statuses.append(ra.status_code)
+            rows[mode] = (statistics.median(first), statistics.median(retry), count() - before,
+                          statistics.median(accept_first), statistics.median(accept_retry),
+                          sorted(set(statuses)))
+
+        before, out, question = count(), [], next(texts)
+        threads = [threading.Thread(target=lambda: out.append(post(question, "race")))
+                   for _ in range(args.racers)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        raced = count() - before
+
+    print(f"{args.posts} posts, each retried once; every accept retried once (median ms)")
+    print(f"{'':12} {'post':>7} {'retry':>7} {'questions':>10} {'accept':>7} {'retry':>7} {'retry status':>13}")
+    for mode, (f, r, n, af, ar, st) in rows.items():
+        print(f"{mode:12} {f:7.1f} {r:7.1f} {n:10} {af:7.1f} {ar:7.1f} {str(st):>13}")
+    print(f"{args.racers} concurrent posts with one key -> {raced} question(s), "
+          f"{len({r.json()['question_id'] for r in out})} distinct question_id(s) returned")
+    os.chdir(HERE)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
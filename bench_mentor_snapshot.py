@@ -0,0 +1,122 @@
+# bench_mentor_snapshot.py
+"""
+Memory and read latency of the mentor data post_question needs:
+  before: db.query(User) ORM objects (+ the keyword / subject caches)
+  after:  ml/mentor_snapshot.py MentorRecord snapshot (__slots__, no ORM state)
+
+Also times get_snapshot() with and without a pending mentor change, i.e. the
+per-request cost of the mentor_changes version check and an incremental reload.
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_mentor_snapshot.py                  # 100k mentors
+    python bench_mentor_snapshot.py --mentors 500000
+"""
+import os
+import gc
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, MentorSubject, MentorKeywordStat
+from ml import mentor_keywords, mentor_subjects, mentor_snapshot
+from ml import mentor_profiles  # noqa: F401  imported up front so sklearn is not counted below
+
+SUBJECTS = ["math", "physics", "chemistry", "cs", "biology", "statistics", "economics"]
+KEYWORDS = [f"kw{i}" for i in range(2000)]
+
+
+def populate(db, n, keywords_per_mentor):
+    random.seed(42)
+    users, memberships, stats = [], [], []
+    for i in range(1, n + 1):
+        subs = sorted(random.sample(SUBJECTS, random.choice([1, 1, 2])))
+        users.append({"id": i, "name": f"Mentor {i}", "email": f"m{i}@bench.local",
+                      "password": "$2b$12$" + "x" * 53, "role": "mentor", "subjects": ",".join(subs)})
+        memberships += [{"mentor_id": i, "subject": s} for s in subs]
+        stats += [{"mentor_id": i, "keyword": k, "count": random.randint(1, 20)}
+                  for k in random.sample(KEYWORDS, keywords_per_mentor)]
+    db.execute(User.__table__.insert(), users)
+    db.execute(MentorSubject.__table__.insert(), memberships)
+    db.execute(MentorKeywordStat.__table__.insert(), stats)
+    db.commit()
+
+
+def measure(fn):
+    """(result, retained bytes, seconds) of fn(), result kept alive while measuring."""
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, retained, elapsed
+
+
+def timed(fn, repeat):
+    ms = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return statistics.median(ms)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=100000)
+    ap.add_argument("--keywords", type=int, default=10, help="keyword stats per mentor")
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_snapshot.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    t = time.perf_counter()
+    populate(db, args.mentors, args.keywords)
+    print(f"{args.mentors} mentors loaded in {time.perf_counter() - t:.1f}s ({path})")
+    n = args.mentors
+
+    def orm_load():
+        s = Session()
+        users = s.query(User).filter(User.role == "mentor").all()
+        return s, users, mentor_keywords.get_keyword_vectors(s), mentor_subjects.get_subject_map(s)
+
+    before, before_bytes, before_s = measure(orm_load)
+    before[0].close()
+    del before
+    mentor_keywords.invalidate()
+    mentor_subjects.invalidate()
+
+    after, after_bytes, after_s = measure(lambda: mentor_snapshot.get_snapshot(db))
+    print(f"before: ORM users + caches  {before_bytes / 2**20:7.1f} MiB "
+          f"({before_bytes / n:.0f} B/mentor), load {before_s:.2f}s")
+    print(f"after:  mentor snapshot     {after_bytes / 2**20:7.1f} MiB "
+          f"({after_bytes / n:.0f} B/mentor), build {after_s:.2f}s")
+
+    clean_ms = timed(lambda: mentor_snapshot.get_snapshot(db), args.repeat)
+
+    changed = []
+    for _ in range(args.repeat):
+        mentor_snapshot.mark_changed(db, random.randint(1, n))
+        db.commit()
+        changed.append(timed(lambda: mentor_snapshot.get_snapshot(db), 1))
+    changed_ms = statistics.median(changed)
+    query_ms = timed(lambda: db.query(User).filter(User.id.in_(range(1, 6))).all(), args.repeat)
+    print(f"get_snapshot, no changes:   {clean_ms:.3f} ms median")
+    print(f"get_snapshot, 1 change:     {changed_ms:.3f} ms median (incremental reload)")
+    print(f"5-mentor ORM lookup (old):  {query_ms:.3f} ms median")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# bench_serialization.py
+"""
+Serialization cost of a 10k-row list response (GET /mentors/), three ways:
+
+  dicts + jsonable_encoder   the old endpoint: ORM-free rows copied into dicts in
+                             a loop, no response_model, FastAPI's jsonable_encoder
+                             + JSONResponse (json.dumps)
+  dicts + ORJSONResponse     same dicts, response_class=ORJSONResponse (FastAPI
+                             still runs jsonable_encoder first)
+  rows + response_model      the current endpoint: Core rows returned as is,
+                             MentorsOut validated and dumped to JSON bytes by
+                             pydantic-core (FastAPI's response_model fast path)
+
+Reports the median of the serialization step alone and of a full request
+through the ASGI app (TestClient).
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_serialization.py
+    python bench_serialization.py --rows 50000
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import warnings
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import orjson
+
+import queries
+from models import Base
+from schemas import MentorsOut
+from bench_hot_queries import populate
+
+warnings.simplefilter("ignore", DeprecationWarning)
+
+
+def as_dicts(rows):
+    out = []
+    for m in rows:
+        out.append({
+            "id": m.id,
+            "name": m.name,
+            "email": m.email,
+            "subjects": m.subjects,
+            "rating": m.rating,
+            "experience_years": m.experience_years
+        })
+    return {"mentors": out}
+
+
+def median_ms(fn, repeat):
+    ms = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return statistics.median(ms)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=15)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_serialization.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    populate(db, 0, n_students=1, n_mentors=args.rows)
+    rows = queries.mentors(db)
+
+    adapter = TypeAdapter(MentorsOut)
+    step = {
+        "dicts + jsonable_encoder": lambda: json.dumps(jsonable_encoder(as_dicts(rows))).encode("utf-8"),
+        "dicts + ORJSONResponse": lambda: orjson.dumps(jsonable_encoder(as_dicts(rows))),
+        "rows + response_model": lambda: adapter.dump_json(
+            adapter.validate_python({"mentors": rows}, from_attributes=True)),
+    }
+    outputs = {name: json.loads(fn()) for name, fn in step.items()}
+    assert all(out == outputs["rows + response_model"] for out in outputs.values()), "responses differ"
+
+    app = FastAPI()
+
+    @app.get("/old")
+    def old():
+        return as_dicts(queries.mentors(db))
+
+    @app.get("/orjson", response_class=ORJSONResponse)
+    def with_orjson():
+        return as_dicts(queries.mentors(db))
+
+    @app.get("/new", response_model=MentorsOut)
+    def new():
+        return {"mentors": queries.mentors(db)}
+
+    client = TestClient(app)
+    full = {"dicts + jsonable_encoder": "/old", "dicts + ORJSONResponse": "/orjson", "rows + response_model": "/new"}
+    assert client.get("/old").json() == client.get("/new").json()
+
+    print(f"{args.rows} mentor rows, median of {args.repeat}")
+    print(f"{'':26} {'serialize ms':>13} {'request ms':>11}")
+    for name, fn in step.items():
+        print(f"{name:26} {median_ms(fn, args.repeat):13.2f} "
+              f"{median_ms(lambda: client.get(full[name]), args.repeat):11.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
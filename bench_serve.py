@@ -0,0 +1,139 @@
+# bench_serve.py
+"""
+Startup time and memory of serve.py with and without preloading:
+
+  no-preload   every worker imports the app and warms models, vocab, YAKE and
+               indexes itself (what each uvicorn --workers process ends up doing)
+  preload      the parent imports and warms once, workers are forked from it
+
+For each mode the launcher is started with WORKERS workers. The bench reports
+the time until all of them serve, and each worker's RSS and PSS
+(/proc/<pid>/smaps_rollup) after a few requests. RSS counts shared pages in
+full, while PSS splits them between the processes mapping them. "total PSS" is
+the memory the whole server (parent included) costs the machine. Then the
+bench sends SIGHUP and keeps requesting GET / during the reload, which must
+not fail.
+
+Runs against a copy of expert_link.db in a temp directory:
+    python bench_serve.py
+    python bench_serve.py --workers 8
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import http.client
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def mem_kb(pid):
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                out[key] = int(rest.split()[0])
+    return out["Rss"], out["Pss"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        resp.read()
+        return resp.status
+    finally:
+        conn.close()
+
+
+def wait_line(proc, marker):
+    for line in proc.stdout:
+        if marker in line:
+            return line
+    raise RuntimeError(f"launcher exited before printing {marker!r}")
+
+
+def pids_of(line):
+    return [int(p) for p in line.split("pids [")[1].rstrip("]\n").split(", ")]
+
+
+def run(mode, args):
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(HERE, "expert_link.db"), tmp)
+    port = free_port()
+    cmd = [sys.executable, os.path.join(HERE, "serve.py"), "--workers", str(args.workers), "--port", str(port)]
+    if mode == "no-preload":
+        cmd.append("--no-preload")
+    env = dict(os.environ, PYTHONUNBUFFERED="1", MATCH_WORKER_THREADS="0")
+    t = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        workers = pids_of(wait_line(proc, "workers ready"))
+        startup_s = time.perf_counter() - t
+        for _ in range(args.requests):
+            for path in ("/", "/mentors/", "/stats/"):
+                assert get(port, path) == 200, path
+        mem = [mem_kb(pid) for pid in workers]
+        parent_pss = mem_kb(proc.pid)[1]
+
+        failures, done, stop = [0], [0], threading.Event()
+
+        def hammer():
+            while not stop.is_set():
+                try:
+                    ok = get(port, "/") == 200
+                except OSError:
+                    ok = False
+                failures[0] += not ok
+                done[0] += 1
+
+        th = threading.Thread(target=hammer)
+        th.start()
+        t = time.perf_counter()
+        proc.send_signal(signal.SIGHUP)
+        wait_line(proc, "reloaded")
+        reload_s = time.perf_counter() - t
+        time.sleep(0.5)
+        stop.set()
+        th.join()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=60)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    rss = statistics.median(r for r, _ in mem) / 1024
+    pss = statistics.median(p for _, p in mem) / 1024
+    total = (parent_pss + sum(p for _, p in mem)) / 1024
+    print(f"{mode:11} {startup_s:9.2f} {rss:12.1f} {pss:12.1f} {total:10.1f} {reload_s:9.2f} "
+          f"{failures[0]:>5}/{done[0]}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=20, help="rounds of GET requests before measuring")
+    args = ap.parse_args()
+    print(f"{args.workers} workers")
+    print(f"{'':11} {'startup s':>9} {'RSS MB/wkr':>12} {'PSS MB/wkr':>12} {'total PSS':>10} "
+          f"{'reload s':>9} {'failed during reload':>21}")
+    for mode in ("no-preload", "preload"):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
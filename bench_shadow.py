@@ -0,0 +1,81 @@
+# bench_shadow.py
+"""
+What shadow mode (shadow.py) costs the requests it samples, and what it
+reports about the candidate.
+
+Sends POSTS sequential POST /questions/post (distinct random texts, so no
+near-duplicate reuse) with MATCH_STRATEGY=profile, first without a shadow, then
+with SHADOW_STRATEGY=CANDIDATE at each sample rate. Reports the post latency
+seen by the client and GET /questions/shadow/stats.
+
+Runs the app in-process on a copy of expert_link.db in a temp directory:
+    python bench_shadow.py
+    python bench_shadow.py --candidate fts --rates 0.1 1
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=150)
+    ap.add_argument("--candidate", default="tfidf")
+    ap.add_argument("--rates", type=float, nargs="+", default=[0.1, 1.0])
+    ap.add_argument("--student", type=int, default=6)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(HERE, "expert_link.db"), tmp)
+    os.chdir(tmp)   # db.py opens ./expert_link.db
+    os.environ.setdefault("MATCH_WORKER_THREADS", "0")
+    os.environ["MATCH_STRATEGY"] = "profile"
+    from fastapi.testclient import TestClient
+    from app import app
+    import metrics
+    import shadow
+    from bench_admission import question_texts
+
+    texts = question_texts()
+    print(f"{args.posts} sequential posts, primary profile, candidate {args.candidate}")
+    print(f"{'shadow':>12} {'post p50':>9} {'post p99':>9} {'compared':>9} {'dropped':>8} "
+          f"{'primary p50':>12} {'cand p50':>9} {'cand p99':>9} {'overlap@5':>10} {'top-1':>6}")
+    with TestClient(app) as c:
+        for _ in range(5):   # warm-up
+            subj, text = next(texts)
+            c.post("/questions/post", json={"student_id": args.student, "subject": subj, "text": text})
+        for rate in [0.0] + args.rates:
+            shadow.SHADOW_STRATEGY = args.candidate if rate else ""
+            shadow.SHADOW_SAMPLE_RATE = rate
+            shadow._recent.clear()
+            for name in ("shadow.sampled", "shadow.compared", "shadow.dropped", "shadow.errors"):
+                metrics._counters.pop(name, None)
+            ms = []
+            for _ in range(args.posts):
+                subj, text = next(texts)
+                t = time.perf_counter()
+                r = c.post("/questions/post", json={"student_id": args.student, "subject": subj, "text": text})
+                ms.append((time.perf_counter() - t) * 1000)
+                assert r.status_code == 200, r.text
+            while shadow._queue is not None and not shadow._queue.empty():
+                time.sleep(0.05)
+            time.sleep(0.5)   # last comparison
+            s = c.get("/questions/shadow/stats").json()
+            label = f"{rate:g}" if rate else "off"
+            s = {k: float("nan") if v is None else v for k, v in s.items()}
+            print(f"{label:>12} {np.percentile(ms, 50):9.1f} {np.percentile(ms, 99):9.1f} {s['compared']:>9} "
+                  f"{s['dropped']:>8} {s['primary_p50_ms']:12.1f} "
+                  f"{s['candidate_p50_ms']:9.1f} {s['candidate_p99_ms']:9.1f} "
+                  f"{s['overlap_at_k']:10.2f} {s['top1_agreement']:6.2f}")
+    os.chdir(HERE)
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench_shared_index.py
+"""
+Memory and startup cost of the mentor profile index across worker processes:
+
+  per-process   every worker builds its own ProfileIndex from
+                mentor_profile_vectors (the default)
+  shared        one generation is published to mmap'd files and every worker
+                attaches to it (SHARED_PROFILE_INDEX=1, ml/shared_index.py)
+
+WORKERS fresh interpreters are started like uvicorn --workers (spawn). Each one
+loads the index, scores one question against every mentor so the whole matrix
+is paged in, and reports how long the load took and how much its proportional
+set size (PSS, /proc/<pid>/smaps_rollup) grew. PSS splits shared pages between
+the processes mapping them, so the sum over workers is the memory the index
+really costs the machine. Afterwards the parent publishes a new generation and
+each shared worker reports when it switched to it. In shared mode the first
+worker to find no generation builds and publishes it; the others wait for it
+on the publish lock and attach.
+
+Mentor vectors are sampled as in ml/eval_ann.py and stored in a throw-away
+SQLite file, never in expert_link.db:
+    python bench_shared_index.py
+    python bench_shared_index.py --mentors 500000 --workers 8
+"""
+import os
+import time
+import argparse
+import tempfile
+import multiprocessing as mp
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, MentorProfileVector
+
+
+def pss_kb(pid="self"):
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1])
+    return 0
+
+
+def populate(path, n):
+    from ml import mentor_profiles
+    from ml.eval_ann import _questions, synthetic_mentor_matrix
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    matrix = synthetic_mentor_matrix(n, _questions())
+    space = mentor_profiles.feature_space()
+    rows = []
+    for i in range(n):
+        lo, hi = matrix.indptr[i], matrix.indptr[i + 1]
+        rows.append({"mentor_id": i + 1, "space": space, "n_updates": 0,
+                     "indices": matrix.indices[lo:hi].astype(np.int32).tobytes(),
+                     "data": matrix.data[lo:hi].astype(np.float32).tobytes()})
+    with engine.begin() as conn:
+        conn.execute(MentorProfileVector.__table__.insert(), rows)
+    engine.dispose()
+    return matrix.nnz
+
+
+def worker(mode, db_path, index_dir, results, go):
+    from ml import mentor_profiles, shared_index
+
+    mentor_profiles.SHARED_PROFILE_INDEX = mode == "shared"
+    shared_index.SHARED_INDEX_DIR = index_dir
+    shared_index.SHARED_INDEX_CHECK_SECONDS = 0
+    db = sessionmaker(bind=create_engine(f"sqlite:///{db_path}"))()
+    qvec = mentor_profiles.text_vector("integrate the function by parts")   # loads the vectorizer first
+
+    before = pss_kb()
+    t = time.perf_counter()
+    index = mentor_profiles.get_index(db)
+    load_s = time.perf_counter() - t
+    index.scores(qvec, [])
+    results.put((os.getpid(), load_s, getattr(index, "generation", 0), before))
+    go.wait()   # every worker is loaded: the parent reads PSS now
+
+    go.wait()   # the parent published a new generation
+    t = time.perf_counter()
+    index = mentor_profiles.get_index(db)
+    results.put((os.getpid(), time.perf_counter() - t, getattr(index, "generation", 0), 0))
+    go.wait()
+    db.close()
+
+
+def run(mode, args, db_path, index_dir):
+    ctx = mp.get_context("spawn")
+    results, go = ctx.Queue(), ctx.Barrier(args.workers + 1)
+    procs = [ctx.Process(target=worker, args=(mode, db_path, index_dir, results, go)) for _ in range(args.workers)]
+    t = time.perf_counter()
+    for p in procs:
+        p.start()
+    loaded = [results.get() for _ in procs]
+    startup_s = time.perf_counter() - t
+    grown = sorted((pss_kb(pid) - before) / 1024 for pid, _, _, before in loaded)
+    go.wait()
+
+    if mode == "shared":
+        from ml import shared_index
+        shared_index.SHARED_INDEX_DIR = index_dir
+        db = sessionmaker(bind=create_engine(f"sqlite:///{db_path}"))()
+        new_gen = shared_index.publish(db)
+        db.close()
+    go.wait()
+    switched = [results.get() for _ in procs]
+    go.wait()
+    for p in procs:
+        p.join()
+
+    load = [s for _, s, _, _ in loaded]
+    print(f"{mode:12} {startup_s:9.2f} {np.median(load):10.2f} {max(load):9.2f} {sum(grown):11.1f} "
+          f"{grown[0]:8.1f} {np.median(grown):8.1f} {grown[-1]:8.1f}")
+    if mode == "shared":
+        gens = {g for _, _, g, _ in switched}
+        print(f"{'':12} published generation {new_gen}: workers now on {sorted(gens)}, "
+              f"switch took max {max(s for _, s, _, _ in switched) * 1000:.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=200000)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_path = os.path.join(tmp, "bench_shared_index.db")
+    nnz = populate(db_path, args.mentors)
+    print(f"{args.mentors} mentors, {nnz} stored weights, {args.workers} workers")
+    print(f"{'':12} {'startup s':>9} {'load med s':>10} {'load max':>9} {'PSS MB sum':>11} "
+          f"{'min':>8} {'median':>8} {'max':>8}   (PSS growth per worker)")
+    for mode in ("per-process", "shared"):
+        run(mode, args, db_path, os.path.join(tmp, "shared_index"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# bench_subject_lookup.py
+"""
+Before/after query plan and latency of the "mentors teaching subject X" lookup:
+  before: users.subjects LIKE '%x%'           (User.subjects.contains(...))
+  after:  mentor_subjects.subject = 'x'       (ml/mentor_subjects.mentor_ids_for_subject)
+
+Runs on a throw-away SQLite file, never on expert_link.db:
+    python bench_subject_lookup.py                 # 100k mentors
+    python bench_subject_lookup.py --mentors 500000
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, MentorSubject
+from ml.mentor_subjects import mentor_ids_for_subject
+
+SUBJECTS = ["math", "mathematics", "physics", "chemistry", "cs", "biology", "statistics", "economics"]
+
+
+def populate(db, n):
+    random.seed(42)
+    users, memberships = [], []
+    for i in range(1, n + 1):
+        subs = sorted(random.sample(SUBJECTS, random.choice([1, 1, 1, 2, 3])))
+        users.append({"id": i, "name": f"Mentor {i}", "email": f"m{i}@bench.local", "password": "x",
+                      "role": "mentor", "subjects": ",".join(subs)})
+        memberships += [{"mentor_id": i, "subject": s} for s in subs]
+    db.execute(User.__table__.insert(), users)
+    db.execute(MentorSubject.__table__.insert(), memberships)
+    db.commit()
+    db.execute(text("ANALYZE"))
+
+
+def plan(db, stmt):
+    compiled = stmt.compile(compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).fetchall()
+    return " | ".join(r[-1] for r in rows)
+
+
+def timed(fn, repeat):
+    ms = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        ms.append((time.perf_counter() - t) * 1000)
+    return out, statistics.median(ms)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=100000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_subjects.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    t = time.perf_counter()
+    populate(db, args.mentors)
+    print(f"{args.mentors} mentors loaded in {time.perf_counter() - t:.1f}s ({path})")
+
+    subject = "math"
+    before_q = db.query(User.id).filter(User.role == "mentor", User.subjects.contains(subject))
+    after_q = db.query(MentorSubject.mentor_id).filter(
+        MentorSubject.subject == subject).order_by(MentorSubject.mentor_id)
+
+    print("before plan:", plan(db, before_q.statement))
+    print("after  plan:", plan(db, after_q.statement))
+
+    before_ids, before_ms = timed(lambda: [i for (i,) in before_q.all()], args.repeat)
+    after_ids, after_ms = timed(lambda: mentor_ids_for_subject(db, subject), args.repeat)
+    print(f"before: {before_ms:.2f} ms median, {len(before_ids)} mentors "
+          f"(substring matches like 'mathematics' included)")
+    print(f"after:  {after_ms:.2f} ms median, {len(after_ids)} mentors")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
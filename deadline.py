@@ -0,0 +1,142 @@
+# deadline.py
+"""
+Time budget for the matching pipeline (matching_service.match_question).
+
+    budget = Budget(MATCH_BUDGET_MS)
+    if budget.fits("keywords.yake", len(text)):
+        with budget.stage("keywords.yake", len(text)):
+            ...
+
+A stage fits when the time already spent plus its predicted cost stays within
+the budget. Costs are learned per process, for every stage name run under a
+stage() block, as a line ms = fixed + per_unit * units (units: characters for
+keyword extraction, candidate mentors for scoring) fitted by exponentially
+weighted least squares. The fixed part matters where one stage runs at very
+different sizes, e.g. scoring all mentors or only the subject's. A stage that
+has not run yet is predicted from `like` (a stage known to cost at least as
+much) or assumed to fit. serve.py's warm() runs the pipeline once, so forked
+workers start with estimates.
+
+Each stage keeps two fits: the estimate (SMOOTHING) and a slow baseline
+(BASELINE_SMOOTHING) that takes a sample at most OUTLIER_FACTOR times its own
+prediction. The baseline starts with the second run, as the first one is
+usually cold (warm-up). A stage only measures itself when it runs, so after one
+stall its estimate would keep it skipped forever; instead every skip moves the
+estimate SKIP_DECAY of the way to the baseline (towards zero while there is
+none), and the stage is tried again after a few requests. If it is still slow,
+the new sample pushes it out again.
+
+The budget cannot interrupt a stage that is already running: it only picks,
+before each stage, the cheapest way that still fits.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+SMOOTHING = 0.2
+BASELINE_SMOOTHING = 0.02
+OUTLIER_FACTOR = 4.0
+SKIP_DECAY = 0.25
+
+_lock = threading.Lock()
+_fits = {}   # stage -> [estimate _Fit, baseline _Fit or None]
+
+
+class _Fit:
+    """Exponentially weighted moments of (units, ms) and the least-squares line through them."""
+    __slots__ = ("x", "y", "xx", "xy")
+
+    def __init__(self, units, ms):
+        self.x, self.y, self.xx, self.xy = units, ms, units * units, units * ms
+
+    def add(self, units, ms, weight):
+        self.x += weight * (units - self.x)
+        self.y += weight * (ms - self.y)
+        self.xx += weight * (units * units - self.xx)
+        self.xy += weight * (units * ms - self.xy)
+
+    def blend(self, other, weight):
+        """Move towards other's moments; other None: scale the predicted cost down instead."""
+        if other is None:
+            self.y -= weight * self.y
+            self.xy -= weight * self.xy
+            return
+        self.x += weight * (other.x - self.x)
+        self.y += weight * (other.y - self.y)
+        self.xx += weight * (other.xx - self.xx)
+        self.xy += weight * (other.xy - self.xy)
+
+    def line(self):
+        """-> (fixed ms, ms per unit), both >= 0."""
+        var = self.xx - self.x * self.x
+        if var > 1e-6 * self.xx:
+            per_unit = max(0.0, (self.xy - self.x * self.y) / var)
+            fixed = self.y - per_unit * self.x
+            if fixed >= 0:
+                return fixed, per_unit
+        # one size seen so far (or a negative intercept): proportional to units
+        return 0.0, (self.xy / self.xx if self.xx else 0.0)
+
+    def predict(self, units):
+        fixed, per_unit = self.line()
+        return fixed + per_unit * units
+
+
+def record(stage: str, units: float, ms: float):
+    units = max(1.0, units)
+    with _lock:
+        fits = _fits.get(stage)
+        if fits is None:
+            _fits[stage] = [_Fit(units, ms), None]
+            return
+        estimate, baseline = fits
+        estimate.add(units, ms, SMOOTHING)
+        if baseline is None:
+            fits[1] = _Fit(units, ms)
+        else:
+            baseline.add(units, min(ms, OUTLIER_FACTOR * baseline.predict(units)), BASELINE_SMOOTHING)
+
+
+def skipped(stage: str):
+    """A stage did not fit: move its estimate towards the baseline so it is retried."""
+    with _lock:
+        fits = _fits.get(stage)
+        if fits is not None:
+            fits[0].blend(fits[1], SKIP_DECAY)
+
+
+def estimate(stage: str, units: float, like: str = None):
+    """Predicted ms of stage over units, or None if neither stage nor like has run yet."""
+    with _lock:
+        fits = _fits.get(stage) or _fits.get(like)
+        return None if fits is None else fits[0].predict(max(1.0, units))
+
+
+class Budget:
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms   # <= 0: unlimited
+        self.start = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def fits(self, stage: str, units: float, like: str = None) -> bool:
+        if self.budget_ms <= 0:
+            return True
+        predicted = estimate(stage, units, like)
+        if predicted is None or self.elapsed_ms() + predicted <= self.budget_ms:
+            return True
+        skipped(stage)
+        return False
+
+    @contextmanager
+    def stage(self, stage: str, units: float):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            record(stage, units, ms)
+            metrics.observe(f"deadline.{stage}_ms", ms)
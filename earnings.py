@@ -0,0 +1,72 @@
+# earnings.py
+"""
+Mentor earnings as an append-only ledger (table earnings_ledger).
+
+  record_earning  one INSERT per accepted question, in the accept transaction;
+                  question_id is unique, so a question can never pay out twice
+  rollup          folds new ledger entries into mentor_balances (balance and the
+                  last folded entry, through_id); run by the match workers every
+                  EARNINGS_ROLLUP_SECONDS, on startup (migrations.py) and by hand:
+                      python earnings.py
+  get_balance     rollup balance + ledger entries after through_id, in one SELECT,
+                  so a read never sees an entry counted twice or missed
+
+Accepts never read or rewrite a balance, so concurrent accepts by the same
+mentor do not conflict or lose updates. User.balance is legacy: its value was
+moved into the ledger as an opening entry (migrate_opening_balances).
+"""
+import os
+
+from sqlalchemy import text
+
+from db import SessionLocal
+from models import EarningsEntry
+
+EARNINGS_ROLLUP_SECONDS = float(os.environ.get("EARNINGS_ROLLUP_SECONDS", "60"))
+
+
+def record_earning(db, mentor_id: int, question_id: int, amount: float):
+    """Append a ledger entry. Does not commit."""
+    db.add(EarningsEntry(mentor_id=mentor_id, question_id=question_id, amount=amount or 0.0))
+
+
+def get_balance(db, mentor_id: int) -> float:
+    return db.execute(text(
+        "SELECT coalesce((SELECT balance FROM mentor_balances WHERE mentor_id = :m), 0) + "
+        "       coalesce((SELECT sum(amount) FROM earnings_ledger WHERE mentor_id = :m AND id > "
+        "                 coalesce((SELECT through_id FROM mentor_balances WHERE mentor_id = :m), 0)), 0)"
+    ), {"m": mentor_id}).scalar()
+
+
+def rollup(db) -> int:
+    """Fold ledger entries added since the last rollup into mentor_balances -> mentors updated. Does not commit."""
+    through = db.execute(text("SELECT coalesce(max(id), 0) FROM earnings_ledger")).scalar()
+    return db.execute(text(
+        "INSERT INTO mentor_balances (mentor_id, balance, through_id, updated_at) "
+        "SELECT l.mentor_id, sum(l.amount), :through, datetime('now') "
+        "FROM earnings_ledger l LEFT JOIN mentor_balances b ON b.mentor_id = l.mentor_id "
+        "WHERE l.id > coalesce(b.through_id, 0) AND l.id <= :through "
+        "GROUP BY l.mentor_id "
+        "ON CONFLICT(mentor_id) DO UPDATE SET balance = balance + excluded.balance, "
+        "through_id = excluded.through_id, updated_at = excluded.updated_at"
+    ), {"through": through}).rowcount
+
+
+def migrate_opening_balances(db) -> int:
+    """Move legacy User.balance into the ledger for mentors without entries -> mentors migrated. Does not commit."""
+    return db.execute(text(
+        "INSERT INTO earnings_ledger (mentor_id, question_id, amount) "
+        "SELECT id, NULL, balance FROM users "
+        "WHERE role = 'mentor' AND balance > 0 "
+        "AND NOT EXISTS (SELECT 1 FROM earnings_ledger l WHERE l.mentor_id = users.id)"
+    )).rowcount
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        n = rollup(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"rolled up balances of {n} mentors")
@@ -0,0 +1,187 @@
+# export.py
+"""
+Streaming exports of questions and mentor profiles as NDJSON or CSV, optionally
+gzipped. Used by GET /export/questions and GET /export/mentors (routers/export.py)
+and from the command line:
+
+    python export.py questions --format csv --status accepted --gzip -o questions.csv.gz
+    python export.py mentors --format ndjson > mentors.ndjson
+
+Rows are read in keyset pages of EXPORT_BATCH_ROWS (id > last id sent), each
+in its own short read transaction that ends before the page is encoded, and
+flushed in chunks of about EXPORT_CHUNK_BYTES. Memory stays flat however large
+the table is, and a slow client never holds a SQLite read lock that would block
+posting and accepting. The export is not one snapshot: a row changed while it
+runs is exported as it was when its page was read. Mentor rows never include
+the password hash.
+"""
+import io
+import os
+import csv
+import sys
+import json
+import zlib
+import argparse
+
+from sqlalchemy import select, func, union_all
+
+from db import SessionLocal
+from models import Question, QuestionArchive, User, EarningsEntry, MentorBalance, MentorKeywordStat, MentorSubject
+
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+EXPORT_FORMATS = ("ndjson", "csv")
+
+QUESTION_COLUMNS = ["id", "student_id", "text", "subject", "keywords", "price", "status", "accepted_mentor",
+                    "matched_mentors", "duplicate_of", "created_at", "accepted_at"]
+# balance = earnings rollup + newer ledger entries (as earnings.get_balance); no password hash
+MENTOR_COLUMNS = ["id", "name", "email", "subjects", "experience_years", "rating", "solved_count", "balance",
+                  "keywords"]
+
+
+def questions_stmt(status=None, subject=None, min_id=None, max_id=None, include_archived=False):
+    def part(model):
+        stmt = select(*[getattr(model, c) for c in QUESTION_COLUMNS])
+        if status:
+            stmt = stmt.where(model.status == status)
+        if subject:
+            stmt = stmt.where(func.lower(model.subject) == subject.strip().lower())
+        if min_id is not None:
+            stmt = stmt.where(model.id >= min_id)
+        if max_id is not None:
+            stmt = stmt.where(model.id <= max_id)
+        return stmt
+
+    if not include_archived:
+        return part(Question).order_by(Question.id)
+    return union_all(part(Question), part(QuestionArchive)).order_by("id")
+
+
+def mentors_stmt(subject=None, min_id=None, max_id=None):
+    keywords = (select(func.group_concat(MentorKeywordStat.keyword, ","))
+                .where(MentorKeywordStat.mentor_id == User.id).scalar_subquery())
+    rollup = select(MentorBalance.balance).where(MentorBalance.mentor_id == User.id).scalar_subquery()
+    through = select(MentorBalance.through_id).where(MentorBalance.mentor_id == User.id).scalar_subquery()
+    recent = (select(func.sum(EarningsEntry.amount))
+              .where(EarningsEntry.mentor_id == User.id, EarningsEntry.id > func.coalesce(through, 0))
+              .scalar_subquery())
+    stmt = select(User.id, User.name, User.email, User.subjects, User.experience_years, User.rating,
+                  User.solved_count, (func.coalesce(rollup, 0) + func.coalesce(recent, 0)).label("balance"),
+                  keywords.label("keywords")).where(User.role == "mentor")
+    if subject:
+        # exact subject through the normalized membership table (ml/mentor_subjects.py), not a LIKE scan
+        stmt = stmt.where(User.id.in_(select(MentorSubject.mentor_id)
+                                      .where(MentorSubject.subject == subject.strip().lower())))
+    if min_id is not None:
+        stmt = stmt.where(User.id >= min_id)
+    if max_id is not None:
+        stmt = stmt.where(User.id <= max_id)
+    return stmt.order_by(User.id)
+
+
+def _ndjson(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), default=str, ensure_ascii=False) + "\n"
+
+
+def _csv(columns, rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def encode(columns, rows, fmt="ndjson", gzip=False):
+    """rows -> bytes chunks of about EXPORT_CHUNK_BYTES (gzip: one continuous gzip stream)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {EXPORT_FORMATS}")
+    lines = _ndjson(columns, rows) if fmt == "ndjson" else _csv(columns, rows)
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            data = "".join(pending).encode("utf-8")
+            pending, size = [], 0
+            data = gz.compress(data) if gz else data
+            if data:
+                yield data
+    data = "".join(pending).encode("utf-8")
+    if gz:
+        data = gz.compress(data) + gz.flush()
+    if data:
+        yield data
+
+
+def keyset_pages(stmt, db):
+    """
+    Rows of stmt (first column "id", unique) in id order, EXPORT_BATCH_ROWS per query.
+    Each page's read transaction is rolled back before its rows are handed out.
+    """
+    sub = stmt.order_by(None).subquery()
+    after = None
+    while True:
+        page = select(sub).order_by(sub.c.id).limit(EXPORT_BATCH_ROWS)
+        if after is not None:
+            page = page.where(sub.c.id > after)
+        try:
+            rows = db.execute(page).all()
+        finally:
+            db.rollback()
+        yield from rows
+        if len(rows) < EXPORT_BATCH_ROWS:
+            return
+        after = rows[-1][0]
+
+
+def stream(stmt, columns, fmt="ndjson", gzip=False, db=None):
+    """
+    Read stmt in keyset pages and yield encoded chunks. Opens its own session if
+    none given; a given one is rolled back after every page.
+    """
+    own = db is None
+    db = db or SessionLocal()
+    try:
+        yield from encode(columns, keyset_pages(stmt, db), fmt, gzip)
+    finally:
+        if own:
+            db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("table", choices=["questions", "mentors"])
+    ap.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    ap.add_argument("--gzip", action="store_true")
+    ap.add_argument("--status")
+    ap.add_argument("--subject")
+    ap.add_argument("--min-id", type=int)
+    ap.add_argument("--max-id", type=int)
+    ap.add_argument("--include-archived", action="store_true")
+    ap.add_argument("-o", "--output", help="file to write (default stdout)")
+    args = ap.parse_args()
+
+    if args.table == "questions":
+        stmt = questions_stmt(args.status, args.subject, args.min_id, args.max_id, args.include_archived)
+        columns = QUESTION_COLUMNS
+    else:
+        stmt = mentors_stmt(args.subject, args.min_id, args.max_id)
+        columns = MENTOR_COLUMNS
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in stream(stmt, columns, args.format, args.gzip):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# idempotency.py
+"""
+Stored responses for POST /questions/post and /questions/accept sent with an
+Idempotency-Key header (table idempotency_keys, primary key (scope, key)).
+
+  lookup   one primary-key SELECT; a hit is replayed as is, so a retried post
+           runs no ML and inserts no second question, and a retried accept
+           gets its original answer instead of "Already accepted"
+  store    written in the same transaction as the question / accept, so the
+           effect and its stored response commit together. Two requests with
+           the same key racing each other both miss the lookup, but only the
+           first commit wins the primary key; the other rolls back and
+           replays the winner's response
+  purge    drops keys older than IDEMPOTENCY_TTL_HOURS; run by the match
+           workers every IDEMPOTENCY_PURGE_SECONDS, on startup (migrations.py)
+           and by hand:
+               python idempotency.py
+
+Only successful responses are stored: a request that failed changed nothing
+and is simply run again. Reusing a key with a different body is refused (422).
+"""
+import os
+import json
+import hashlib
+
+from sqlalchemy import text
+
+from db import SessionLocal
+from models import IdempotencyKey
+
+IDEMPOTENCY_TTL_HOURS = float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PURGE_SECONDS = float(os.environ.get("IDEMPOTENCY_PURGE_SECONDS", "3600"))
+MAX_KEY_LENGTH = 255
+REPLAY_HEADER = "Idempotent-Replayed"
+
+_CUTOFF = "datetime('now', :age)"
+
+
+def request_hash(body: dict) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+                          .encode("utf-8")).hexdigest()
+
+
+def lookup(db, scope: str, key: str):
+    """Stored (request_hash, status_code, response) of an unexpired key, or None."""
+    return db.execute(text(
+        f"SELECT request_hash, status_code, response FROM idempotency_keys "
+        f"WHERE scope = :scope AND key = :key AND created_at >= {_CUTOFF}"
+    ), {"scope": scope, "key": key, "age": f"-{IDEMPOTENCY_TTL_HOURS:g} hours"}).first()
+
+
+def store(db, scope: str, key: str, req_hash: str, status_code: int, response: str):
+    """Remember the JSON response sent for key. Does not commit."""
+    # an expired row with the same key may still be there until the next purge
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+        IdempotencyKey.created_at < text(_CUTOFF).bindparams(age=f"-{IDEMPOTENCY_TTL_HOURS:g} hours"),
+    ).delete(synchronize_session=False)
+    db.add(IdempotencyKey(scope=scope, key=key, request_hash=req_hash, status_code=status_code, response=response))
+
+
+def purge(db) -> int:
+    """Delete expired keys -> rows deleted. Does not commit."""
+    return db.execute(text(f"DELETE FROM idempotency_keys WHERE created_at < {_CUTOFF}"),
+                      {"age": f"-{IDEMPOTENCY_TTL_HOURS:g} hours"}).rowcount
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        n = purge(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"purged {n} expired idempotency keys")
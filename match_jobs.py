@@ -0,0 +1,103 @@
+# match_jobs.py
+"""
+SQLite-backed job queue for async question matching (table match_jobs).
+
+  enqueue      POST /questions/post in async mode, same transaction as the question
+  claim        atomically move the oldest due job to "running" (UPDATE ... RETURNING)
+  finish/fail  "done", or back to "queued" with exponential backoff until
+               JOB_MAX_ATTEMPTS, then "failed"
+  requeue_expired  jobs "running" longer than JOB_LEASE_SECONDS (dead worker) go back
+               to the queue; their attempt still counts, so a job that keeps killing
+               its worker ends up "failed"
+  queue_stats  depth per status, oldest queued age, retries (GET /questions/jobs/stats)
+
+All timestamps are SQLite datetime('now') (UTC) so every process agrees.
+"""
+import os
+
+from sqlalchemy import text
+
+from models import MatchJob
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_BACKOFF_SECONDS = float(os.environ.get("JOB_BACKOFF_SECONDS", "2"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "300"))
+
+
+def enqueue(db, question_id: int):
+    """Queue matching for a question. Does not commit."""
+    db.add(MatchJob(question_id=question_id))
+
+
+def claim(db, worker: str):
+    """Claim the oldest due job -> (job_id, question_id, attempts) or None. Commits."""
+    row = db.execute(text(
+        "UPDATE match_jobs SET status = 'running', locked_by = :worker, locked_at = datetime('now'), "
+        "attempts = attempts + 1 "
+        "WHERE id = (SELECT id FROM match_jobs WHERE status = 'queued' AND available_at <= datetime('now') "
+        "            ORDER BY available_at, id LIMIT 1) "
+        "AND status = 'queued' "
+        "RETURNING id, question_id, attempts"), {"worker": worker}).first()
+    db.commit()
+    return tuple(row) if row else None
+
+
+def finish(db, job_id: int):
+    """Mark a job done. Does not commit (commit together with the question update)."""
+    db.execute(text(
+        "UPDATE match_jobs SET status = 'done', finished_at = datetime('now'), last_error = NULL "
+        "WHERE id = :id"), {"id": job_id})
+
+
+def fail(db, job_id: int, attempts: int, error: str):
+    """Retry with backoff, or give up after JOB_MAX_ATTEMPTS -> True if given up. Commits."""
+    if attempts >= JOB_MAX_ATTEMPTS:
+        db.execute(text(
+            "UPDATE match_jobs SET status = 'failed', finished_at = datetime('now'), last_error = :err "
+            "WHERE id = :id"), {"id": job_id, "err": error})
+        db.execute(text(
+            "UPDATE questions SET status = 'match_failed' "
+            "WHERE id = (SELECT question_id FROM match_jobs WHERE id = :id)"), {"id": job_id})
+        db.commit()
+        return True
+    delay = JOB_BACKOFF_SECONDS * (2 ** (attempts - 1))
+    db.execute(text(
+        "UPDATE match_jobs SET status = 'queued', locked_by = NULL, locked_at = NULL, last_error = :err, "
+        "available_at = datetime('now', :delay) WHERE id = :id"),
+        {"id": job_id, "err": error, "delay": f"+{delay:g} seconds"})
+    db.commit()
+    return False
+
+
+def requeue_expired(db):
+    """Return jobs whose worker stopped mid-run to the queue (or fail them when out of attempts). Commits."""
+    params = {"lease": f"-{JOB_LEASE_SECONDS} seconds", "max": JOB_MAX_ATTEMPTS}
+    expired = "status = 'running' AND locked_at < datetime('now', :lease)"
+    db.execute(text(
+        "UPDATE questions SET status = 'match_failed' WHERE id IN "
+        f"(SELECT question_id FROM match_jobs WHERE {expired} AND attempts >= :max)"), params)
+    db.execute(text(
+        "UPDATE match_jobs SET status = 'failed', finished_at = datetime('now'), "
+        f"last_error = 'lease expired' WHERE {expired} AND attempts >= :max"), params)
+    n = db.execute(text(
+        "UPDATE match_jobs SET status = 'queued', locked_by = NULL, locked_at = NULL, "
+        f"available_at = datetime('now') WHERE {expired}"), params).rowcount
+    db.commit()
+    return n
+
+
+def queue_stats(db):
+    counts = dict(db.execute(text("SELECT status, count(*) FROM match_jobs GROUP BY status")).fetchall())
+    oldest = db.execute(text(
+        "SELECT (julianday('now') - julianday(min(created_at))) * 86400 FROM match_jobs "
+        "WHERE status = 'queued'")).scalar()
+    retried = db.execute(text(
+        "SELECT count(*) FROM match_jobs WHERE attempts > 1 OR (attempts = 1 AND status = 'queued')")).scalar()
+    return {
+        "queued": counts.get("queued", 0),
+        "running": counts.get("running", 0),
+        "done": counts.get("done", 0),
+        "failed": counts.get("failed", 0),
+        "oldest_queued_seconds": round(oldest, 1) if oldest is not None else None,
+        "retried": retried,
+    }
@@ -0,0 +1,226 @@
+# matching_service.py
+"""
+Question matching pipeline: keywords, price, mentor matching and the combined
+matched-mentor order stored on the question.
+
+Shared by POST /questions/post (sync mode, runs inside the request) and the
+background match worker (worker.py, async mode).
+
+The pipeline runs within a time budget (MATCH_BUDGET_MS, or QuestionIn.budget_ms),
+using the stage costs learned in deadline.py. YAKE extraction that would not
+fit is replaced by the "fast" extractor (vocab terms or the question's own
+words). Mentor scoring takes the first tier that fits:
+
+    full      the strategy as configured
+    no_char   without char n-gram features (only strategies that have them)
+    subject   also only the mentors teaching the question's subject
+    overlap   keyword overlap with the subject's mentors, no similarity scoring
+
+The tier is returned with the post and counted as match.tier.<tier>.
+"""
+import os
+import time
+from collections import namedtuple
+
+import deadline
+import metrics
+import queries
+import shadow
+from ml.advanced_matcher import KEYWORD_EXTRACTOR, extract_keywords, predict_price
+from ml.mentor_snapshot import get_snapshot
+from ml import near_duplicates, strategies
+from ml.strategies import overlap_score
+from pubsub import broker, mentor_channel
+
+# "sync":  POST /questions/post matches before responding (default)
+# "async": store the question as "pending_match" and match in worker.py;
+#          a request can override with QuestionIn.async_match
+POST_MODE = os.environ.get("POST_MODE", "sync")
+MATCH_BUDGET_MS = float(os.environ.get("MATCH_BUDGET_MS", "250"))   # 0 = no budget
+TIERS = ("full", "no_char", "subject", "overlap")
+
+# tier: one of TIERS, or "reused" for a near-duplicate's match
+MatchResult = namedtuple("MatchResult", "keywords price matched_ids ml_scores snapshot tier", defaults=(None,))
+
+
+def match_question(db, text: str, subject: str, strategy: str = None, budget_ms: float = None) -> MatchResult:
+    """Run the pipeline with the named matching strategy (default strategies.MATCH_STRATEGY) within budget_ms."""
+    with metrics.timer("match.pipeline_ms"):
+        return _match_question(db, text, subject, strategy or strategies.MATCH_STRATEGY,
+                               deadline.Budget(MATCH_BUDGET_MS if budget_ms is None else budget_ms))
+
+
+def _scoring_tier(budget, strategy, n_all, n_subject):
+    """-> (tier, cost stage, candidate count) of the first tier whose predicted scoring cost fits."""
+    char = strategies.uses_char_ngrams(strategy)
+    full_stage = f"score.{strategy}.char" if char else f"score.{strategy}"
+    for tier, stage, units in (("full", full_stage, n_all),
+                               ("no_char", f"score.{strategy}", n_all),
+                               ("subject", f"score.{strategy}", n_subject)):
+        if (tier == "no_char" and not char) or (tier == "subject" and not n_subject):
+            continue
+        if budget.fits(stage, units, like=full_stage):
+            return tier, stage, units
+    return "overlap", "score.overlap", n_subject or n_all
+
+
+def _match_question(db, text: str, subject: str, strategy: str, budget) -> MatchResult:
+    # ML keyword extraction, once: the top 8 go to matching, the top 6 are stored
+    mode = KEYWORD_EXTRACTOR
+    if mode != "fast" and not budget.fits(f"keywords.{mode}", len(text or "")):
+        mode = "fast"
+        metrics.incr("match.keywords_fast")
+    with budget.stage(f"keywords.{mode}", len(text or "")):
+        query_keywords = extract_keywords(text, top_k=8, mode=mode)
+    keywords = query_keywords[:6]
+
+    # ML price prediction (unchanged technique)
+    price = predict_price(text, subject)
+
+    # mentors who teach the subject (fallback / boost), from the in-memory mentor snapshot
+    snapshot = get_snapshot(db)
+    db_ids = snapshot.mentor_ids_for_subject(subject)
+
+    # ML mentor matching - returns list of {"mentor_id":.., "score":..}
+    tier, stage, units = _scoring_tier(budget, strategy, len(snapshot.ids), len(db_ids))
+    metrics.incr(f"match.tier.{tier}")
+    start = time.perf_counter()
+    with budget.stage(stage, units):
+        ml_matches = strategies.match(
+            "overlap" if tier == "overlap" else strategy, text, subject, db, keywords=query_keywords,
+            char_ngrams=tier == "full", candidates=db_ids if tier in ("subject", "overlap") and db_ids else None,
+        ) or []
+    strategy_ms = (time.perf_counter() - start) * 1000
+    if tier == "full":
+        metrics.observe(f"match.strategy.{strategy}_ms", strategy_ms)
+
+    # Build maps/lists from ML output (handle older format if ml returned ints)
+    ml_ids = []
+    ml_scores_map = {}
+    for entry in ml_matches:
+        # entry may be dict {"mentor_id":..., "score":...} or an int string/id
+        if isinstance(entry, dict) and "mentor_id" in entry:
+            mid = int(entry["mentor_id"])
+            ml_ids.append(mid)
+            ml_scores_map[mid] = float(entry.get("score", 0.0))
+        else:
+            # try convert raw value to int
+            try:
+                mid = int(entry)
+                ml_ids.append(mid)
+            except Exception:
+                pass
+
+    # sampled comparison against SHADOW_STRATEGY, off the request path
+    if tier == "full":
+        shadow.maybe_submit(text, subject, strategy, ml_ids, strategy_ms)
+
+    # Combine: keep ML ordering, but ensure DB subject mentors are included
+    combined_order = []
+    for mid in ml_ids:
+        if mid not in combined_order:
+            combined_order.append(mid)
+    for mid in db_ids:
+        if mid not in combined_order:
+            combined_order.append(mid)
+
+    # absolute fallback: all mentors
+    if not combined_order:
+        combined_order = list(snapshot.ids)
+
+    return MatchResult(keywords, price, combined_order, ml_scores_map, snapshot, tier)
+
+
+def reuse_duplicate(db, text: str, subject: str):
+    """
+    Near-duplicate lookup before matching -> (MatchResult or None, duplicate_of, signature).
+    On a hit the recent question's keywords, price, matched mentors and ML scores
+    are reused (mentors without a stored score fall back to keyword overlap) and
+    duplicate_of is the first question of the duplicate chain. Index the new
+    question with the signature (and result.ml_scores) either way.
+    """
+    with metrics.timer("dedupe.check_ms"):
+        sig = near_duplicates.signature(text)
+        found = near_duplicates.find_duplicate(db, text, subject, sig=sig)
+        orig = queries.question_by_id(db, found[0]) if found else None
+    if orig is None or not orig.matched_mentors or orig.status in ("pending_match", "match_failed"):
+        metrics.incr("dedupe.miss")
+        return None, None, sig
+    metrics.incr("dedupe.hit")
+    result = MatchResult(
+        keywords=[k for k in (orig.keywords or "").split(",") if k],
+        price=orig.price,
+        matched_ids=[int(m) for m in orig.matched_mentors.split(",") if m.strip().isdigit()],
+        ml_scores=found[2],
+        snapshot=get_snapshot(db),
+        tier="reused",
+    )
+    return result, orig.duplicate_of or orig.id, sig
+
+
+def dedupe_stats():
+    """Hit rate of near-duplicate reuse and the matching time it saved (this process)."""
+    hits, misses = metrics.count("dedupe.hit"), metrics.count("dedupe.miss")
+    checks = hits + misses
+    check_ms, pipeline_ms = metrics.mean("dedupe.check_ms"), metrics.mean("match.pipeline_ms")
+    return {
+        "checks": checks,
+        "hits": hits,
+        "hit_rate": round(hits / checks, 4) if checks else 0.0,
+        "mean_check_ms": round(check_ms, 3),
+        "mean_pipeline_ms": round(pipeline_ms, 3),
+        # each hit skips one pipeline run; every post pays the check
+        "saved_ms": round(hits * pipeline_ms - checks * check_ms, 1),
+    }
+
+
+def apply_match(q, result: MatchResult):
+    """Store a match result on the question (matched mentors as CSV for compatibility)."""
+    q.keywords = ",".join(result.keywords)
+    q.price = result.price
+    q.matched_mentors = ",".join([str(x) for x in result.matched_ids])
+    q.status = "matched"
+
+
+def matched_mentor_list(result: MatchResult):
+    """Mentor objects for the frontend (name, subjects, computed score 0..1)."""
+    mentors_list = []
+    for mid in result.matched_ids:
+        m = result.snapshot.get(int(mid))
+        if not m:
+            continue
+        # prefer ML-provided score if present (ml_scores stores percent 0..100)
+        raw_score = result.ml_scores.get(m.id)
+        if raw_score is None:
+            # fallback to overlap 0..1
+            normalized_score = overlap_score(m, result.keywords)
+        else:
+            # ml returned percent (0..100) — convert to 0..1 to keep frontend expectation
+            try:
+                normalized_score = float(raw_score) / 100.0
+            except Exception:
+                normalized_score = overlap_score(m, result.keywords)
+
+        mentors_list.append({
+            "id": m.id,
+            "name": m.name,
+            "subjects": m.subjects_text.split(",") if m.subjects_text else [],
+            "score": normalized_score  # 0..1 float (frontend expects this)
+        })
+    return mentors_list
+
+
+def feed_item(q):
+    return {
+        "id": q.id,
+        "text": q.text,
+        "subject": q.subject,
+        "keywords": q.keywords,
+        "price": q.price,
+        "status": q.status,
+    }
+
+
+def publish_new(q, matched_ids):
+    """Push a freshly matched question to the matched mentors' inbox streams."""
+    broker.publish([mentor_channel(mid) for mid in matched_ids], {"type": "new", "data": {"question": feed_item(q)}})
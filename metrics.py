@@ -0,0 +1,67 @@
+# metrics.py
+"""
+Process-local counters and timings, exposed on GET /metrics (app.py).
+
+    metrics.incr("dedupe.hit")
+    metrics.observe("match.pipeline_ms", 12.5)
+    metrics.set_gauge("admission.limit", 3.5)
+    with metrics.timer("dedupe.check_ms"): ...
+
+Values are per process and reset on restart.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}   # name -> [count, total, max]
+_gauges = {}    # name -> last value
+
+
+def incr(name: str, n: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name: str, value: float):
+    with _lock:
+        t = _timings.setdefault(name, [0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += value
+        t[2] = max(t[2], value)
+
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+
+@contextmanager
+def timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, (time.perf_counter() - start) * 1000)
+
+
+def count(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def mean(name: str) -> float:
+    with _lock:
+        t = _timings.get(name)
+        return t[1] / t[0] if t and t[0] else 0.0
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "timings": {name: {"count": c, "mean": round(total / c, 3) if c else 0.0, "max": round(mx, 3)}
+                        for name, (c, total, mx) in _timings.items()},
+            "gauges": dict(_gauges),
+        }
@@ -0,0 +1,139 @@
+# migrations.py
+"""
+Idempotent in-place migrations for the SQLite database.
+
+Runs on app startup (app.py) and can be run manually:
+    python migrations.py
+Each step must be safe to re-run; new tables are created by create_all first.
+"""
+from sqlalchemy import inspect
+
+from db import SessionLocal, engine
+from models import Base
+from ml.mentor_keywords import migrate_solved_keywords
+from ml.mentor_profiles import migrate_profile_vectors
+from ml.mentor_subjects import migrate_mentor_subjects
+from ml.mentor_snapshot import mark_changed, trim_changes
+from ml.fts_search import ensure_fts
+from ml.near_duplicates import trim_signatures
+from earnings import migrate_opening_balances, rollup
+from idempotency import purge as purge_idempotency_keys
+from stats import ensure_stats
+
+
+def migrate_mentor_keyword_stats(db):
+    n = migrate_solved_keywords(db)
+    if n:
+        mark_changed(db)
+        print(f"migrated solved_keywords of {n} mentors into mentor_keyword_stats")
+
+
+def migrate_mentor_profile_vectors(db):
+    n = migrate_profile_vectors(db)
+    if n:
+        mark_changed(db)
+        print(f"seeded profile vectors for {n} mentors")
+
+
+def migrate_mentor_subject_rows(db):
+    n = migrate_mentor_subjects(db)
+    if n:
+        mark_changed(db)
+        print(f"migrated subjects of {n} mentors into mentor_subjects")
+
+
+def trim_mentor_changes(db):
+    n = trim_changes(db)
+    if n:
+        print(f"trimmed {n} old mentor_changes rows")
+
+
+def add_missing_columns(db):
+    # create_all does not alter existing tables; only nullable columns without defaults land here
+    conn = db.connection()
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                assert column.nullable and column.server_default is None, f"cannot add {table.name}.{column.name}"
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                                     f"{column.type.compile(dialect=conn.dialect)}")
+                print(f"added column {table.name}.{column.name}")
+
+
+def create_missing_indexes(db):
+    # create_all only creates missing tables; indexes added to existing tables land here
+    conn = db.connection()
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspect(conn).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                print(f"created index {index.name}")
+
+
+def trim_question_signatures(db):
+    n = trim_signatures(db)
+    if n:
+        print(f"trimmed near-duplicate signatures of {n} old questions")
+
+
+def migrate_mentor_balances(db):
+    n = migrate_opening_balances(db)
+    if n:
+        print(f"moved legacy balances of {n} mentors into earnings_ledger")
+
+
+def rollup_mentor_balances(db):
+    rollup(db)
+
+
+def purge_expired_idempotency_keys(db):
+    n = purge_idempotency_keys(db)
+    if n:
+        print(f"purged {n} expired idempotency keys")
+
+
+def create_stats_summaries(db):
+    if ensure_stats(db):
+        print("created and filled question_stats and mentor_leaderboard")
+
+
+def create_fts_indexes(db):
+    for name in ensure_fts(db):
+        print(f"created and filled full-text index {name}")
+
+
+MIGRATIONS = [
+    add_missing_columns,
+    create_missing_indexes,
+    migrate_mentor_keyword_stats,
+    migrate_mentor_profile_vectors,
+    migrate_mentor_subject_rows,
+    trim_mentor_changes,
+    create_fts_indexes,
+    trim_question_signatures,
+    migrate_mentor_balances,
+    rollup_mentor_balances,
+    create_stats_summaries,
+    purge_expired_idempotency_keys,
+]
+
+
+def run_migrations():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for step in MIGRATIONS:
+            step(db)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print("Migrations complete")
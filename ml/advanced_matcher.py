@@ -7,8 +7,10 @@ import numpy as np
 import difflib
 import yake
 
-from models import User
-from sklearn.feature_extraction.text import TfidfVectorizer
+from ml.mentor_snapshot import get_snapshot
+from ml import mentor_profiles, ann_index, fts_search
+from ml.keyword_automaton import KeywordAutomaton
+from sklearn.feature_extraction.text import TfidfVectorizer, ENGLISH_STOP_WORDS
 from sklearn.metrics.pairwise import cosine_similarity
 
 # -------------------------
@@ -19,8 +21,27 @@ MODEL_PATH = os.path.join(HERE, "model_advanced.pkl")
 VOCAB_PATH = os.path.join(HERE, "subject_vocab.json")  # built by build_subject_vocab.py
 _kw_extractor = yake.KeywordExtractor(lan="en", n=1, top=12)
 
+# "profile": dot product against stored mentor vectors (ml/mentor_profiles.py)
+# "ann":     approximate search over the same vectors (ml/ann_index.py), falls
+#            back to "profile" when no index has been built
+# "sharded": "profile" scoring fanned out to worker processes (ml/sharded_matcher.py)
+# "fts":     BM25 candidates from the mentors_fts FTS5 table (ml/fts_search.py),
+#            scored as "profile"; falls back to "profile" when nothing matches
+# "tfidf":   re-fit word + char TF-IDF over all mentor profiles per request
+MATCH_ENGINE = os.environ.get("MATCH_ENGINE", "profile")
+FTS_CANDIDATES = int(os.environ.get("FTS_CANDIDATES", "50"))
+
+# "yake":      YAKE candidates fuzzily mapped into subject_vocab.json
+# "automaton": one Aho-Corasick pass for vocab unigrams/bigrams (ml/keyword_automaton.py),
+#              falling back to "yake" for mostly out-of-vocab questions
+# "fast":      "automaton", falling back to the question's own words instead of YAKE
+#              (what matching_service uses when YAKE would not fit the time budget)
+KEYWORD_EXTRACTOR = os.environ.get("KEYWORD_EXTRACTOR", "yake")
+AUTOMATON_MIN_COVERAGE = float(os.environ.get("AUTOMATON_MIN_COVERAGE", "0.5"))
+
 model = None
 _subject_vocab = None  # lazy-loaded dict: { subject: [token1, token2, ...] }
+_automaton = None      # lazy-built KeywordAutomaton over the vocab terms
 
 # -------------------------
 # Utilities
@@ -85,10 +106,59 @@ STOPWORDS = set([
     "sr", "sir", "urgent", "plz"
 ])
 
-def extract_keywords(text: str, top_k: int = 6):
+def _get_automaton():
+    """Automaton over every vocab unigram/bigram (empty when subject_vocab.json is missing)."""
+    global _automaton
+    if _automaton is None:
+        terms = []
+        for toks in _load_subject_vocab().values():
+            for t in toks:
+                t = _normalize_text(t)
+                words = t.split()
+                if (len(t) > 2 and len(words) <= 2
+                        and not any(w in STOPWORDS or w in ENGLISH_STOP_WORDS for w in words)):
+                    terms.append(t)
+        _automaton = KeywordAutomaton(terms)
+    return _automaton
+
+def _automaton_keywords(txt: str, top_k: int):
+    """
+    Canonical vocab terms found in the question, in the shape the YAKE path returns:
+    single words first (most frequent, then by position), bigrams only fill the
+    remaining slots when they add a word not already returned.
+    Returns [] when the vocab covers under AUTOMATON_MIN_COVERAGE of the question's
+    content words, so mostly out-of-vocab questions go to YAKE instead.
+    """
+    norm = _normalize_text(txt)
+    counts, first = {}, {}
+    for start, term in _get_automaton().find(norm):
+        counts[term] = counts.get(term, 0) + 1
+        first.setdefault(term, start)
+
+    content = {w for w in norm.split() if len(w) > 2 and w not in STOPWORDS and w not in ENGLISH_STOP_WORDS}
+    covered = {w for term in counts for w in term.split()}
+    if not content or len(content & covered) < AUTOMATON_MIN_COVERAGE * len(content):
+        return []
+
+    ranked = sorted(counts, key=lambda t: (" " in t, -counts[t], first[t]))
+    out, words = [], set()
+    for term in ranked:
+        parts = term.split()
+        if len(parts) > 1 and words.issuperset(parts):
+            continue
+        out.append(term)
+        words.update(parts)
+        if len(out) >= top_k:
+            break
+    return out
+
+def extract_keywords(text: str, top_k: int = 6, mode: str = None):
     """
     Data-driven keyword extraction:
       - If comma-separated short list, prefer that splitting.
+      - mode "automaton" (default: KEYWORD_EXTRACTOR): return the vocab terms found
+        by the automaton; mostly out-of-vocab questions fall through to YAKE
+        ("fast": to the question's words, never running YAKE).
       - Otherwise use YAKE to extract candidate tokens.
       - Map tokens to canonical subject tokens via the subject_vocab.json (fuzzy).
       - Return deduped canonical tokens (or normalized tokens if no mapping).
@@ -98,11 +168,20 @@ def extract_keywords(text: str, top_k: int = 6):
 
     txt = text.strip()
     tokens = []
+    comma_list = ',' in txt and len(txt.split(',')) <= 12
+
+    mode = mode or KEYWORD_EXTRACTOR
+    if mode in ("automaton", "fast") and not comma_list:
+        found = _automaton_keywords(txt, top_k)
+        if found:
+            return found
 
     # If looks like a short comma list, split and use parts directly
-    if ',' in txt and len(txt.split(',')) <= 12:
+    if comma_list:
         parts = [p.strip() for p in txt.split(',') if p.strip()]
         tokens = parts
+    elif mode == "fast":
+        tokens = txt.split()
     else:
         # try YAKE
         try:
@@ -152,56 +231,22 @@ def predict_price(text, subject):
         length = max(1, len((text or "").split()))
         return max(10, round(20 + length * 2, 2))
 
-    vectorizer = m.get("vectorizer")
     reg = m.get("price_model")
-    subject_map = m.get("subject_map", {})
-
-    length = len((text or "").split())
-    complexity = length / 5
-    demand = 1.5
-    subj_enc = subject_map.get((subject or "").lower(), 0)
-
-    X = np.array([[length, complexity, demand, subj_enc]])
+    X = np.array([price_features(text, subject, m.get("subject_map", {}))])
     price = reg.predict(X)[0]
     return max(10, round(price, 2))
 
+
+def price_features(text, subject, subject_map):
+    """[length, complexity, demand, subject code] -- the price model's input, at serving and training time."""
+    length = len((text or "").split())
+    return [length, length / 5, 1.5, subject_map.get((subject or "").lower(), 0)]
+
 # -------------------------
 # Matching function (robust)
 # -------------------------
-def match_mentors(question_text: str, subject: str, db, top_k: int = 5):
-    """
-    Robust matching using:
-     - data-driven keyword extraction (extract_keywords)
-     - augment question with subject + canonical keywords
-     - compute word-level TF-IDF and char_wb TF-IDF and combine
-     - boost mentors that explicitly list the subject or share canonical keywords
-
-    Returns list of dicts: [{"mentor_id": <int>, "score": <0..100 float>}, ...]
-    """
-    question_text = (question_text or "").strip()
-    subject = (subject or "").strip().lower()
-
-    mentors = db.query(User).filter(User.role == "mentor").all()
-    if not mentors:
-        return []
-
-    # Extract keywords and canonicalize
-    keywords = extract_keywords(question_text, top_k=8)
-
-    # Augment question text so TF-IDF vocabulary includes subject + detected keywords
-    augmented_question = " ".join(filter(None, [question_text, subject, " ".join(keywords)]))
-    augmented_question = _normalize_text(augmented_question)
-
-    # Build mentor profile texts (subjects + solved_keywords)
-    mentor_texts = []
-    mentor_ids = []
-    for m in mentors:
-        subj_text = (m.subjects or "")
-        solved_text = (m.solved_keywords or "")
-        profile = f"{subj_text} {solved_text}"
-        mentor_texts.append(_normalize_text(profile))
-        mentor_ids.append(m.id)
-
+def _tfidf_similarities(augmented_question, mentor_texts, char_ngrams=True):
+    """Per-request word + char_wb TF-IDF cosine similarity (0..1) against mentor profiles (word only without char_ngrams)."""
     # Corpus for TF-IDF
     corpus_word = [augmented_question] + mentor_texts
     corpus_char = [augmented_question] + mentor_texts
@@ -215,6 +260,8 @@ def match_mentors(question_text: str, subject: str, db, top_k: int = 5):
         sims_word = cosine_similarity(qw, mw).flatten()
     except Exception:
         sims_word = np.zeros(len(mentor_texts))
+    if not char_ngrams:
+        return sims_word
 
     # Char n-gram (char_wb) TF-IDF for robustness to misspellings / short tokens
     try:
@@ -227,32 +274,107 @@ def match_mentors(question_text: str, subject: str, db, top_k: int = 5):
         sims_char = np.zeros(len(mentor_texts))
 
     # Combine scores with weighting (tweakable)
-    sims_combined = (0.75 * sims_word) + (0.25 * sims_char)
+    return (0.75 * sims_word) + (0.25 * sims_char)
+
+
+def prepare_query(question_text: str, subject: str, keywords=None):
+    """Normalize the query -> (subject, canonical keywords, augmented question text); keywords: already extracted top 8."""
+    question_text = (question_text or "").strip()
+    subject = (subject or "").strip().lower()
+
+    # Extract keywords and canonicalize
+    if keywords is None:
+        keywords = extract_keywords(question_text, top_k=8)
+
+    # Augment question text so TF-IDF vocabulary includes subject + detected keywords
+    augmented_question = " ".join(filter(None, [question_text, subject, " ".join(keywords)]))
+    augmented_question = _normalize_text(augmented_question)
+    return subject, keywords, augmented_question
+
+
+def boost_score(base_percent: float, subject: str, mentor_subj_tokens, profile_text: str, keywords):
+    """Final 0..100 score of one mentor from its base similarity percent."""
+    score = float(base_percent)
+
+    # boost if mentor explicitly lists the subject token (exact token match)
+    if subject and subject in mentor_subj_tokens:
+        score += 12.0  # absolute boost
+
+    # small boost for each canonical keyword match in mentor profile
+    for kw in keywords:
+        if kw and kw in profile_text:
+            score += 6.0
+
+    # cap
+    return min(100.0, round(score, 4))
+
+
+def match_mentors(question_text: str, subject: str, db, top_k: int = 5, engine: str = None, keywords=None,
+                  char_ngrams: bool = True, candidates=None):
+    """
+    Robust matching using:
+     - data-driven keyword extraction (extract_keywords)
+     - augment question with subject + canonical keywords
+     - similarity against mentor profiles, by engine:
+         "profile": stored mentor vectors (read-only dot product)
+         "ann":     approximate candidates from the IVF index, then as "profile"
+         "sharded": "profile" scoring split across worker processes
+         "fts":     BM25 candidates from the FTS5 mentor index, then as "profile"
+         "tfidf":   word-level TF-IDF and char_wb TF-IDF fitted per request
+     - boost mentors that explicitly list the subject or share canonical keywords
+
+    keywords:    the question's top 8 keywords if already extracted
+    char_ngrams: False skips char n-gram features (engine "tfidf", hashed profile space)
+    candidates:  score only these mentor ids ("ann" / "fts" / "sharded" then score as "profile")
+
+    Returns list of dicts: [{"mentor_id": <int>, "score": <0..100 float>}, ...]
+    """
+    engine = engine or MATCH_ENGINE
+    if candidates is not None and engine in ("ann", "fts", "sharded"):
+        engine = "profile"
+    if engine == "sharded":
+        from ml import sharded_matcher
+        return sharded_matcher.match_mentors(question_text, subject, db, top_k=top_k, keywords=keywords,
+                                             char_ngrams=char_ngrams)
+
+    subject, keywords, augmented_question = prepare_query(question_text, subject, keywords)
+
+    ann_sims = None
+    if engine == "ann" and ann_index.load_index() is not None:
+        # only the ANN candidates are loaded, boosted and ranked
+        found = ann_index.load_index().search(mentor_profiles.text_vector(augmented_question, char_ngrams))
+        ann_sims = dict(found)
+        mentors = get_snapshot(db).mentors(ann_sims)
+    else:
+        if engine == "fts":
+            # BM25 only picks the candidates; they are scored like "profile"
+            found = fts_search.search_mentors(db, augmented_question, limit=FTS_CANDIDATES)
+            candidates = [mid for mid, _ in found] or None
+        if engine in ("ann", "fts"):
+            engine = "profile"
+        mentors = get_snapshot(db).mentors(candidates)
+    if not mentors:
+        return []
+
+    # profile texts (subjects + solved keywords) come prebuilt with the snapshot records;
+    # only the per-request TF-IDF fit (and mentors without a stored vector) need them normalized
+    mentor_ids = [m.id for m in mentors]
+    if ann_sims is not None:
+        sims_combined = np.asarray([ann_sims[mid] for mid in mentor_ids])
+    elif engine == "profile":
+        sims_combined = mentor_profiles.score_mentors(db, augmented_question, mentor_ids,
+                                                      lambda i: _normalize_text(mentors[i].profile), char_ngrams)
+    else:
+        sims_combined = _tfidf_similarities(augmented_question, [_normalize_text(m.profile) for m in mentors],
+                                            char_ngrams)
 
     # Convert to percent base
     base_percent = (sims_combined * 100.0).round(4)
 
     # Apply boosting for subject matches / keyword matches
     final_scores = []
-    for idx, mid in enumerate(mentor_ids):
-        m = mentors[idx]
-        score = float(base_percent[idx])
-
-        # boost if mentor explicitly lists the subject token (exact token match)
-        if subject:
-            mentor_subj_tokens = [s.strip().lower() for s in (m.subjects or "").split(",") if s.strip()]
-            if subject in mentor_subj_tokens:
-                score += 12.0  # absolute boost
-
-        # small boost for each canonical keyword match in mentor profile
-        profile_text = ( (m.subjects or "") + " " + (m.solved_keywords or "") ).lower()
-        for kw in keywords:
-            if kw and kw in profile_text:
-                score += 6.0
-
-        # cap
-        score = min(100.0, round(score, 4))
-        final_scores.append(score)
+    for idx, m in enumerate(mentors):
+        final_scores.append(boost_score(base_percent[idx], subject, m.subjects, m.profile, keywords))
 
     # Build return list
     scored = [{"mentor_id": int(mid), "score": float(sc)} for mid, sc in zip(mentor_ids, final_scores)]
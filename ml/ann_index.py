@@ -0,0 +1,221 @@
+# backend/ml/ann_index.py
+"""
+Approximate nearest-neighbour retrieval over the stored mentor profile vectors
+(ml/mentor_profiles.py), used by match_mentors(engine="ann").
+
+IVF-style clustered index, NumPy + scikit-learn only:
+  build:  spherical k-means (MiniBatchKMeans on L2-normalized rows) -> n_lists
+          centroids; every mentor goes to the inverted lists of its n_assign closest
+          centroids
+  query:  score the centroids, visit the n_probe best lists, re-rank their members
+          with the exact dot product and return the best n_candidates
+
+Knobs (env or arguments):
+  ANN_N_LISTS   number of clusters (default ~ sqrt(n_mentors))
+  ANN_N_PROBE   lists visited per query; higher = better recall, slower
+  ANN_N_ASSIGN  lists each mentor is stored in; higher = better recall, bigger index
+  ANN_CANDIDATES mentors handed back to match_mentors for boosting / final top_k
+
+Lifecycle:
+    python -m ml.ann_index build        # build from DB and persist to ml/ann_index.npz
+    load_index()                        # lazy load in the app
+Mentor vectors updated after the build (accepts, new mentors) are kept in a small
+exact overlay until the next build. A full invalidation (mentor_profiles.invalidate()
+without a mentor, e.g. after seed_mentor_keywords.py rebuilt it) drops the loaded
+index, and the next query reloads it from disk.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+
+from ml import mentor_profiles
+
+HERE = os.path.dirname(__file__)
+INDEX_PATH = os.path.join(HERE, "ann_index.npz")
+
+N_LISTS = int(os.environ.get("ANN_N_LISTS", "0"))        # 0 -> sqrt(n)
+N_PROBE = int(os.environ.get("ANN_N_PROBE", "32"))
+N_CANDIDATES = int(os.environ.get("ANN_CANDIDATES", "50"))
+N_ASSIGN = int(os.environ.get("ANN_N_ASSIGN", "2"))
+TRAIN_SAMPLE = 50000    # rows used to fit the centroids
+ASSIGN_CHUNK = 20000    # rows assigned per matrix product during build
+
+_index = None
+
+
+class IVFIndex:
+    """
+    Rows are stored grouped by inverted list (list l = rows list_offsets[l]:list_offsets[l+1]),
+    so probing a list is a contiguous CSR slice. With n_assign > 1 a mentor appears in
+    several lists.
+    """
+
+    def __init__(self, space, list_ids, matrix, centroids, list_offsets, n_probe=N_PROBE):
+        self.space = space
+        self.list_ids = np.asarray(list_ids, dtype=np.int64)   # mentor id of every stored row
+        self.matrix = matrix.tocsr()                  # normalized mentor rows, float32
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.list_offsets = np.asarray(list_offsets, dtype=np.int64)
+        self.n_probe = n_probe
+        self.n_assign = int(np.bincount(np.unique(self.list_ids, return_inverse=True)[1]).max()) if len(self.list_ids) else 1
+        self.overlay = {}                             # mentor_id -> normalized 1 x D row
+
+    @property
+    def mentor_ids(self):
+        return np.unique(self.list_ids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    # -------------------------
+    # build / persist / load
+    # -------------------------
+    @classmethod
+    def build(cls, mentor_ids, matrix, space, n_lists=None, n_probe=N_PROBE, n_assign=None, seed=42):
+        matrix = normalize(sp.csr_matrix(matrix, dtype=np.float32))
+        n = matrix.shape[0]
+        n_lists = n_lists or N_LISTS or max(1, int(np.sqrt(n)))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.RandomState(seed)
+        sample = matrix[rng.choice(n, size=min(n, TRAIN_SAMPLE), replace=False)] if n > TRAIN_SAMPLE else matrix
+        km = MiniBatchKMeans(n_clusters=n_lists, batch_size=max(1024, 4 * n_lists),
+                             n_init=1, random_state=seed)
+        km.fit(sample)
+        centroids = normalize(km.cluster_centers_).astype(np.float32)
+
+        # every mentor goes to its n_assign closest lists ("spill" trades memory for recall)
+        n_assign = max(1, min(n_assign or N_ASSIGN, n_lists))
+        assign = np.empty((n, n_assign), dtype=np.int64)
+        for start in range(0, n, ASSIGN_CHUNK):
+            sims = np.asarray(matrix[start:start + ASSIGN_CHUNK] @ centroids.T)
+            if n_assign == 1:
+                assign[start:start + ASSIGN_CHUNK, 0] = sims.argmax(axis=1)
+            else:
+                assign[start:start + ASSIGN_CHUNK] = np.argpartition(-sims, n_assign - 1, axis=1)[:, :n_assign]
+        rows = np.repeat(np.arange(n), n_assign)
+        assign = assign.ravel()
+
+        list_rows = rows[np.argsort(assign, kind="stable")]
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        list_ids = np.asarray(mentor_ids, dtype=np.int64)[list_rows]
+        return cls(space, list_ids, matrix[list_rows], centroids, list_offsets, n_probe=n_probe)
+
+    @classmethod
+    def build_from_db(cls, db, **kwargs):
+        profiles = mentor_profiles.ProfileIndex.build(db)
+        return cls.build(profiles.mentor_ids, profiles.matrix, mentor_profiles.feature_space(), **kwargs)
+
+    def save(self, path=INDEX_PATH):
+        m = self.matrix
+        tmp = path + ".tmp.npz"   # running processes may load path at any time: replace it atomically
+        np.savez(tmp, space=np.array(self.space), list_ids=self.list_ids,
+                 data=m.data, indices=m.indices, indptr=m.indptr, shape=np.array(m.shape),
+                 centroids=self.centroids, list_offsets=self.list_offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, n_probe=N_PROBE):
+        z = np.load(path)
+        matrix = sp.csr_matrix((z["data"], z["indices"], z["indptr"]), shape=tuple(z["shape"]))
+        return cls(str(z["space"]), z["list_ids"], matrix, z["centroids"],
+                   z["list_offsets"], n_probe=n_probe)
+
+    # -------------------------
+    # query
+    # -------------------------
+    def set_row(self, mentor_id, vec):
+        self.overlay[int(mentor_id)] = normalize(vec)
+
+    def search(self, qvec, k=N_CANDIDATES, n_probe=None):
+        """Return [(mentor_id, cosine), ...] of the ~k best mentors, best first."""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        cscores = np.asarray(qvec @ self.centroids.T).ravel()
+        lists = np.argpartition(-cscores, n_probe - 1)[:n_probe] if n_probe < self.n_lists else np.arange(self.n_lists)
+        # gather the probed lists' rows without copying a CSR submatrix:
+        # row r of list l contributes sum(data[indptr[r]:indptr[r+1]] * q[indices[...]])
+        qdense = np.asarray(qvec.todense(), dtype=np.float32).ravel()
+        rows = np.concatenate([np.arange(self.list_offsets[l], self.list_offsets[l + 1]) for l in lists])
+        indptr = self.matrix.indptr
+        lengths = indptr[rows + 1] - indptr[rows]
+        nnz = np.concatenate([np.arange(indptr[r0], indptr[r1]) for r0, r1 in
+                              zip(self.list_offsets[lists], self.list_offsets[lists + 1])])
+        prod = self.matrix.data[nnz] * qdense[self.matrix.indices[nnz]]
+        sims = np.bincount(np.repeat(np.arange(len(rows)), lengths), weights=prod, minlength=len(rows))
+        ids = self.list_ids[rows]
+
+        if self.overlay:
+            fresh = np.fromiter(self.overlay, dtype=np.int64)
+            keep = ~np.isin(ids, fresh)
+            ids = np.concatenate([ids[keep], fresh])
+            sims = np.concatenate([sims[keep], [float((v @ qvec.T).toarray()[0, 0]) for v in self.overlay.values()]])
+
+        # a mentor occurs at most n_assign times, so the best k * n_assign rows hold k distinct ids
+        limit = k * max(1, self.n_assign)
+        if len(sims) > limit:
+            top = np.argpartition(-sims, limit - 1)[:limit]
+            ids, sims = ids[top], sims[top]
+        out, seen = [], set()
+        for i in np.lexsort((ids, -sims)):
+            mid = int(ids[i])
+            if mid not in seen:
+                seen.add(mid)
+                out.append((mid, float(sims[i])))
+                if len(out) >= k:
+                    break
+        return out
+
+
+def exact_search(matrix, mentor_ids, qvec, k):
+    """Brute-force reference used by the evaluation script."""
+    sims = np.asarray((matrix @ qvec.T).todense()).ravel()
+    top = np.argpartition(-sims, min(k, len(sims) - 1))[:k] if len(sims) > k else np.arange(len(sims))
+    return sorted(((int(mentor_ids[i]), float(sims[i])) for i in top), key=lambda kv: (-kv[1], kv[0]))
+
+
+def load_index():
+    """Load the persisted index if present and built in the current feature space."""
+    global _index
+    if _index is None and os.path.exists(INDEX_PATH):
+        idx = IVFIndex.load(INDEX_PATH)
+        if idx.space == mentor_profiles.feature_space():
+            _index = idx
+            mentor_profiles.add_listener(_on_profile_update)
+    return _index
+
+
+def _on_profile_update(mentor_id, vec):
+    global _index
+    if mentor_id is None:
+        _index = None   # every vector may have changed: reload the (rebuilt) file
+    elif _index is not None and vec is not None:
+        _index.set_row(mentor_id, vec)
+
+
+def build_and_save(db, **kwargs):
+    global _index
+    t0 = time.perf_counter()
+    idx = IVFIndex.build_from_db(db, **kwargs)
+    idx.save(INDEX_PATH)
+    print(f"ANN index: {len(idx.mentor_ids)} mentors, {idx.n_lists} lists, "
+          f"built in {time.perf_counter() - t0:.1f}s -> {INDEX_PATH}")
+    _index = None
+    return idx
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("usage: python -m ml.ann_index build")
+        sys.exit(1)
+    from db import SessionLocal
+    db = SessionLocal()
+    try:
+        build_and_save(db)
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+# backend/ml/bench_keywords.py
+"""
+Latency and agreement of extract_keywords(mode="automaton") vs the YAKE path
+on data/synthetic_questions.csv.
+
+    python -m ml.build_subject_vocab    # once, writes ml/subject_vocab.json
+    python -m ml.bench_keywords
+
+Per question: extraction time of each mode, Jaccard overlap between the two
+keyword sets, and recall of the CSV's own "keywords" column. "fallback" counts
+mostly out-of-vocab questions the automaton handed to YAKE.
+Writes ml/reports/keyword_extraction.txt.
+"""
+import os
+import time
+import argparse
+
+import numpy as np
+
+from ml import advanced_matcher
+from ml.advanced_matcher import extract_keywords, _automaton_keywords
+from ml.eval_ann import _questions
+
+HERE = os.path.dirname(__file__)
+REPORT_PATH = os.path.join(HERE, "reports", "keyword_extraction.txt")
+
+
+def _jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def _recall(found, gold):
+    # a gold word counts when it appears in any found keyword (bigrams included)
+    words = {w for k in found for w in k.split()}
+    return sum(1 for g in gold if g in words) / len(gold) if gold else 1.0
+
+
+def _timed(fn, text, repeat):
+    best = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(text)
+        us = (time.perf_counter() - t) * 1e6
+        best = us if best is None else min(best, us)
+    return out, best
+
+
+def bench(repeat=3, top_k=6):
+    rows = _questions()
+    advanced_matcher._get_automaton()      # build once, outside the timings
+    extract_keywords("warm up yake", mode="yake")
+
+    stats = {"yake": [], "automaton": []}
+    jaccard, recall = [], {"yake": [], "automaton": []}
+    fallback = 0
+    for r in rows:
+        gold = [k.strip().lower() for k in r["keywords"].split(",") if k.strip()]
+        outs = {}
+        for mode in stats:
+            outs[mode], us = _timed(lambda t: extract_keywords(t, top_k=top_k, mode=mode), r["text"], repeat)
+            stats[mode].append(us)
+            recall[mode].append(_recall(outs[mode], gold))
+        fallback += int(not _automaton_keywords(r["text"], top_k))
+        jaccard.append(_jaccard(outs["yake"], outs["automaton"]))
+
+    lines = [f"=== keyword extraction, {len(rows)} questions, "
+             f"{len(advanced_matcher._get_automaton())} vocab terms ==="]
+    for mode, us in stats.items():
+        lines.append(f"{mode:>9}: p50 {np.percentile(us, 50):8.1f} us, p95 {np.percentile(us, 95):8.1f} us, "
+                     f"csv keyword recall {np.mean(recall[mode]):.3f}")
+    lines.append(f"speedup (p50): {np.percentile(stats['yake'], 50) / np.percentile(stats['automaton'], 50):.1f}x")
+    lines.append(f"agreement: mean Jaccard(yake, automaton) {np.mean(jaccard):.3f}, "
+                 f"identical sets {sum(j == 1.0 for j in jaccard)}/{len(rows)}")
+    lines.append(f"automaton fallback to yake: {fallback}/{len(rows)}")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    if not advanced_matcher._load_subject_vocab():
+        raise SystemExit(f"{advanced_matcher.VOCAB_PATH} missing: run python -m ml.build_subject_vocab first")
+
+    lines = bench(repeat=args.repeat)
+    print("\n".join(lines))
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    main()
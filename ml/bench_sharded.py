@@ -0,0 +1,127 @@
+# backend/ml/bench_sharded.py
+"""
+Latency vs shard count for ml/sharded_matcher.py on a synthetic mentor pool,
+plus a ranking-identity check.
+
+    python -m ml.bench_sharded                          # 200k mentors, shards 1 2 4 8
+    python -m ml.bench_sharded --mentors 1000000 --shards 1 2 4 8 16
+    python -m ml.bench_sharded --db                     # also compare with match_mentors on expert_link.db
+
+Every sharded top-k is checked against an in-process single shard over the whole
+pool; --db additionally checks match_mentors(engine="sharded") against
+engine="profile" for questions from data/synthetic_questions.csv.
+Writes ml/reports/sharded_matching.txt.
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from ml import mentor_profiles
+from ml.eval_ann import _questions, synthetic_mentor_matrix
+from ml.sharded_matcher import Shard, ShardPool
+
+HERE = os.path.dirname(__file__)
+REPORT_PATH = os.path.join(HERE, "reports", "sharded_matching.txt")
+
+
+def synthetic_pool(n, rows, seed=42):
+    matrix = synthetic_mentor_matrix(n, rows, seed=seed)
+    rng = np.random.RandomState(seed)
+    by_subject = {}
+    for r in rows:
+        by_subject.setdefault(r["subject"], set()).update(r["keywords"].split(","))
+    names = sorted(by_subject)
+    pools = {s: sorted(by_subject[s]) for s in names}
+    ids = list(range(1, n + 1))
+    subjects, profiles = {}, {}
+    for mid in ids:
+        subs = list(rng.choice(names, size=rng.choice([1, 2], p=[0.8, 0.2]), replace=False))
+        kws = [k for s in subs for k in rng.choice(pools[s], size=min(8, len(pools[s])), replace=False)]
+        subjects[mid] = subs
+        profiles[mid] = f"{','.join(subs)} {','.join(kws)}"
+    return ids, matrix, subjects, profiles
+
+
+def bench(n, shard_counts, n_queries=100, k=5, seed=42):
+    from ml.advanced_matcher import prepare_query
+
+    rows = _questions()
+    ids, matrix, subjects, profiles = synthetic_pool(n, rows, seed=seed)
+    rng = np.random.RandomState(seed)
+    picks = rng.choice(len(rows), size=min(n_queries, len(rows)), replace=False)
+    queries = []
+    for i in picks:
+        subject, keywords, augmented = prepare_query(rows[i]["text"], rows[i]["subject"])
+        queries.append((mentor_profiles.text_vector(augmented), subject, keywords))
+
+    reference = Shard(ids, matrix, {}, subjects, profiles)
+    expected = [reference.topk(q, s, kw, k) for q, s, kw in queries]
+
+    results = []
+    for n_shards in shard_counts:
+        pool = ShardPool.from_arrays(ids, matrix, subjects, profiles, n_shards=n_shards)
+        try:
+            pool.topk(*queries[0], k)   # warm up the workers
+            ms, identical = [], 0
+            for (q, s, kw), exp in zip(queries, expected):
+                t = time.perf_counter()
+                got = pool.topk(q, s, kw, k)
+                ms.append((time.perf_counter() - t) * 1000)
+                identical += int(got == exp)
+        finally:
+            pool.close()
+        results.append({"mentors": n, "shards": n_shards,
+                        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+                        "identical": f"{identical}/{len(queries)}"})
+        print(json.dumps(results[-1]))
+    return results
+
+
+def check_db(n_queries=50, n_shards=4):
+    from db import SessionLocal
+    from ml import sharded_matcher
+    from ml.advanced_matcher import match_mentors
+
+    rows = _questions()[:n_queries]
+    db = SessionLocal()
+    try:
+        sharded_matcher._pool = sharded_matcher.ShardPool.from_db(db, n_shards=n_shards)
+        same = sum(int(match_mentors(r["text"], r["subject"], db, engine="sharded")
+                       == match_mentors(r["text"], r["subject"], db, engine="profile")) for r in rows)
+    finally:
+        if sharded_matcher._pool is not None:
+            sharded_matcher._pool.close()
+            sharded_matcher._pool = None
+        db.close()
+    line = f"expert_link.db: match_mentors sharded == profile for {same}/{len(rows)} questions ({n_shards} shards)"
+    print(line)
+    return line
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=200000)
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--db", action="store_true")
+    args = ap.parse_args()
+
+    results = bench(args.mentors, args.shards, n_queries=args.queries)
+    db_line = check_db() if args.db else None
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        f.write(f"=== sharded top-5 matching, {args.mentors} mentors, {os.cpu_count()} CPUs ===\n")
+        for r in results:
+            f.write(f"shards={r['shards']:>2}: p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, "
+                    f"identical to single process {r['identical']}\n")
+        if db_line:
+            f.write(db_line + "\n")
+
+
+if __name__ == "__main__":
+    main()
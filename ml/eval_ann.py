@@ -0,0 +1,140 @@
+# backend/ml/eval_ann.py
+"""
+Evaluate the IVF mentor index (ml/ann_index.py) against exact search on
+synthetic mentor pools.
+
+    python -m ml.eval_ann                       # 100k and 1M mentors
+    python -m ml.eval_ann --sizes 100000 --probes 2 4 8 16
+
+Mentor vectors are sampled directly in the profile feature space: every mentor
+takes 1-3 subjects and 10-40 features from those subjects' question vocabulary,
+weighted by idf * random counts. Queries are questions from
+data/synthetic_questions.csv. recall@k is tie-aware: an ANN hit counts when its
+exact score reaches the k-th exact score.
+Writes ml/reports/ann_metrics.json and ann_metrics.txt.
+"""
+import os
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from ml import mentor_profiles
+from ml.ann_index import IVFIndex, exact_search
+
+HERE = os.path.dirname(__file__)
+REPORT_DIR = os.path.join(HERE, "reports")
+
+
+def _questions():
+    with open(mentor_profiles.CORPUS_CSV, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def synthetic_mentor_matrix(n, rows, seed=42):
+    vec = mentor_profiles.load_vectorizer()
+    idf = vec.idf_.astype(np.float32)
+    pools = {}
+    for subj in sorted({r["subject"] for r in rows}):
+        docs = [mentor_profiles.question_text(r["text"], subj, r["keywords"].split(","))
+                for r in rows if r["subject"] == subj]
+        pools[subj] = np.unique(vec.transform(docs).indices)
+    subjects = list(pools)
+
+    rng = np.random.RandomState(seed)
+    indptr, indices, data = [0], [], []
+    for _ in range(n):
+        k = rng.choice([1, 2, 3], p=[0.7, 0.25, 0.05])
+        pool = np.unique(np.concatenate([pools[s] for s in rng.choice(subjects, size=k, replace=False)]))
+        feats = rng.choice(pool, size=min(len(pool), rng.randint(10, 41)), replace=False)
+        feats.sort()
+        indices.append(feats)
+        data.append(idf[feats] * (1 + rng.poisson(2.0, size=len(feats))))
+        indptr.append(indptr[-1] + len(feats))
+    matrix = sp.csr_matrix((np.concatenate(data), np.concatenate(indices), np.asarray(indptr)),
+                           shape=(n, len(idf)), dtype=np.float32)
+    return normalize(matrix)
+
+
+def recall_at_k(exact, approx, k):
+    if not exact:
+        return 1.0
+    kth = exact[min(k, len(exact)) - 1][1]
+    hits = sum(1 for _, s in approx[:k] if s >= kth - 1e-6)
+    return hits / min(k, len(exact))
+
+
+def evaluate(n, probes, k=10, n_queries=200, seed=42):
+    rows = _questions()
+    t0 = time.perf_counter()
+    matrix = synthetic_mentor_matrix(n, rows, seed=seed)
+    ids = np.arange(1, n + 1)
+    gen_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = IVFIndex.build(ids, matrix, mentor_profiles.feature_space())
+    build_s = time.perf_counter() - t0
+
+    rng = np.random.RandomState(seed)
+    picks = rng.choice(len(rows), size=min(n_queries, len(rows)), replace=False)
+    queries = [mentor_profiles.text_vector(mentor_profiles.question_text(
+        rows[i]["text"], rows[i]["subject"], [])) for i in picks]
+
+    exact_ms, truth = [], []
+    for q in queries:
+        t = time.perf_counter()
+        truth.append(exact_search(matrix, ids, q, k))
+        exact_ms.append((time.perf_counter() - t) * 1000)
+
+    out = {"n_mentors": n, "n_lists": index.n_lists, "k": k, "n_queries": len(queries),
+           "generate_s": round(gen_s, 2), "build_s": round(build_s, 2),
+           "exact_p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+           "exact_p95_ms": round(float(np.percentile(exact_ms, 95)), 3),
+           "ann": []}
+    for p in probes:
+        ms, recalls = [], []
+        for q, exact in zip(queries, truth):
+            t = time.perf_counter()
+            approx = index.search(q, k=k, n_probe=p)
+            ms.append((time.perf_counter() - t) * 1000)
+            recalls.append(recall_at_k(exact, approx, k))
+        out["ann"].append({"n_probe": p,
+                           f"recall@{k}": round(float(np.mean(recalls)), 4),
+                           "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                           "p95_ms": round(float(np.percentile(ms, 95)), 3)})
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    ap.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    ap.add_argument("--k", type=int, default=10)
+    args = ap.parse_args()
+
+    results = []
+    for n in args.sizes:
+        res = evaluate(n, args.probes, k=args.k)
+        print(json.dumps(res, indent=2))
+        results.append(res)
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, "ann_metrics.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    with open(os.path.join(REPORT_DIR, "ann_metrics.txt"), "w") as f:
+        for res in results:
+            f.write(f"=== {res['n_mentors']} mentors, {res['n_lists']} lists, k={res['k']} ===\n")
+            f.write(f"exact: p50 {res['exact_p50_ms']} ms, p95 {res['exact_p95_ms']} ms\n")
+            key = f"recall@{res['k']}"
+            for a in res["ann"]:
+                f.write(f"n_probe={a['n_probe']:>3}: {key} {a[key]:.4f}, "
+                        f"p50 {a['p50_ms']} ms, p95 {a['p95_ms']} ms\n")
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
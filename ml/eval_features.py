@@ -0,0 +1,185 @@
+# backend/ml/eval_features.py
+"""
+Compare the fitted TF-IDF profile space with the hashed one
+(ml/hashed_features.py) on mentor retrieval.
+
+    python -m ml.eval_features
+    python -m ml.eval_features --mentors 500 --seed 3
+
+Questions from data/synthetic_questions.csv are split in half. Synthetic mentors
+(1-2 subjects, two favourite topics per subject) build their profile from
+10-30 accepted questions of the first half. Each profile is folded like
+mentor_profiles.update_on_accept (DECAY running sum over the seed profile text)
+and pruned to MAX_NNZ features as stored. The second half are the queries. A
+mentor is relevant to a query when the query's topic (its first three words)
+is one of the mentor's favourites. Queries come clean (text, subject and
+keywords as posted) and noisy (30% of words dropped, typos in 20% of the
+rest, no subject or keywords). Reported: prec@k / recall@k / MAP@10 as in
+retrieval_metrics.json, dimension, stored nnz per mentor and the time to
+vectorize one mentor.
+
+Two fits are compared:
+  full corpus   the vectorizer / IDF see every question
+  cs held out   no cs question is in the fit (a subject added later): the
+                TF-IDF vocabulary has no cs terms, the hashed space still does
+Writes ml/reports/feature_space_metrics.json and feature_space_metrics.txt.
+"""
+import os
+import csv
+import json
+import time
+import argparse
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from ml import mentor_profiles
+from ml.hashed_features import fit as fit_hashed
+from ml.mentor_profiles import CORPUS_CSV, DECAY, question_text, profile_text
+
+HERE = os.path.dirname(__file__)
+REPORT_DIR = os.path.join(HERE, "reports")
+KS = (1, 3, 5, 10)
+
+
+def _rows():
+    with open(CORPUS_CSV, newline="", encoding="utf-8") as f:
+        return [dict(r, topic=" ".join(r["text"].split()[:3]),
+                     qtext=question_text(r["text"], r["subject"], r["keywords"].split(",")))
+                for r in csv.DictReader(f)]
+
+
+def noisy_query(text, rng, drop=0.3, typo=0.2):
+    """Question text as a student might type it: words dropped, letters swapped / lost, no subject."""
+    words = [w for w in text.split() if rng.rand() >= drop] or text.split()[:1]
+    out = []
+    for w in words:
+        if len(w) > 3 and rng.rand() < typo:
+            i = rng.randint(len(w) - 1)
+            w = w[:i] + w[i + 1] + w[i] + w[i + 2:] if rng.rand() < 0.5 else w[:i] + w[i + 1:]
+        out.append(w)
+    return question_text(" ".join(out), "", [])
+
+
+def synthetic_mentors(train, n, rng):
+    by_subject = {}
+    for r in train:
+        by_subject.setdefault(r["subject"], {}).setdefault(r["topic"], []).append(r)
+    subjects = sorted(by_subject)
+    mentors = []
+    for _ in range(n):
+        subj = list(rng.choice(subjects, size=rng.choice([1, 2], p=[0.75, 0.25]), replace=False))
+        favourite = {t for s in subj for t in rng.choice(sorted(by_subject[s]), size=2, replace=False)}
+        pool = [r for s in subj for t, rs in by_subject[s].items() for r in rs]
+        fav_pool = [r for r in pool if r["topic"] in favourite]
+        history = [fav_pool[i] if rng.rand() < 0.8 else pool[rng.randint(len(pool))]
+                   for i in rng.randint(len(fav_pool), size=rng.randint(10, 31))]
+        mentors.append({"subjects": ",".join(subj), "favourite": favourite, "history": history})
+    return mentors
+
+
+def profile_matrix(transform, mentors):
+    """Decayed running sums as update_on_accept builds them, pruned / stored like _encode."""
+    seeds = transform([profile_text(m["subjects"], []) for m in mentors])
+    texts, rows, cols, weights = [], [], [], []
+    for i, m in enumerate(mentors):
+        n = len(m["history"])
+        for j, r in enumerate(m["history"]):
+            rows.append(i)
+            cols.append(len(texts))
+            weights.append(DECAY ** (n - 1 - j))
+            texts.append(r["qtext"])
+    Q = transform(texts)
+    W = sp.csr_matrix((weights, (rows, cols)), shape=(len(mentors), len(texts)), dtype=np.float32)
+    decay = np.array([DECAY ** len(m["history"]) for m in mentors], dtype=np.float32)
+    V = (sp.diags(decay) @ seeds + W @ Q).tocsr()
+    dim = V.shape[1]
+    stored = [mentor_profiles._decode(*mentor_profiles._encode(V[i]), dim) for i in range(V.shape[0])]
+    return normalize(sp.vstack(stored, format="csr"))
+
+
+def retrieval_metrics(scores, relevant):
+    """scores: queries x mentors, relevant: boolean same shape -> prec@k, recall@k, MAP@10."""
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :max(KS)]
+    hits = np.take_along_axis(relevant, order, axis=1)
+    n_rel = np.maximum(relevant.sum(axis=1), 1)
+    out = {}
+    for k in KS:
+        out[f"prec@{k}"] = float(hits[:, :k].mean())
+        out[f"recall@{k}"] = float((hits[:, :k].sum(axis=1) / n_rel).mean())
+    precision_at = np.cumsum(hits, axis=1) / np.arange(1, max(KS) + 1)
+    out["MAP@10"] = float(((precision_at * hits).sum(axis=1) / np.minimum(n_rel, max(KS))).mean())
+    return out
+
+
+def evaluate(transform, mentors, query_sets, relevant, cs):
+    """-> {query set: metrics + index stats}"""
+    t = time.perf_counter()
+    V = profile_matrix(transform, mentors)
+    build_s = time.perf_counter() - t
+    one = mentors[0]
+    t = time.perf_counter()
+    for _ in range(20):
+        transform([profile_text(one["subjects"], [])] + [r["qtext"] for r in one["history"]])
+    per_mentor_ms = (time.perf_counter() - t) / 20 * 1000
+    results = {}
+    for name, texts in query_sets.items():
+        scores = np.asarray((transform(texts) @ V.T).todense())
+        out = retrieval_metrics(scores, relevant)
+        out["cs_queries_prec@5"] = retrieval_metrics(scores[cs], relevant[cs])["prec@5"]
+        out.update({"dim": int(V.shape[1]), "nnz_per_mentor": round(V.nnz / V.shape[0], 1),
+                    "build_s": round(build_s, 3), "vectorize_one_mentor_ms": round(per_mentor_ms, 3)})
+        results[name] = out
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    rng = np.random.RandomState(args.seed)
+    rows = _rows()
+    is_train = rng.rand(len(rows)) < 0.5
+    train = [r for r, t in zip(rows, is_train) if t]
+    queries = [r for r, t in zip(rows, is_train) if not t]
+    mentors = synthetic_mentors(train, args.mentors, rng)
+    relevant = np.array([[q["topic"] in m["favourite"] for m in mentors] for q in queries])
+    cs = np.array([q["subject"] == "cs" for q in queries])
+    query_sets = {"clean": [q["qtext"] for q in queries],
+                  "noisy": [noisy_query(q["text"], rng) for q in queries]}
+
+    results = {}
+    for fit_name, docs in (("full corpus", [r["qtext"] for r in rows]),
+                           ("cs held out", [r["qtext"] for r in rows if r["subject"] != "cs"])):
+        tfidf = mentor_profiles.fit_vectorizer(docs)
+        hashed = fit_hashed(docs)
+        for name, transform in (("tfidf", lambda texts: normalize(tfidf.transform(texts)).astype(np.float32)),
+                                (hashed.space, hashed.transform)):
+            for qset, out in evaluate(transform, mentors, query_sets, relevant, cs).items():
+                results.setdefault(fit_name, {}).setdefault(qset, {})[name] = out
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, "feature_space_metrics.json"), "w") as f:
+        json.dump({"mentors": args.mentors, "queries": len(queries), "seed": args.seed, "results": results}, f, indent=2)
+    lines = [f"=== Mentor retrieval: fitted TF-IDF vs hashed features ({args.mentors} mentors, "
+             f"{len(queries)} queries) ===", ""]
+    header = ["prec@1", "prec@5", "prec@10", "recall@10", "MAP@10", "cs prec@5", "dim", "nnz/mentor", "ms/mentor"]
+    for fit_name, qsets in results.items():
+        for qset, spaces in qsets.items():
+            lines.append(f"fit on {fit_name}, {qset} queries")
+            lines.append(f"  {'space':16}" + "".join(f"{c:>11}" for c in header))
+            for space, out in spaces.items():
+                lines.append(f"  {space:16}" + "".join(f"{out[c]:11.4f}" for c in (
+                    "prec@1", "prec@5", "prec@10", "recall@10", "MAP@10", "cs_queries_prec@5"))
+                    + f"{out['dim']:11}{out['nnz_per_mentor']:11.1f}{out['vectorize_one_mentor_ms']:11.2f}")
+            lines.append("")
+    with open(os.path.join(REPORT_DIR, "feature_space_metrics.txt"), "w") as f:
+        f.write("\n".join(lines))
+    print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# backend/ml/eval_near_duplicates.py
+"""
+Replays data/synthetic_questions.csv through the posting path with near-duplicate
+reuse (matching_service.reuse_duplicate) and reports:
+
+  hit rate      questions whose match was reused from a recent near-duplicate
+  latency       mean dedupe check vs matching pipeline, and the total saved
+  agreement     for hits, overlap of the reused top-5 mentors and keywords with
+                what a fresh pipeline run would have returned
+
+Runs on a throw-away SQLite file with synthetic mentors, never on expert_link.db:
+    python -m ml.eval_near_duplicates
+    DUP_THRESHOLD=0.9 python -m ml.eval_near_duplicates
+Writes ml/reports/near_duplicates.txt.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import deadline
+import metrics
+import migrations
+from models import Base, User, Question
+from matching_service import _match_question, apply_match, dedupe_stats, reuse_duplicate
+from ml import near_duplicates, strategies
+from ml.eval_ann import _questions
+from ml.mentor_keywords import record_keywords
+from ml.mentor_subjects import set_mentor_subjects
+
+HERE = os.path.dirname(__file__)
+REPORT_PATH = os.path.join(HERE, "reports", "near_duplicates.txt")
+
+
+def populate_mentors(db, rows, n_mentors):
+    random.seed(42)
+    by_subject = {}
+    for r in rows:
+        by_subject.setdefault(r["subject"], []).extend(k for k in r["keywords"].split(",") if k)
+    subjects = sorted(by_subject)
+    for i in range(1, n_mentors + 1):
+        subject = subjects[i % len(subjects)]
+        db.add(User(id=i, name=f"Mentor {i}", email=f"m{i}@eval.local", password="x",
+                    role="mentor", subjects=subject))
+        db.flush()
+        set_mentor_subjects(db, i, subject)
+        record_keywords(db, i, random.sample(by_subject[subject], 8))
+    db.add(User(id=n_mentors + 1, name="Student", email="s@eval.local", password="x", role="student"))
+    db.commit()
+    for step in (migrations.migrate_mentor_profile_vectors, migrations.create_fts_indexes):
+        step(db)
+        db.commit()
+    return n_mentors + 1
+
+
+def _overlap(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def fresh_match(db, text, subject):
+    """The full pipeline as a post would run it without reuse, no time budget."""
+    return _match_question(db, text, subject, strategies.MATCH_STRATEGY, deadline.Budget(0))
+
+
+def replay(n_mentors=200):
+    rows = _questions()
+    path = os.path.join(tempfile.mkdtemp(), "eval_dupes.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    student_id = populate_mentors(db, rows, n_mentors)
+    fresh_match(db, "warm up", rows[0]["subject"])
+
+    pipeline_ms, mentor_agree, keyword_agree = [], [], []
+    for r in rows:
+        result, duplicate_of, sig = reuse_duplicate(db, r["text"], r["subject"])
+        t = time.perf_counter()
+        fresh = fresh_match(db, r["text"], r["subject"])
+        ms = (time.perf_counter() - t) * 1000
+        pipeline_ms.append(ms)
+        if result is None:
+            metrics.observe("match.pipeline_ms", ms)
+            result = fresh
+        else:
+            mentor_agree.append(_overlap(result.matched_ids[:5], fresh.matched_ids[:5]))
+            keyword_agree.append(_overlap(result.keywords, fresh.keywords))
+        q = Question(student_id=student_id, text=r["text"], subject=r["subject"], duplicate_of=duplicate_of)
+        apply_match(q, result)
+        db.add(q)
+        db.flush()
+        near_duplicates.index_question(db, q.id, r["subject"], sig, result.ml_scores)
+        db.commit()
+    db.close()
+    return len(rows), pipeline_ms, mentor_agree, keyword_agree
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mentors", type=int, default=200)
+    args = ap.parse_args()
+
+    n, pipeline_ms, mentor_agree, keyword_agree = replay(args.mentors)
+    s = dedupe_stats()
+    baseline = sum(pipeline_ms)
+    with_dedupe = baseline - s["hits"] * s["mean_pipeline_ms"] + s["checks"] * s["mean_check_ms"]
+    mean = lambda xs: sum(xs) / len(xs) if xs else 0.0
+    lines = [
+        f"near-duplicate reuse on data/synthetic_questions.csv ({n} questions, {args.mentors} mentors)",
+        f"NUM_PERM={near_duplicates.NUM_PERM} BANDS={near_duplicates.BANDS} ROWS={near_duplicates.ROWS} "
+        f"SHINGLE={near_duplicates.SHINGLE} DUP_THRESHOLD={near_duplicates.DUP_THRESHOLD}",
+        "",
+        f"hits                      {s['hits']} / {s['checks']}  (hit rate {s['hit_rate']:.1%})",
+        f"mean dedupe check         {s['mean_check_ms']:.3f} ms  (every post)",
+        f"mean matching pipeline    {s['mean_pipeline_ms']:.3f} ms  (misses only)",
+        f"matching time, no reuse   {baseline:.0f} ms",
+        f"matching time, reuse      {with_dedupe:.0f} ms  (saved {s['saved_ms']:.0f} ms, "
+        f"{s['saved_ms'] / baseline:.1%})",
+        "",
+        f"hits: top-5 mentor Jaccard vs fresh match   {mean(mentor_agree):.3f}",
+        f"hits: keyword Jaccard vs fresh match        {mean(keyword_agree):.3f}",
+    ]
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print("\n".join(lines))
+    print(f"report written to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
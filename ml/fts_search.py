@@ -0,0 +1,122 @@
+# backend/ml/fts_search.py
+"""
+SQLite FTS5 full-text indexes inside expert_link.db, ranked with BM25:
+
+  mentors_fts(subjects, keywords)          rowid = users.id, mentors only;
+                                           keywords = the mentor's mentor_keyword_stats
+  questions_fts(text, subject, keywords)   external content over questions (rowid = id)
+
+Both are kept in sync by triggers, so every writer (routers, seed scripts, raw
+SQL) updates them in the same transaction. ensure_fts() creates the tables and
+triggers if missing and fills them from the existing rows (run by migrations.py).
+
+Used by match_mentors(engine="fts") for candidate retrieval and by
+GET /questions/search.
+"""
+import re
+
+from sqlalchemy import text
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+FTS_TOKENIZER = "porter unicode61"
+MAX_QUERY_TERMS = 32
+MENTOR_WEIGHTS = (2.0, 1.0)            # bm25 column weights: subjects, keywords
+QUESTION_WEIGHTS = (1.0, 2.0, 2.0)     # text, subject, keywords
+
+# re-index one mentor from users + mentor_keyword_stats; {mid} is NEW.x / OLD.x
+_REFRESH_MENTOR = """
+    DELETE FROM mentors_fts WHERE rowid = {mid};
+    INSERT INTO mentors_fts(rowid, subjects, keywords)
+        SELECT u.id, coalesce(u.subjects, ''),
+               coalesce((SELECT group_concat(k.keyword, ' ') FROM mentor_keyword_stats k
+                         WHERE k.mentor_id = u.id), '')
+        FROM users u WHERE u.id = {mid} AND u.role = 'mentor';
+"""
+
+_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS mentors_fts USING fts5("
+    f"subjects, keywords, tokenize='{FTS_TOKENIZER}')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5("
+    f"text, subject, keywords, content='questions', content_rowid='id', tokenize='{FTS_TOKENIZER}')",
+
+    # mentors: profile = users.subjects + keyword stats
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN"
+    + _REFRESH_MENTOR.format(mid="NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF subjects, role ON users BEGIN"
+    + _REFRESH_MENTOR.format(mid="NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "DELETE FROM mentors_fts WHERE rowid = OLD.id; END",
+    "CREATE TRIGGER IF NOT EXISTS mentor_kw_fts_ai AFTER INSERT ON mentor_keyword_stats BEGIN"
+    + _REFRESH_MENTOR.format(mid="NEW.mentor_id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS mentor_kw_fts_ad AFTER DELETE ON mentor_keyword_stats BEGIN"
+    + _REFRESH_MENTOR.format(mid="OLD.mentor_id") + "END",
+
+    # questions: external-content table, old values removed with the 'delete' command
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_ai AFTER INSERT ON questions BEGIN "
+    "INSERT INTO questions_fts(rowid, text, subject, keywords) "
+    "VALUES (NEW.id, NEW.text, NEW.subject, NEW.keywords); END",
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_ad AFTER DELETE ON questions BEGIN "
+    "INSERT INTO questions_fts(questions_fts, rowid, text, subject, keywords) "
+    "VALUES ('delete', OLD.id, OLD.text, OLD.subject, OLD.keywords); END",
+    "CREATE TRIGGER IF NOT EXISTS questions_fts_au AFTER UPDATE OF text, subject, keywords ON questions BEGIN "
+    "INSERT INTO questions_fts(questions_fts, rowid, text, subject, keywords) "
+    "VALUES ('delete', OLD.id, OLD.text, OLD.subject, OLD.keywords); "
+    "INSERT INTO questions_fts(rowid, text, subject, keywords) "
+    "VALUES (NEW.id, NEW.text, NEW.subject, NEW.keywords); END",
+]
+
+
+def _table_exists(db, name):
+    return db.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": name}).first() is not None
+
+
+def ensure_fts(db):
+    """Create the FTS tables/triggers if missing and index existing rows. Does not commit."""
+    fresh = [name for name in ("mentors_fts", "questions_fts") if not _table_exists(db, name)]
+    for stmt in _DDL:
+        db.execute(text(stmt))
+    if "mentors_fts" in fresh:
+        db.execute(text(
+            "INSERT INTO mentors_fts(rowid, subjects, keywords) "
+            "SELECT u.id, coalesce(u.subjects, ''), coalesce(k.kws, '') FROM users u "
+            "LEFT JOIN (SELECT mentor_id, group_concat(keyword, ' ') AS kws "
+            "           FROM mentor_keyword_stats GROUP BY mentor_id) k ON k.mentor_id = u.id "
+            "WHERE u.role = 'mentor'"))
+    if "questions_fts" in fresh:
+        db.execute(text("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')"))
+    return fresh
+
+
+def fts_query(raw: str):
+    """Free text -> FTS5 MATCH expression: quoted terms OR-ed together ('' if nothing usable)."""
+    terms = [t for t in re.findall(r"[a-z0-9]+", (raw or "").lower())
+             if len(t) > 1 and t not in ENGLISH_STOP_WORDS]
+    terms = list(dict.fromkeys(terms))[:MAX_QUERY_TERMS]
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+def search_mentors(db, raw: str, limit: int = 50):
+    """BM25-ranked mentor ids for free text -> [(mentor_id, bm25), ...] (lower bm25 = better)."""
+    match = fts_query(raw)
+    if not match:
+        return []
+    rows = db.execute(text(
+        "SELECT rowid, bm25(mentors_fts, :w_subj, :w_kw) AS score FROM mentors_fts "
+        "WHERE mentors_fts MATCH :q ORDER BY score LIMIT :limit"),
+        {"q": match, "w_subj": MENTOR_WEIGHTS[0], "w_kw": MENTOR_WEIGHTS[1], "limit": limit}).fetchall()
+    return [(int(mid), float(score)) for mid, score in rows]
+
+
+def search_questions(db, raw: str, subject: str = None, limit: int = 20):
+    """BM25-ranked questions for free text -> [(question_id, bm25), ...], optionally one subject."""
+    match = fts_query(raw)
+    if not match:
+        return []
+    rows = db.execute(text(
+        "SELECT questions_fts.rowid, bm25(questions_fts, :w_text, :w_subj, :w_kw) AS score "
+        "FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid "
+        "WHERE questions_fts MATCH :q AND (:subject IS NULL OR lower(q.subject) = :subject) "
+        "ORDER BY score LIMIT :limit"),
+        {"q": match, "subject": (subject or "").strip().lower() or None, "w_text": QUESTION_WEIGHTS[0],
+         "w_subj": QUESTION_WEIGHTS[1], "w_kw": QUESTION_WEIGHTS[2], "limit": limit}).fetchall()
+    return [(int(qid), float(score)) for qid, score in rows]
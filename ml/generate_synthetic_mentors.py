@@ -5,6 +5,9 @@ import json
 import re
 from db import SessionLocal
 from models import User
+from ml.mentor_keywords import record_keywords, split_keywords
+from ml.mentor_subjects import set_mentor_subjects
+from ml.mentor_snapshot import mark_changed
 from utils import hash_password
 
 BASE = os.path.dirname(__file__)
@@ -125,15 +128,19 @@ def generate_demo_mentors(n=NUM_MENTORS, prefix_names=None):
                 role="mentor",
                 subjects=subj,
                 experience_years=exp,
-                solved_keywords=solved,
                 balance=0.0,
                 is_active=True
             )
             db.add(user)
+            db.flush()  # assign user.id for the keyword stats / subject rows
+            record_keywords(db, user.id, split_keywords(solved))
+            set_mentor_subjects(db, user.id, subj)
             created += 1
             # commit in batches for stability
             if created % 50 == 0:
+                mark_changed(db)
                 db.commit()
+        mark_changed(db)
         db.commit()
     except Exception as e:
         db.rollback()
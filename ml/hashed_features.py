@@ -0,0 +1,165 @@
+# backend/ml/hashed_features.py
+"""
+Stateless hashed feature space for mentor and question vectors, used by
+mentor_profiles when PROFILE_FEATURES=hashed.
+
+    word (1,2)-grams, English stop words removed   -> 2**HASH_WORD_BITS columns
+    char_wb (3,5)-grams                             -> 2**HASH_CHAR_BITS columns
+
+Each block is tf * idf and L2-normalized; the word block is scaled by
+sqrt(WORD_WEIGHT), the char block by sqrt(1 - WORD_WEIGHT), and the two are
+concatenated. The dot product of two vectors is then WORD_WEIGHT * word cosine
++ (1 - WORD_WEIGHT) * char cosine, the mix advanced_matcher._tfidf_similarities
+uses.
+
+A column depends only on the hashed n-gram, not on a fitted vocabulary. A
+mentor vector can be computed on its own and appended to an index without
+refitting anything. The feature space id (hashed-w<bits>c<bits>) changes only
+with the hash sizes.
+
+IDF statistics are kept apart in ml/hashed_idf.npz: the document count and
+per-column document frequencies. They are fitted from the question corpus and
+grow with new questions:
+
+    python -m ml.hashed_features fit       # data/synthetic_questions.csv + subject_vocab.json
+    python -m ml.hashed_features update    # + questions in expert_link.db since the last fit / update
+
+An IDF update keeps the feature space. Stored vectors keep the weights they
+were computed with and pick up the new ones when next rewritten.
+
+The dimension is large but vectors stay sparse (a few hundred stored features
+per mentor). Only the IVF centroids of ml/ann_index.py are dense in it, so
+with engine "ann" keep the hash bits or ANN_N_LISTS modest.
+"""
+import os
+import sys
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+HERE = os.path.dirname(__file__)
+IDF_PATH = os.path.join(HERE, "hashed_idf.npz")
+HASH_WORD_BITS = int(os.environ.get("HASH_WORD_BITS", "17"))
+HASH_CHAR_BITS = int(os.environ.get("HASH_CHAR_BITS", "16"))
+WORD_WEIGHT = 0.75
+UPDATE_BATCH_ROWS = 1000
+
+_features = None
+
+
+class HashedFeatures:
+    def __init__(self, word_bits=HASH_WORD_BITS, char_bits=HASH_CHAR_BITS, n_docs=0, df_word=None, df_char=None,
+                 last_question_id=0):
+        self.word = HashingVectorizer(n_features=2 ** word_bits, ngram_range=(1, 2), stop_words="english",
+                                      alternate_sign=False, norm=None, dtype=np.float32)
+        self.char = HashingVectorizer(n_features=2 ** char_bits, analyzer="char_wb", ngram_range=(3, 5),
+                                      alternate_sign=False, norm=None, dtype=np.float32)
+        self.space = f"hashed-w{word_bits}c{char_bits}"
+        self.dim = 2 ** word_bits + 2 ** char_bits
+        self.n_docs = int(n_docs)
+        self.df_word = np.zeros(2 ** word_bits, np.int32) if df_word is None else df_word
+        self.df_char = np.zeros(2 ** char_bits, np.int32) if df_char is None else df_char
+        self.last_question_id = int(last_question_id)
+        self._refresh_idf()
+
+    def _refresh_idf(self):
+        # smooth idf as in TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+        self.idf_word = (np.log((1.0 + self.n_docs) / (1.0 + self.df_word)) + 1).astype(np.float32)
+        self.idf_char = (np.log((1.0 + self.n_docs) / (1.0 + self.df_char)) + 1).astype(np.float32)
+
+    def add_documents(self, texts):
+        """Count texts into the document frequencies."""
+        texts = list(texts)
+        if not texts:
+            return
+        for hv, df in ((self.word, self.df_word), (self.char, self.df_char)):
+            X = hv.transform(texts).tocsc()
+            df += np.diff(X.indptr).astype(np.int32)   # one stored entry per (doc, column)
+        self.n_docs += len(texts)
+        self._refresh_idf()
+
+    def transform(self, texts, char_ngrams=True):
+        """n x dim float32 CSR, rows of unit length (zero rows for empty texts; empty char block without char_ngrams)."""
+        blocks = []
+        for hv, idf, weight in ((self.word, self.idf_word, WORD_WEIGHT), (self.char, self.idf_char, 1 - WORD_WEIGHT)):
+            if hv is self.char and not char_ngrams:
+                blocks.append(sp.csr_matrix((len(texts), hv.n_features), dtype=np.float32))
+                continue
+            X = hv.transform(texts)
+            X.data *= idf[X.indices]
+            X = normalize(X)
+            X.data *= np.float32(np.sqrt(weight))
+            blocks.append(X)
+        return normalize(sp.hstack(blocks, format="csr", dtype=np.float32))
+
+    def save(self, path=IDF_PATH):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, space=np.array(self.space), n_docs=self.n_docs, df_word=self.df_word, df_char=self.df_char,
+                 last_question_id=self.last_question_id)
+        os.replace(tmp, path)
+
+
+def fit(docs):
+    f = HashedFeatures()
+    f.add_documents(docs)
+    return f
+
+
+def load():
+    """The process-wide HashedFeatures; fitted from the question corpus and saved on first use."""
+    global _features
+    if _features is None:
+        f = None
+        if os.path.exists(IDF_PATH):
+            z = np.load(IDF_PATH)
+            if str(z["space"]) == HashedFeatures().space:
+                f = HashedFeatures(n_docs=z["n_docs"], df_word=z["df_word"], df_char=z["df_char"],
+                                   last_question_id=z["last_question_id"])
+        if f is None:
+            from ml.mentor_profiles import _training_corpus
+            f = fit(_training_corpus())
+            f.save()
+            print(f"hashed feature IDF fitted on {f.n_docs} documents and saved to {IDF_PATH}")
+        _features = f
+    return _features
+
+
+def update_from_db(db, features=None):
+    """Count questions newer than features.last_question_id into the IDF -> documents added. Saves."""
+    from sqlalchemy import select
+    from models import Question
+    from ml.mentor_profiles import question_text
+
+    f = features or load()
+    stmt = (select(Question.id, Question.text, Question.subject, Question.keywords)
+            .where(Question.id > f.last_question_id).order_by(Question.id))
+    added, batch = 0, []
+    for qid, text, subject, keywords in db.execute(stmt.execution_options(yield_per=UPDATE_BATCH_ROWS)):
+        batch.append(question_text(text, subject, (keywords or "").split(",")))
+        f.last_question_id = qid
+        if len(batch) >= UPDATE_BATCH_ROWS:
+            f.add_documents(batch)
+            added, batch = added + len(batch), []
+    f.add_documents(batch)
+    added += len(batch)
+    f.save()
+    return added
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "update"
+    if cmd == "fit":
+        from ml.mentor_profiles import _training_corpus
+        f = fit(_training_corpus())
+        f.save()
+        print(f"fitted IDF of {f.space} on {f.n_docs} documents")
+    else:
+        from db import SessionLocal
+        db = SessionLocal()
+        try:
+            n = update_from_db(db)
+        finally:
+            db.close()
+        print(f"added {n} questions to the IDF of {load().space} ({load().n_docs} documents)")
@@ -0,0 +1,68 @@
+# backend/ml/keyword_automaton.py
+"""
+Aho-Corasick automaton over a closed term list (the subject_vocab.json unigrams
+and bigrams), used by extract_keywords(mode="automaton").
+
+Terms are matched on whole words: the automaton runs over " " + normalized text + " "
+and every pattern is " term ", so "algebra" never matches inside "algebraic".
+One pass over the text reports every occurrence, overlapping ones included
+("linear algebra", "algebra").
+"""
+
+
+class KeywordAutomaton:
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(t for t in terms if t))
+        self.goto = [{}]     # state -> {char: state}
+        self.fail = [0]
+        self.out = [()]      # state -> ids of terms ending here (own + via fail links)
+        for tid, term in enumerate(self.terms):
+            self._add(f" {term} ", tid)
+        self._link()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _add(self, pattern, tid):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = nxt
+        self.out[state] = self.out[state] + (tid,)
+
+    def _link(self):
+        """Breadth-first failure links; merges each state's outputs with its fail state's."""
+        queue = list(self.goto[0].values())
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, text: str):
+        """[(start, term), ...] for every term occurrence in already-normalized text."""
+        goto, fail, out, terms = self.goto, self.fail, self.out, self.terms
+        padded = f" {text} "
+        hits = []
+        state = 0
+        for pos, ch in enumerate(padded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for tid in out[state]:
+                term = terms[tid]
+                # pos is the trailing space; the term starts len(term) + 1 chars earlier
+                hits.append((pos - len(term) - 1, term))
+        return hits
@@ -0,0 +1,122 @@
+# backend/ml/mentor_keywords.py
+"""
+Per-mentor keyword statistics backed by the mentor_keyword_stats table.
+
+accept_question records the question keywords with a single upsert
+(count + 1, last_seen = now) instead of rewriting User.solved_keywords.
+The matcher reads a cached, compact keyword vector per mentor:
+    { mentor_id: (("calculus", 7), ("integral", 3), ...) }   # count desc
+"""
+import collections
+from datetime import datetime
+
+from sqlalchemy import exists
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import MentorKeywordStat, User
+
+_vectors = None   # lazy-loaded { mentor_id: ((keyword, count), ...) }
+_stale = set()    # mentor ids whose cached vector must be reloaded
+
+
+def split_keywords(csv_text):
+    """Normalize a comma-separated keyword string -> list of lowercase keywords."""
+    return [k.strip().lower() for k in (csv_text or "").split(",") if k.strip()]
+
+
+def record_keywords(db, mentor_id: int, keywords):
+    """
+    Atomically add keywords to a mentor's stats (INSERT .. ON CONFLICT DO UPDATE).
+    Does not commit; call invalidate(mentor_id) after the surrounding commit.
+    """
+    counts = collections.Counter(k for k in keywords if k)
+    if not counts:
+        return
+    now = datetime.utcnow()
+    table = MentorKeywordStat.__table__
+    stmt = sqlite_insert(table).values([
+        {"mentor_id": mentor_id, "keyword": k, "count": c, "last_seen": now}
+        for k, c in counts.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["mentor_id", "keyword"],
+        set_={
+            "count": table.c["count"] + stmt.excluded["count"],
+            "last_seen": stmt.excluded["last_seen"],
+        },
+    )
+    db.execute(stmt)
+
+
+def replace_keywords(db, mentor_id: int, keywords):
+    """Overwrite a mentor's stats with the given keywords (used by seed scripts)."""
+    db.query(MentorKeywordStat).filter(MentorKeywordStat.mentor_id == mentor_id).delete()
+    record_keywords(db, mentor_id, keywords)
+
+
+def _rows_to_vector(rows):
+    return tuple(sorted(((k, int(c)) for k, c in rows), key=lambda kc: (-kc[1], kc[0])))
+
+
+def get_keyword_vectors(db):
+    """Return the cached { mentor_id: ((keyword, count), ...) } map, loading lazily."""
+    global _vectors
+    if _vectors is None:
+        grouped = collections.defaultdict(list)
+        rows = db.query(
+            MentorKeywordStat.mentor_id, MentorKeywordStat.keyword, MentorKeywordStat.count
+        ).all()
+        for mid, kw, cnt in rows:
+            grouped[mid].append((kw, cnt))
+        _vectors = {mid: _rows_to_vector(r) for mid, r in grouped.items()}
+        _stale.clear()
+    elif _stale:
+        for mid in list(_stale):
+            rows = db.query(MentorKeywordStat.keyword, MentorKeywordStat.count).filter(
+                MentorKeywordStat.mentor_id == mid
+            ).all()
+            _vectors[mid] = _rows_to_vector(rows)
+            _stale.discard(mid)
+    return _vectors
+
+
+def get_mentor_keywords(db, mentor_id: int):
+    """Keywords of one mentor, most frequent first."""
+    return [k for k, _ in get_keyword_vectors(db).get(mentor_id, ())]
+
+
+def read_mentor_keywords(db, mentor_id: int):
+    """Keywords of one mentor read from the table, bypassing the cache (sees db's uncommitted writes)."""
+    rows = db.query(MentorKeywordStat.keyword, MentorKeywordStat.count).filter(
+        MentorKeywordStat.mentor_id == mentor_id
+    ).all()
+    return [k for k, _ in _rows_to_vector(rows)]
+
+
+def invalidate(mentor_id: int = None):
+    """Drop the cached vector of one mentor (or the whole cache)."""
+    global _vectors
+    if mentor_id is None:
+        _vectors = None
+        _stale.clear()
+    else:
+        _stale.add(mentor_id)
+
+
+def migrate_solved_keywords(db):
+    """
+    Backfill mentor_keyword_stats from the legacy User.solved_keywords CSV column
+    for mentors that have no stats rows yet. Idempotent; does not commit.
+    """
+    has_stats = exists().where(MentorKeywordStat.mentor_id == User.id)
+    mentors = db.query(User.id, User.solved_keywords).filter(
+        User.role == "mentor",
+        User.solved_keywords.isnot(None),
+        User.solved_keywords != "",
+        ~has_stats,
+    ).all()
+    for mid, solved in mentors:
+        record_keywords(db, mid, split_keywords(solved))
+    if mentors:
+        invalidate()
+    return len(mentors)
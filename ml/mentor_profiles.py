@@ -0,0 +1,367 @@
+# backend/ml/mentor_profiles.py
+"""
+Persisted sparse mentor profile vectors (mentor_profile_vectors table).
+
+Write path (accept_question):
+    v_mentor <- DECAY * v_mentor + tfidf(question)      # decayed running sum
+Read path (match_mentors, engine="profile"):
+    scores = normalize(V) @ tfidf(question).T           # read-only dot product
+
+All vectors live in one fixed feature space: a TF-IDF vectorizer fitted once on
+data/synthetic_questions.csv + subject_vocab.json and stored in
+ml/profile_vectorizer.pkl. The space id stored next to every vector lets us
+detect vectors produced by an older vectorizer. With PROFILE_FEATURES=hashed
+the space is hashed word + char_wb n-grams with separately kept IDF
+(ml/hashed_features.py), which needs no vocabulary fit.
+
+With SHARED_PROFILE_INDEX=1 the read-path matrix is published once to mmap'd
+files and attached by every worker process (ml/shared_index.py).
+"""
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from models import MentorProfileVector, User
+
+HERE = os.path.dirname(__file__)
+VECTORIZER_PATH = os.path.join(HERE, "profile_vectorizer.pkl")
+CORPUS_CSV = os.path.join(HERE, "..", "data", "synthetic_questions.csv")
+VOCAB_PATH = os.path.join(HERE, "subject_vocab.json")
+
+DECAY = 0.97           # weight kept by the old profile on every accept
+MAX_NNZ = 512          # keep only the strongest features per mentor
+MIN_WEIGHT = 1e-4      # drop features that decayed below this
+OVERLAY_LIMIT = 256    # updated rows kept outside the matrix before a rebuild
+SHARED_PROFILE_INDEX = os.environ.get("SHARED_PROFILE_INDEX", "0") == "1"
+# "tfidf": fitted TfidfVectorizer (profile_vectorizer.pkl); "hashed": ml/hashed_features.py
+PROFILE_FEATURES = os.environ.get("PROFILE_FEATURES", "tfidf")
+
+_vectorizer = None
+_space = None
+_dimension = None
+_index = None          # lazy-loaded ProfileIndex
+_rebuild_since = None  # shared mode: time.time() of a full invalidation the next get_index must publish past
+_listeners = []        # callables(mentor_id, vec) notified on invalidate (e.g. ml/ann_index.py)
+
+
+# -------------------------
+# Feature space
+# -------------------------
+def _normalize_text(s: str) -> str:
+    # same normalization as advanced_matcher._normalize_text
+    if not s:
+        return ""
+    s = s.lower()
+    s = re.sub(r'[^a-z0-9\s]', ' ', s)
+    s = re.sub(r'\s+', ' ', s).strip()
+    return s
+
+
+def _training_corpus():
+    docs = []
+    if os.path.exists(CORPUS_CSV):
+        with open(CORPUS_CSV, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                docs.append(" ".join([row.get("text") or "", row.get("subject") or "",
+                                      (row.get("keywords") or "").replace(",", " ")]))
+    if os.path.exists(VOCAB_PATH):
+        with open(VOCAB_PATH, "r", encoding="utf-8") as f:
+            for subj, toks in json.load(f).items():
+                docs.append(" ".join([subj] + list(toks)))
+    return docs or ["math physics chemistry cs"]
+
+
+def fit_vectorizer(docs):
+    return TfidfVectorizer(ngram_range=(1, 2), max_features=20000,
+                           stop_words="english", dtype=np.float32).fit(docs)
+
+
+def train_vectorizer():
+    vec = fit_vectorizer(_training_corpus())
+    joblib.dump(vec, VECTORIZER_PATH)
+    print("profile vectorizer trained and saved to", VECTORIZER_PATH)
+    return vec
+
+
+def load_vectorizer():
+    global _vectorizer, _space, _dimension
+    if _vectorizer is None:
+        if PROFILE_FEATURES == "hashed":
+            from ml import hashed_features
+            vec = hashed_features.load()
+            _space, _dimension = vec.space, vec.dim
+        else:
+            vec = joblib.load(VECTORIZER_PATH) if os.path.exists(VECTORIZER_PATH) else train_vectorizer()
+            terms = "\n".join(vec.get_feature_names_out())
+            _space = "tfidf-" + hashlib.sha1(terms.encode("utf-8")).hexdigest()[:12]
+            _dimension = len(vec.vocabulary_)
+        _vectorizer = vec
+    return _vectorizer
+
+
+def feature_space():
+    load_vectorizer()
+    return _space
+
+
+def text_vector(text: str, char_ngrams: bool = True):
+    """L2-normalized 1 x D float32 CSR vector of a (pre-normalized) text (char_ngrams: hashed space only)."""
+    if PROFILE_FEATURES == "hashed":
+        return load_vectorizer().transform([text or ""], char_ngrams=char_ngrams)
+    return normalize(load_vectorizer().transform([text or ""])).astype(np.float32)
+
+
+# -------------------------
+# (De)serialization
+# -------------------------
+def _encode(vec):
+    vec = vec.tocsr()
+    vec.eliminate_zeros()
+    idx, val = vec.indices, vec.data
+    keep = np.abs(val) >= MIN_WEIGHT
+    idx, val = idx[keep], val[keep]
+    if len(val) > MAX_NNZ:
+        top = np.argpartition(-np.abs(val), MAX_NNZ)[:MAX_NNZ]
+        idx, val = idx[top], val[top]
+    order = np.argsort(idx)
+    return idx[order].astype(np.int32).tobytes(), val[order].astype(np.float32).tobytes()
+
+
+def _decode(indices: bytes, data: bytes, dim: int):
+    idx = np.frombuffer(indices, dtype=np.int32)
+    val = np.frombuffer(data, dtype=np.float32)
+    return sp.csr_matrix((val, idx, np.array([0, len(idx)])), shape=(1, dim), dtype=np.float32)
+
+
+def _dim():
+    load_vectorizer()
+    return _dimension
+
+
+# -------------------------
+# Write path
+# -------------------------
+def profile_text(subjects: str, keywords) -> str:
+    return _normalize_text(f"{subjects or ''} {' '.join(keywords or [])}")
+
+
+def question_text(text: str, subject: str, keywords) -> str:
+    return _normalize_text(" ".join(filter(None, [text or "", subject or "", " ".join(keywords or [])])))
+
+
+def seed_profile(db, mentor_id: int, subjects: str, keywords=()):
+    """
+    Create/overwrite a mentor vector from the profile text. Does not commit;
+    call invalidate(mentor_id, vec) with the returned vector after the commit.
+    """
+    vec = text_vector(profile_text(subjects, keywords))
+    return _store(db, mentor_id, vec, n_updates=0)
+
+
+def reseed_profile(db, mentor_id: int, subjects: str, old_keywords, keywords):
+    """
+    Swap the profile-text part of a mentor vector after its keywords were replaced:
+        v <- v + DECAY**n_updates * (tfidf(new profile text) - tfidf(old profile text))
+    which keeps the accepted questions folded in since. Mentors without accepts
+    are simply re-seeded. Does not commit (see seed_profile).
+    """
+    row = db.query(MentorProfileVector).filter(MentorProfileVector.mentor_id == mentor_id).first()
+    if row is None or row.space != feature_space() or not row.n_updates:
+        return seed_profile(db, mentor_id, subjects, keywords)
+    delta = (text_vector(profile_text(subjects, keywords))
+             - text_vector(profile_text(subjects, old_keywords))) * DECAY ** row.n_updates
+    vec = (_decode(row.indices, row.data, _dim()) + delta).tocsr()
+    vec.data[vec.data < 0] = 0   # pruned features the old seed no longer covers
+    return _store(db, mentor_id, vec, n_updates=row.n_updates, row=row)
+
+
+def update_on_accept(db, mentor_id: int, text: str, subject: str, keywords):
+    """Fold one accepted question into the mentor vector. Does not commit (see seed_profile)."""
+    qvec = text_vector(question_text(text, subject, keywords))
+    row = db.query(MentorProfileVector).filter(MentorProfileVector.mentor_id == mentor_id).first()
+    if row is not None and row.space == feature_space():
+        vec = DECAY * _decode(row.indices, row.data, _dim()) + qvec
+        n = (row.n_updates or 0) + 1
+    else:
+        m = db.query(User.subjects).filter(User.id == mentor_id).first()
+        vec = DECAY * text_vector(profile_text(m.subjects if m else "", keywords)) + qvec
+        n = 1
+    return _store(db, mentor_id, vec, n_updates=n, row=row)
+
+
+def _store(db, mentor_id, vec, n_updates, row=None):
+    """Persist vec; returns the stored (pruned, float32) vector as other processes will read it."""
+    indices, data = _encode(vec)
+    if row is None:
+        row = db.query(MentorProfileVector).filter(MentorProfileVector.mentor_id == mentor_id).first()
+    if row is None:
+        row = MentorProfileVector(mentor_id=mentor_id)
+        db.add(row)
+    row.space = feature_space()
+    row.indices = indices
+    row.data = data
+    row.n_updates = n_updates
+    return _decode(indices, data, _dim())
+
+
+# -------------------------
+# Read path
+# -------------------------
+class SortedPositions:
+    """Read-only mentor_id -> row mapping over a sorted id array (no per-process dict)."""
+
+    def __init__(self, mentor_ids):
+        self.mentor_ids = mentor_ids
+
+    def _find(self, mentor_id):
+        i = int(np.searchsorted(self.mentor_ids, mentor_id))
+        return i if i < len(self.mentor_ids) and self.mentor_ids[i] == mentor_id else None
+
+    def __contains__(self, mentor_id):
+        return self._find(mentor_id) is not None
+
+    def __getitem__(self, mentor_id):
+        i = self._find(mentor_id)
+        if i is None:
+            raise KeyError(mentor_id)
+        return i
+
+    def __len__(self):
+        return len(self.mentor_ids)
+
+
+class ProfileIndex:
+    """Row-normalized CSR matrix of all stored mentor vectors + a small overlay of fresh rows."""
+
+    def __init__(self, mentor_ids, matrix, pos=None):
+        self.mentor_ids = np.asarray(mentor_ids, dtype=np.int64)
+        self.matrix = matrix
+        self.pos = pos if pos is not None else {int(m): i for i, m in enumerate(self.mentor_ids)}
+        self.overlay = {}   # mentor_id -> normalized 1 x D row updated since build
+        self.overlay_at = {}  # mentor_id -> time.time() of the overlay update
+
+    @classmethod
+    def build(cls, db):
+        space, dim = feature_space(), _dim()
+        rows = db.query(MentorProfileVector.mentor_id, MentorProfileVector.indices,
+                        MentorProfileVector.data).filter(
+            MentorProfileVector.space == space
+        ).order_by(MentorProfileVector.mentor_id).all()
+        ids, indptr, idx_parts, val_parts = [], [0], [], []
+        for mid, indices, data in rows:
+            idx = np.frombuffer(indices, dtype=np.int32)
+            ids.append(mid)
+            idx_parts.append(idx)
+            val_parts.append(np.frombuffer(data, dtype=np.float32))
+            indptr.append(indptr[-1] + len(idx))
+        matrix = sp.csr_matrix(
+            (np.concatenate(val_parts) if val_parts else np.zeros(0, np.float32),
+             np.concatenate(idx_parts) if idx_parts else np.zeros(0, np.int32),
+             np.asarray(indptr)),
+            shape=(len(ids), dim), dtype=np.float32,
+        )
+        return cls(ids, normalize(matrix))
+
+    def set_row(self, mentor_id, vec):
+        self.overlay[int(mentor_id)] = normalize(vec)
+        self.overlay_at[int(mentor_id)] = time.time()
+
+    def scores(self, qvec, mentor_ids):
+        """Cosine similarity of qvec against the given mentors (missing mentors -> None)."""
+        out, rows, at = [None] * len(mentor_ids), [], []
+        for i, mid in enumerate(mentor_ids):
+            if mid in self.overlay:
+                out[i] = float((self.overlay[mid] @ qvec.T).toarray()[0, 0])
+            elif mid in self.pos:
+                rows.append(self.pos[mid])
+                at.append(i)
+        if rows:
+            # only the candidates' rows are multiplied, unless they are most of the matrix
+            if 2 * len(rows) < self.matrix.shape[0]:
+                base = (self.matrix[rows] @ qvec.T).toarray().ravel()
+            else:
+                base = (self.matrix @ qvec.T).toarray().ravel()[rows]
+            for i, s in zip(at, base):
+                out[i] = float(s)
+        return out
+
+
+def get_index(db):
+    global _index, _rebuild_since
+    if SHARED_PROFILE_INDEX:
+        from ml import shared_index
+        since, _rebuild_since = _rebuild_since, None
+        _index = shared_index.current(db, _index, since)
+        return _index
+    if _index is None or len(_index.overlay) > OVERLAY_LIMIT:
+        _index = ProfileIndex.build(db)
+    return _index
+
+
+def invalidate(mentor_id: int = None, vec=None):
+    """Refresh one mentor row in the cached index (or drop the whole index)."""
+    global _index, _rebuild_since
+    if mentor_id is None and SHARED_PROFILE_INDEX:
+        # keep serving the attached generation until one built after this moment is published
+        _rebuild_since = time.time()
+    elif mentor_id is None or _index is None:
+        _index = None
+    elif vec is not None:
+        _index.set_row(mentor_id, vec)
+    for listener in _listeners:
+        listener(mentor_id, vec)
+
+
+def refresh_mentor(db, mentor_id: int):
+    """Reload one mentor's stored vector into the cached index (after another process wrote it)."""
+    row = db.query(MentorProfileVector).filter(MentorProfileVector.mentor_id == mentor_id).first()
+    if row is not None and row.space == feature_space():
+        invalidate(mentor_id, _decode(row.indices, row.data, _dim()))
+
+
+def add_listener(fn):
+    if fn not in _listeners:
+        _listeners.append(fn)
+
+
+def score_mentors(db, augmented_question: str, mentor_ids, profile_text_of, char_ngrams: bool = True):
+    """
+    Cosine similarity (0..1) between the question and each mentor's stored vector.
+    Mentors without a stored vector are scored from their profile text on the fly,
+    profile_text_of(i) -> normalized profile text of mentor_ids[i], called only for
+    them (read-only; the migration / register path persists them).
+    """
+    qvec = text_vector(augmented_question, char_ngrams)
+    sims = get_index(db).scores(qvec, mentor_ids)
+    for i, s in enumerate(sims):
+        if s is None:
+            sims[i] = float((text_vector(profile_text_of(i)) @ qvec.T).toarray()[0, 0])
+    return np.asarray(sims, dtype=np.float64)
+
+
+def migrate_profile_vectors(db):
+    """Seed vectors for mentors that have none (or one from an older feature space)."""
+    from ml.mentor_keywords import get_keyword_vectors
+    space = feature_space()
+    current = {mid for (mid,) in db.query(MentorProfileVector.mentor_id).filter(
+        MentorProfileVector.space == space)}
+    mentors = db.query(User.id, User.subjects).filter(User.role == "mentor").all()
+    kw = get_keyword_vectors(db)
+    n = 0
+    for mid, subjects in mentors:
+        if mid in current:
+            continue
+        seed_profile(db, mid, subjects, [k for k, _ in kw.get(mid, ())])
+        n += 1
+    if n:
+        invalidate()
+    return n
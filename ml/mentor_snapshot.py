@@ -0,0 +1,196 @@
+# backend/ml/mentor_snapshot.py
+"""
+Process-local, read-only snapshot of the mentor pool for the hot question path.
+
+One MentorRecord (__slots__, no ORM state, no password hash) per mentor:
+    id, name, subjects_text (User.subjects as entered), subjects (normalized tuple),
+    keywords (tuple, most frequent first), profile (lowercased profile text the
+    keyword boost searches, built once here instead of on every match)
+plus a subject -> sorted mentor ids index. post_question and match_mentors read
+all mentor data from here instead of querying the users table.
+
+Invalidation: writers call mark_changed(db, mentor_id) inside their transaction,
+which appends to the mentor_changes log. Every get_snapshot() does one primary-key
+range read (version > last seen version) and reloads only the mentors listed;
+a NULL mentor_id forces a full rebuild. A snapshot is never modified once
+published: the reload builds a new one and swaps the module reference, so a
+request keeps reading the snapshot it started with, without taking the lock. The per-mentor keyword / subject / profile
+vector caches are refreshed the same way, so other processes' writes are seen too.
+"""
+import sys
+import bisect
+import threading
+import collections
+
+from sqlalchemy import func
+
+from models import MentorChange, MentorKeywordStat, MentorSubject, User
+
+KEEP_VERSIONS = 10000   # change-log rows kept behind the newest version (see trim_changes)
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+class MentorRecord:
+    __slots__ = ("id", "name", "subjects_text", "subjects", "keywords", "profile")
+
+    def __init__(self, id, name, subjects_text, subjects, keywords):
+        self.id = id
+        self.name = name
+        self.subjects_text = subjects_text
+        self.subjects = subjects
+        self.keywords = keywords
+        # subjects as entered + solved keywords (most frequent first), lowercased
+        self.profile = f"{subjects_text or ''} {','.join(keywords)}".lower()
+
+
+class MentorSnapshot:
+    def __init__(self, version):
+        self.version = version
+        self.records = {}       # mentor_id -> MentorRecord
+        self.ids = []           # sorted mentor ids
+        self.by_subject = {}    # subject -> sorted mentor ids
+
+    @classmethod
+    def build(cls, db):
+        snap = cls(_current_version(db))
+        rows = db.query(User.id, User.name, User.subjects).filter(
+            User.role == "mentor").order_by(User.id).all()
+        subjects, keywords = _load_terms(db, None)
+        for mid, name, subjects_text in rows:
+            snap._add(MentorRecord(mid, name, subjects_text, subjects.get(mid, ()), keywords.get(mid, ())))
+        return snap
+
+    # -------------------------
+    # reads
+    # -------------------------
+    def get(self, mentor_id):
+        return self.records.get(mentor_id)
+
+    def mentors(self, ids=None):
+        """Records in id order (all mentors, or the given ids that are mentors)."""
+        if ids is None:
+            return [self.records[m] for m in self.ids]
+        return [self.records[m] for m in sorted(set(ids)) if m in self.records]
+
+    def mentor_ids_for_subject(self, subject: str):
+        return list(self.by_subject.get((subject or "").strip().lower(), ()))
+
+    # -------------------------
+    # incremental refresh
+    # -------------------------
+    def _add(self, rec):
+        self.records[rec.id] = rec
+        if not self.ids or rec.id > self.ids[-1]:
+            self.ids.append(rec.id)
+        else:
+            bisect.insort(self.ids, rec.id)
+        for subj in rec.subjects:
+            ids = self.by_subject.setdefault(subj, [])
+            if not ids or rec.id > ids[-1]:
+                ids.append(rec.id)
+            else:
+                bisect.insort(ids, rec.id)
+
+    def _remove(self, mid):
+        old = self.records.pop(mid, None)
+        if old is None:
+            return
+        self.ids.pop(bisect.bisect_left(self.ids, mid))
+        for subj in old.subjects:
+            ids = self.by_subject.get(subj, [])
+            i = bisect.bisect_left(ids, mid)
+            if i < len(ids) and ids[i] == mid:
+                ids.pop(i)
+
+    def reloaded(self, db, mentor_ids, version):
+        """A new snapshot at version with mentor_ids re-read; self stays as its readers see it."""
+        snap = MentorSnapshot(version)
+        snap.records = dict(self.records)
+        snap.ids = list(self.ids)
+        snap.by_subject = {subj: list(ids) for subj, ids in self.by_subject.items()}
+        rows = {mid: (name, subjects_text) for mid, name, subjects_text in db.query(
+            User.id, User.name, User.subjects).filter(User.id.in_(mentor_ids), User.role == "mentor")}
+        subjects, keywords = _load_terms(db, mentor_ids)
+        for mid in mentor_ids:
+            snap._remove(mid)
+            if mid in rows:
+                name, subjects_text = rows[mid]
+                snap._add(MentorRecord(mid, name, subjects_text, subjects.get(mid, ()), keywords.get(mid, ())))
+        return snap
+
+
+def _load_terms(db, mentor_ids):
+    """{mid: subjects}, {mid: keywords by count desc} for the given mentors (None = all).
+
+    Strings are interned: a few thousand distinct subjects/keywords are shared by
+    every mentor, so each record only holds references.
+    """
+    subj_q = db.query(MentorSubject.mentor_id, MentorSubject.subject)
+    kw_q = db.query(MentorKeywordStat.mentor_id, MentorKeywordStat.keyword)
+    if mentor_ids is not None:
+        subj_q = subj_q.filter(MentorSubject.mentor_id.in_(mentor_ids))
+        kw_q = kw_q.filter(MentorKeywordStat.mentor_id.in_(mentor_ids))
+    subjects, keywords = collections.defaultdict(list), collections.defaultdict(list)
+    for mid, subj in subj_q.order_by(MentorSubject.mentor_id, MentorSubject.subject):
+        subjects[mid].append(sys.intern(subj))
+    for mid, kw in kw_q.order_by(MentorKeywordStat.mentor_id, MentorKeywordStat.count.desc(),
+                                 MentorKeywordStat.keyword):
+        keywords[mid].append(sys.intern(kw))
+    return ({mid: tuple(v) for mid, v in subjects.items()},
+            {mid: tuple(v) for mid, v in keywords.items()})
+
+
+def _current_version(db):
+    return db.query(func.coalesce(func.max(MentorChange.version), 0)).scalar()
+
+
+def mark_changed(db, mentor_id: int = None):
+    """Record that a mentor (or, with None, every mentor) changed. Does not commit."""
+    db.add(MentorChange(mentor_id=mentor_id))
+
+
+def get_snapshot(db):
+    """Return the process snapshot, applying any mentor changes logged since it was read."""
+    global _snapshot
+    from ml import mentor_keywords, mentor_profiles, mentor_subjects
+
+    with _lock:
+        if _snapshot is None:
+            _snapshot = MentorSnapshot.build(db)
+            return _snapshot
+
+        changes = db.query(MentorChange.version, MentorChange.mentor_id).filter(
+            MentorChange.version > _snapshot.version
+        ).order_by(MentorChange.version).all()
+        if not changes:
+            return _snapshot
+
+        newest = changes[-1][0]
+        changed = {mid for _, mid in changes}
+        # a gap means the log was trimmed past our version: we may have missed changes
+        if None in changed or changes[0][0] != _snapshot.version + 1:
+            _snapshot = MentorSnapshot.build(db)
+            mentor_keywords.invalidate()
+            mentor_subjects.invalidate()
+            mentor_profiles.invalidate()
+        else:
+            _snapshot = _snapshot.reloaded(db, sorted(changed), newest)
+            for mid in changed:
+                mentor_keywords.invalidate(mid)
+                mentor_subjects.invalidate(mid)
+                mentor_profiles.refresh_mentor(db, mid)
+        return _snapshot
+
+
+def trim_changes(db):
+    """Drop change-log rows far behind the newest version. Does not commit."""
+    newest = _current_version(db)
+    return db.query(MentorChange).filter(MentorChange.version < newest - KEEP_VERSIONS).delete()
+
+
+def invalidate():
+    global _snapshot
+    with _lock:
+        _snapshot = None
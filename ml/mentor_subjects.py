@@ -0,0 +1,87 @@
+# backend/ml/mentor_subjects.py
+"""
+Mentor subject membership backed by the mentor_subjects(mentor_id, subject) table.
+
+User.subjects stays the display copy ("math,physics"); every subject lookup goes
+through this table instead of LIKE '%x%' scans or re-splitting the CSV:
+  - mentor_ids_for_subject: indexed equality lookup (ix_mentor_subjects_subject_mentor)
+  - get_subject_map:        cached { mentor_id: ("math", "physics") } for the matcher
+Writers (register, seed scripts) call set_mentor_subjects and invalidate().
+"""
+import collections
+
+from sqlalchemy import exists
+
+from models import MentorSubject, User
+
+_subject_map = None   # lazy-loaded { mentor_id: (subject, ...) }
+_stale = set()
+
+
+def split_subjects(csv_text):
+    """Normalize a comma-separated subject string -> deduped lowercase subjects."""
+    return list(dict.fromkeys(s.strip().lower() for s in (csv_text or "").split(",") if s.strip()))
+
+
+def set_mentor_subjects(db, mentor_id: int, subjects_csv: str):
+    """Replace a mentor's subject rows. Does not commit; call invalidate(mentor_id) after."""
+    db.query(MentorSubject).filter(MentorSubject.mentor_id == mentor_id).delete()
+    for subj in split_subjects(subjects_csv):
+        db.add(MentorSubject(mentor_id=mentor_id, subject=subj))
+
+
+def mentor_ids_for_subject(db, subject: str):
+    """Mentor ids teaching exactly this subject (indexed equality, id order)."""
+    subject = (subject or "").strip().lower()
+    if not subject:
+        return []
+    rows = db.query(MentorSubject.mentor_id).filter(
+        MentorSubject.subject == subject
+    ).order_by(MentorSubject.mentor_id).all()
+    return [mid for (mid,) in rows]
+
+
+def get_subject_map(db):
+    """Return the cached { mentor_id: (subject, ...) } map, loading lazily."""
+    global _subject_map
+    if _subject_map is None:
+        grouped = collections.defaultdict(list)
+        for mid, subj in db.query(MentorSubject.mentor_id, MentorSubject.subject).order_by(
+            MentorSubject.mentor_id, MentorSubject.subject
+        ):
+            grouped[mid].append(subj)
+        _subject_map = {mid: tuple(s) for mid, s in grouped.items()}
+        _stale.clear()
+    elif _stale:
+        for mid in list(_stale):
+            rows = db.query(MentorSubject.subject).filter(
+                MentorSubject.mentor_id == mid
+            ).order_by(MentorSubject.subject).all()
+            _subject_map[mid] = tuple(s for (s,) in rows)
+            _stale.discard(mid)
+    return _subject_map
+
+
+def invalidate(mentor_id: int = None):
+    global _subject_map
+    if mentor_id is None:
+        _subject_map = None
+        _stale.clear()
+    else:
+        _stale.add(mentor_id)
+
+
+def migrate_mentor_subjects(db):
+    """Backfill mentor_subjects from User.subjects for mentors without rows. Does not commit."""
+    has_rows = exists().where(MentorSubject.mentor_id == User.id)
+    mentors = db.query(User.id, User.subjects).filter(
+        User.role == "mentor",
+        User.subjects.isnot(None),
+        User.subjects != "",
+        ~has_rows,
+    ).all()
+    for mid, subjects in mentors:
+        set_mentor_subjects(db, mid, subjects)
+    if mentors:
+        invalidate()
+    return len(mentors)
@@ -0,0 +1,132 @@
+# backend/ml/near_duplicates.py
+"""
+Near-duplicate question detection with MinHash + LSH, persisted in SQLite.
+
+  signature(text)   NUM_PERM MinHash values over character 5-shingles of the
+                    normalized text (robust to reordering and small rewording)
+  question_lsh      the signature cut into BANDS bands of ROWS values; each band
+                    hashes to a bucket, and questions sharing any bucket are candidates
+  question_signatures  full signatures, used to estimate Jaccard on the candidates
+
+find_duplicate() returns the most similar recent question (same subject, posted
+within DUP_WINDOW_HOURS) whose estimated Jaccard similarity is at least
+DUP_THRESHOLD, with the ML scores of its match. index_question() adds a
+question; both run inside the posting transaction, so the index is updated
+incrementally on every post. Async posts get their scores once the worker has
+matched them (set_scores). Rows older than the window are dropped by the match
+workers every SIGNATURE_TRIM_SECONDS (trim_signatures).
+"""
+import os
+import zlib
+import hashlib
+
+import numpy as np
+from sqlalchemy import and_, or_, text
+
+from models import QuestionLSH, QuestionSignature
+from ml.advanced_matcher import _normalize_text
+
+NUM_PERM = 64
+BANDS, ROWS = 16, 4          # BANDS * ROWS == NUM_PERM; candidate threshold ~ (1/16)^(1/4) = 0.5
+SHINGLE = 5
+DUP_THRESHOLD = float(os.environ.get("DUP_THRESHOLD", "0.8"))
+DUP_WINDOW_HOURS = float(os.environ.get("DUP_WINDOW_HOURS", "72"))
+SIGNATURE_TRIM_SECONDS = float(os.environ.get("SIGNATURE_TRIM_SECONDS", "600"))
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1234)
+_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+
+def shingles(text_: str):
+    norm = _normalize_text(text_)
+    if len(norm) <= SHINGLE:
+        return {norm} if norm else set()
+    return {norm[i:i + SHINGLE] for i in range(len(norm) - SHINGLE + 1)}
+
+
+def signature(text_: str):
+    """uint32 MinHash signature (NUM_PERM,), or None for empty text."""
+    sh = shingles(text_)
+    if not sh:
+        return None
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in sh), dtype=np.uint64, count=len(sh))
+    # a * x < 2^62, so the universal hash never overflows uint64
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return float(np.mean(sig_a == sig_b))
+
+
+def encode_scores(ml_scores) -> str:
+    return ",".join(f"{int(mid)}:{float(score):g}" for mid, score in (ml_scores or {}).items()) or None
+
+
+def decode_scores(text_: str):
+    out = {}
+    for item in (text_ or "").split(","):
+        mid, _, score = item.partition(":")
+        if mid.isdigit() and score:
+            out[int(mid)] = float(score)
+    return out
+
+
+def band_buckets(sig):
+    """[(band, bucket), ...] with bucket a signed 64-bit hash of the band's rows."""
+    out = []
+    for b in range(BANDS):
+        digest = hashlib.blake2b(sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).digest()
+        out.append((b, int.from_bytes(digest, "little", signed=True)))
+    return out
+
+
+def find_duplicate(db, text_: str, subject: str, sig=None):
+    """Most similar recent question -> (question_id, similarity, {mentor_id: ML score}) or None."""
+    sig = signature(text_) if sig is None else sig
+    if sig is None:
+        return None
+    # OR of (band, bucket) pairs: one primary-key seek each (a row-value IN scans the table)
+    candidates = db.query(QuestionLSH.question_id).filter(
+        or_(*[and_(QuestionLSH.band == b, QuestionLSH.bucket == bucket) for b, bucket in band_buckets(sig)])
+    )
+    rows = db.query(QuestionSignature.question_id, QuestionSignature.signature, QuestionSignature.ml_scores).filter(
+        QuestionSignature.question_id.in_(candidates.scalar_subquery()),
+        QuestionSignature.subject == (subject or "").strip().lower(),
+        QuestionSignature.created_at >= text(f"datetime('now', '-{DUP_WINDOW_HOURS:g} hours')"),
+    ).all()
+    best = None
+    for qid, blob, scores in rows:
+        sim = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+        if sim >= DUP_THRESHOLD and (best is None or sim > best[1] or (sim == best[1] and qid > best[0])):
+            best = (qid, sim, scores)
+    if best is None:
+        return None
+    return best[0], best[1], decode_scores(best[2])
+
+
+def index_question(db, question_id: int, subject: str, sig, ml_scores=None):
+    """Add a question's signature, the ML scores of its match and LSH buckets. Does not commit."""
+    if sig is None:
+        return
+    db.add(QuestionSignature(question_id=question_id, subject=(subject or "").strip().lower(),
+                             signature=sig.astype(np.uint32).tobytes(), ml_scores=encode_scores(ml_scores)))
+    db.add_all([QuestionLSH(band=b, bucket=bucket, question_id=question_id) for b, bucket in band_buckets(sig)])
+
+
+def set_scores(db, question_id: int, ml_scores):
+    """Store the ML scores of a question matched after it was indexed (async posts). Does not commit."""
+    db.query(QuestionSignature).filter(QuestionSignature.question_id == question_id).update(
+        {QuestionSignature.ml_scores: encode_scores(ml_scores)}, synchronize_session=False)
+
+
+def trim_signatures(db):
+    """Drop index rows of questions older than the reuse window. Does not commit."""
+    cutoff = text(f"datetime('now', '-{DUP_WINDOW_HOURS:g} hours')")
+    old = db.query(QuestionSignature.question_id).filter(QuestionSignature.created_at < cutoff)
+    db.query(QuestionLSH).filter(QuestionLSH.question_id.in_(old.scalar_subquery())).delete(
+        synchronize_session=False)
+    return db.query(QuestionSignature).filter(QuestionSignature.created_at < cutoff).delete(
+        synchronize_session=False)
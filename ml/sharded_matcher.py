@@ -0,0 +1,303 @@
+# backend/ml/sharded_matcher.py
+"""
+Sharded multi-process top-k matching, used by match_mentors(engine="sharded").
+
+The mentor pool (stored profile vectors + subjects + keyword profile text) is
+split into N contiguous mentor-id ranges, each held by a worker process. A query
+is prepared once by the coordinator (keywords, question vector), fanned out to
+every shard, each shard scores its mentors exactly like the "profile" engine and
+returns its local top-k, and the coordinator merges them. Ties are broken by
+mentor id on both sides, so the merged ranking equals match_mentors(engine="profile").
+
+Shard count: MATCH_SHARDS (default: number of CPUs). Mentors changed after the
+pool was built (accepts, registrations) are pushed to their shard before the
+next query.
+
+A shard that exits, or does not answer within MATCH_SHARD_TIMEOUT_MS, breaks
+the pool: the query is scored in-process by the "profile" engine instead
+(match.sharded_failover) and the next query starts a fresh pool.
+
+The pool belongs to the process that started it. A forked child (serve.py
+workers) forgets an inherited pool without touching the shards and starts its
+own on its first query: siblings sharing the shards' pipes would read each
+other's answers, and only the parent can join the shard processes. A shard
+exits on its own once its coordinator is gone (workers leave with os._exit).
+"""
+import os
+import bisect
+import heapq
+import threading
+import multiprocessing as mp
+
+import numpy as np
+import scipy.sparse as sp
+
+import metrics
+
+N_SHARDS = int(os.environ.get("MATCH_SHARDS", "0")) or (os.cpu_count() or 1)
+SHARD_TIMEOUT_S = float(os.environ.get("MATCH_SHARD_TIMEOUT_MS", "2000")) / 1000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# -------------------------
+# Shard (runs inside the worker process)
+# -------------------------
+class Shard:
+    def __init__(self, mentor_ids, matrix, overlay, subjects, profiles):
+        self.ids = [int(m) for m in mentor_ids]      # mentors with a row in matrix, then overlay-only
+        self.n_matrix = matrix.shape[0]
+        self.matrix = matrix.tocsr()
+        self.overlay = dict(overlay)                 # mentor_id -> 1 x D row scored on its own
+        self.subjects = dict(subjects)               # mentor_id -> [subject tokens]
+        self.profiles = dict(profiles)               # mentor_id -> lowercased raw profile text
+        self.known = set(self.ids)
+
+    def update(self, mentor_id, row, subject_toks, profile):
+        if mentor_id not in self.known:
+            self.ids.append(mentor_id)
+            self.known.add(mentor_id)
+        self.overlay[mentor_id] = row
+        self.subjects[mentor_id] = subject_toks
+        self.profiles[mentor_id] = profile
+
+    def topk(self, qvec, subject, keywords, k):
+        from ml.advanced_matcher import boost_score
+
+        base = np.asarray((self.matrix @ qvec.T).todense()).ravel() if self.n_matrix else []
+        sims = []
+        for i, mid in enumerate(self.ids):
+            if mid in self.overlay:
+                sims.append(float((self.overlay[mid] @ qvec.T).toarray()[0, 0]))
+            else:
+                sims.append(float(base[i]))
+        base_percent = (np.asarray(sims, dtype=np.float64) * 100.0).round(4)
+
+        scored = ((boost_score(base_percent[i], subject, self.subjects[mid], self.profiles[mid], keywords), mid)
+                  for i, mid in enumerate(self.ids))
+        return heapq.nsmallest(k, scored, key=lambda sm: (-sm[0], sm[1]))
+
+
+def _shard_worker(conn, shard, owner):
+    while True:
+        while not conn.poll(1.0):
+            try:
+                os.kill(owner, 0)
+            except ProcessLookupError:
+                return   # the coordinator exited without close() (os._exit, SIGKILL): do not linger
+        msg = conn.recv()
+        op = msg[0]
+        if op == "query":
+            _, q_indices, q_data, dim, subject, keywords, k = msg
+            qvec = sp.csr_matrix((q_data, q_indices, np.array([0, len(q_indices)])), shape=(1, dim))
+            conn.send(shard.topk(qvec, subject, keywords, k))
+        elif op == "update":
+            shard.update(*msg[1:])
+        elif op == "stop":
+            conn.close()
+            return
+
+
+# -------------------------
+# Coordinator
+# -------------------------
+class ShardPool:
+    def __init__(self, shards, ctx=None):
+        ctx = ctx or mp.get_context()
+        self.lower_bounds = [s.ids[0] if s.ids else 0 for s in shards]
+        self.conns, self.procs = [], []
+        for shard in shards:
+            parent, child = ctx.Pipe()
+            p = ctx.Process(target=_shard_worker, args=(child, shard, os.getpid()), daemon=True)
+            p.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(p)
+        self.lock = threading.Lock()
+        self.dirty = set()      # mentor ids to push before the next query
+        self.stale = False      # full rebuild needed
+        self.broken = False     # a shard died or timed out: replaced on the next get_pool
+
+    @staticmethod
+    def split(mentor_ids, matrix, overlay, subjects, profiles, n_shards):
+        """Partition mentors (sorted by id) into n contiguous id ranges -> [Shard]."""
+        n = len(mentor_ids)
+        n_shards = max(1, min(n_shards, n or 1))
+        bounds = np.linspace(0, n, n_shards + 1).astype(int)
+        shards = []
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            ids = [int(m) for m in mentor_ids[a:b]]
+            shards.append(Shard(ids, matrix[a:b],
+                                {m: overlay[m] for m in ids if m in overlay},
+                                {m: subjects[m] for m in ids}, {m: profiles[m] for m in ids}))
+        return shards
+
+    @classmethod
+    def from_arrays(cls, mentor_ids, matrix, subjects, profiles, n_shards=N_SHARDS, overlay=None):
+        return cls(cls.split(mentor_ids, matrix, overlay or {}, subjects, profiles, n_shards))
+
+    @classmethod
+    def from_db(cls, db, n_shards=N_SHARDS):
+        ids, matrix, overlay, subjects, profiles = _load_pool_data(db)
+        return cls.from_arrays(ids, matrix, subjects, profiles, n_shards=n_shards, overlay=overlay)
+
+    def shard_of(self, mentor_id):
+        return max(0, bisect.bisect_right(self.lower_bounds, mentor_id) - 1)
+
+    def push(self, mentor_id, row, subject_toks, profile):
+        try:
+            self.conns[self.shard_of(mentor_id)].send(("update", mentor_id, row, subject_toks, profile))
+        except OSError:
+            self.broken = True   # dead shard: the new pool loads the update from the database
+
+    def topk(self, qvec, subject, keywords, k, timeout=SHARD_TIMEOUT_S):
+        """
+        Fan out one query, merge the shards' local top-k -> [(score, mentor_id), ...].
+        Raises TimeoutError / EOFError / OSError (and marks the pool broken) when a
+        shard is dead or does not answer within timeout seconds.
+        """
+        qvec = qvec.tocsr()
+        msg = ("query", qvec.indices, qvec.data, qvec.shape[1], subject, keywords, k)
+        with self.lock:
+            if self.broken:
+                raise EOFError("shard pool is broken")
+            try:
+                for conn in self.conns:
+                    conn.send(msg)
+                parts = []
+                for conn, p in zip(self.conns, self.procs):
+                    # a dead shard's pipe is readable at once and recv raises EOFError
+                    if not conn.poll(timeout):
+                        raise TimeoutError(f"shard pid {p.pid} did not answer within {timeout:g}s")
+                    parts.append(conn.recv())
+            except (TimeoutError, EOFError, OSError):
+                # unread answers would be taken for the next query's: the pool is not reused
+                self.broken = True
+                raise
+        return heapq.nsmallest(k, (sm for part in parts for sm in part), key=lambda sm: (-sm[0], sm[1]))
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for p in self.procs:
+            p.join(timeout=1)
+            if p.is_alive():   # hung shard (SIGKILL: a stopped process never handles SIGTERM)
+                p.kill()
+                p.join(timeout=5)
+        for conn in self.conns:
+            conn.close()
+
+
+def _mentor_rows(db, mentors):
+    """Scoring inputs of the given snapshot records, exactly as match_mentors(engine="profile") sees them."""
+    from ml import mentor_profiles
+    from ml.advanced_matcher import _normalize_text
+
+    index = mentor_profiles.get_index(db)
+    out = []
+    for m in mentors:
+        if m.id in index.overlay:
+            where = ("row", index.overlay[m.id])
+        elif m.id in index.pos:
+            where = ("matrix", index.pos[m.id])
+        else:
+            # no stored vector: scored from the profile text, as in score_mentors
+            where = ("row", mentor_profiles.text_vector(_normalize_text(m.profile)))
+        out.append((m.id, where, m.subjects, m.profile))
+    return index, out
+
+
+def _load_pool_data(db):
+    from ml.mentor_snapshot import get_snapshot
+
+    index, rows = _mentor_rows(db, get_snapshot(db).mentors())
+    ids, pos, overlay, subjects, profiles = [], [], {}, {}, {}
+    for mid, (kind, val), toks, profile in rows:
+        ids.append(mid)
+        subjects[mid] = toks
+        profiles[mid] = profile
+        if kind == "matrix":
+            pos.append(val)
+        else:
+            pos.append(None)    # placeholder row; the overlay wins in Shard.topk
+            overlay[mid] = val
+    dim = index.matrix.shape[1]
+    if index.matrix.shape[0]:
+        matrix = index.matrix[[p if p is not None else 0 for p in pos]]
+    else:
+        matrix = sp.csr_matrix((len(ids), dim), dtype=np.float32)
+    return ids, matrix, overlay, subjects, profiles
+
+
+def _on_profile_update(mentor_id, vec):
+    if _pool is not None:
+        if mentor_id is None:
+            _pool.stale = True
+        else:
+            _pool.dirty.add(int(mentor_id))
+
+
+def close_pool():
+    """Stop the process-wide shard pool, if any (serve.unwarm); the next query starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _forget_pool():
+    """After fork, in the child: drop the parent's pool (its shards, pipes and lock are the parent's)."""
+    global _pool, _pool_lock
+    _pool_lock = threading.Lock()
+    if _pool is not None:
+        for conn in _pool.conns:
+            conn.close()   # this process's copies of the descriptors only
+        _pool = None
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def get_pool(db):
+    """Start (or restart after a full invalidation or a dead shard) the process-wide shard pool."""
+    global _pool
+    from ml import mentor_profiles
+    from ml.mentor_snapshot import get_snapshot
+
+    snapshot = get_snapshot(db)    # applies other processes' changes (-> dirty / stale)
+    with _pool_lock:
+        if _pool is not None and (_pool.stale or _pool.broken):
+            _pool.close()
+            _pool = None
+        if _pool is None:
+            _pool = ShardPool.from_db(db)
+            mentor_profiles.add_listener(_on_profile_update)
+        if _pool.dirty:
+            dirty, _pool.dirty = _pool.dirty, set()
+            _, rows = _mentor_rows(db, snapshot.mentors(dirty))
+            index = mentor_profiles.get_index(db)
+            for mid, (kind, val), toks, profile in rows:
+                row = index.matrix[val] if kind == "matrix" else val
+                _pool.push(mid, row, toks, profile)
+    return _pool
+
+
+def match_mentors(question_text: str, subject: str, db, top_k: int = 5, keywords=None, char_ngrams: bool = True):
+    """Same contract, arguments and ranking as advanced_matcher.match_mentors(engine="profile")."""
+    from ml import mentor_profiles
+    from ml.advanced_matcher import match_mentors as match_in_process, prepare_query
+
+    subject, keywords, augmented_question = prepare_query(question_text, subject, keywords)
+    qvec = mentor_profiles.text_vector(augmented_question, char_ngrams)
+    try:
+        found = get_pool(db).topk(qvec, subject, keywords, top_k)
+    except (TimeoutError, EOFError, OSError):
+        metrics.incr("match.sharded_failover")
+        return match_in_process(question_text, subject, db, top_k=top_k, engine="profile", keywords=keywords,
+                                char_ngrams=char_ngrams)
+    return [{"mentor_id": int(mid), "score": float(score)} for score, mid in found]
@@ -0,0 +1,197 @@
+# backend/ml/shared_index.py
+"""
+Mentor profile index shared by all worker processes through mmap'd files
+(used by mentor_profiles.get_index when SHARED_PROFILE_INDEX=1).
+
+    SHARED_INDEX_DIR/
+        CURRENT            generation number of the live index
+        gen-<N>/           mentor_ids.npy, data.npy, indices.npy, indptr.npy, meta.json
+
+publish() builds the row-normalized CSR matrix from mentor_profile_vectors
+once, writes it as the next generation and then atomically replaces CURRENT.
+A file lock makes concurrent publishers build only once. Workers np.load the
+arrays with mmap_mode="r" and wrap them in a CSR matrix without copying. Every
+process maps the same page-cache pages, so N workers hold one copy of the
+matrix. Building also happens only once instead of once per worker.
+
+After a full invalidation (e.g. keywords reseeded) a process asks for a
+generation built after it saw the invalidation: only a generation whose build
+started later is known to contain the change, whatever the process held.
+
+current() re-reads CURRENT at most every SHARED_INDEX_CHECK_SECONDS and swaps
+to a newer generation by replacing one reference. Requests already scoring
+against the old arrays keep their mapping; the files of old generations are
+unlinked but stay readable until unmapped. Overlay rows (accepts since the
+build) newer than the generation are carried over. A worker whose overlay
+outgrows OVERLAY_LIMIT publishes the next generation for everyone.
+
+Mentor ids are looked up by binary search in the mapped id array instead of a
+per-process dict. Subject incidence and mentor names stay in the compact per-process mentor
+snapshot (ml/mentor_snapshot.py); the profile matrix is what grows.
+
+    python -m ml.shared_index publish      # build from expert_link.db now
+"""
+import os
+import sys
+import json
+import time
+import fcntl
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import scipy.sparse as sp
+
+HERE = os.path.dirname(__file__)
+SHARED_INDEX_DIR = os.environ.get("SHARED_INDEX_DIR", os.path.join(HERE, "shared_index"))
+SHARED_INDEX_CHECK_SECONDS = float(os.environ.get("SHARED_INDEX_CHECK_SECONDS", "1"))
+KEEP_GENERATIONS = 2
+_ARRAYS = ("mentor_ids", "data", "indices", "indptr")
+
+_lock = threading.Lock()
+_checked_at = 0.0
+
+
+def _gen_dir(gen: int) -> str:
+    return os.path.join(SHARED_INDEX_DIR, f"gen-{gen}")
+
+
+def current_generation() -> int:
+    try:
+        with open(os.path.join(SHARED_INDEX_DIR, "CURRENT")) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+@contextmanager
+def _publish_lock():
+    os.makedirs(SHARED_INDEX_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_INDEX_DIR, ".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _built_at(gen: int) -> float:
+    """time.time() at which generation gen started reading the database (0 if missing)."""
+    try:
+        with open(os.path.join(_gen_dir(gen), "meta.json")) as f:
+            return json.load(f)["built_at"]
+    except FileNotFoundError:
+        return 0.0
+
+
+def publish(db, after: int = None, since: float = None) -> int:
+    """
+    Build the index and make it the live generation -> generation number.
+    With after=N, return without building if a generation newer than N was
+    published meanwhile (another process already rebuilt). With since=T, return
+    without building if the live generation was built at or after time T.
+    """
+    from ml import mentor_profiles
+
+    with _publish_lock():
+        gen = current_generation()
+        if after is not None and gen > after:
+            return gen
+        if since is not None and gen and _built_at(gen) >= since:
+            return gen
+        gen += 1
+        built_at = time.time()
+        index = mentor_profiles.ProfileIndex.build(db)
+        m = index.matrix
+        tmp = os.path.join(SHARED_INDEX_DIR, f".gen-{gen}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        arrays = {
+            "mentor_ids": index.mentor_ids.astype(np.int64),
+            "data": m.data.astype(np.float32),
+            "indices": m.indices.astype(np.int32),
+            "indptr": m.indptr.astype(np.int32),   # one index dtype: scipy would copy mixed ones
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({"generation": gen, "space": mentor_profiles.feature_space(), "shape": list(m.shape),
+                       "built_at": built_at}, f)
+        os.replace(tmp, _gen_dir(gen))
+        with open(os.path.join(SHARED_INDEX_DIR, ".CURRENT.tmp"), "w") as f:
+            f.write(str(gen))
+        os.replace(os.path.join(SHARED_INDEX_DIR, ".CURRENT.tmp"), os.path.join(SHARED_INDEX_DIR, "CURRENT"))
+        for name in os.listdir(SHARED_INDEX_DIR):
+            if name.startswith("gen-") and int(name[4:]) <= gen - KEEP_GENERATIONS:
+                shutil.rmtree(os.path.join(SHARED_INDEX_DIR, name), ignore_errors=True)
+        return gen
+
+
+def attach(gen: int):
+    """Map one generation read-only -> ProfileIndex, or None if missing / from another feature space."""
+    from ml import mentor_profiles
+
+    path = _gen_dir(gen)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+    except FileNotFoundError:
+        return None
+    if meta["space"] != mentor_profiles.feature_space():
+        return None
+    matrix = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                           shape=tuple(meta["shape"]), copy=False)
+    index = mentor_profiles.ProfileIndex(arrays["mentor_ids"], matrix,
+                                         pos=mentor_profiles.SortedPositions(arrays["mentor_ids"]))
+    index.generation = gen
+    index.built_at = meta["built_at"]
+    return index
+
+
+def current(db, index=None, rebuild_since: float = None):
+    """
+    The live shared index for this process, given the one it holds (or None).
+    Publishes a generation first if there is none, if the live one was built
+    before rebuild_since (time of a full invalidation) or if index's overlay has
+    outgrown OVERLAY_LIMIT.
+    """
+    global _checked_at
+    from ml import mentor_profiles
+
+    with _lock:
+        held = getattr(index, "generation", 0)
+        too_big = index is not None and len(index.overlay) > mentor_profiles.OVERLAY_LIMIT
+        if rebuild_since is not None:
+            gen = publish(db, since=rebuild_since)
+        elif too_big:
+            gen = publish(db, after=held)
+        elif index is not None and time.monotonic() - _checked_at < SHARED_INDEX_CHECK_SECONDS:
+            return index
+        else:
+            gen = current_generation() or publish(db, after=0)
+        _checked_at = time.monotonic()
+        if index is not None and gen == held:
+            return index
+        fresh = attach(gen)
+        if fresh is None:
+            # missing or stale feature space: rebuild for everyone
+            fresh = attach(publish(db, after=gen))
+        if index is not None:
+            # accepts this process saw after the new generation was read from the DB
+            for mid, vec in index.overlay.items():
+                if index.overlay_at.get(mid, 0) >= fresh.built_at:
+                    fresh.set_row(mid, vec)
+        return fresh
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["publish"]:
+        sys.exit("usage: python -m ml.shared_index publish")
+    from db import SessionLocal
+    db = SessionLocal()
+    try:
+        print(f"published generation {publish(db)} to {SHARED_INDEX_DIR}")
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+# backend/ml/strategies.py
+"""
+Mentor matching strategies, selected by name.
+
+    strategies.match("profile", text, subject, db, top_k=5)
+        -> [{"mentor_id": <int>, "score": <0..100 float>}, ...] best first
+
+Registered here:
+  profile, ann, sharded,   advanced_matcher.match_mentors with that engine
+  fts, tfidf
+  knn                      ml/matcher.py nearest neighbours over model.pkl; only
+                           numeric mentor ids are kept, so the bundled model.pkl
+                           (synthetic ids like "m_math_1") matches nobody
+  overlap                  share of the question keywords found in a mentor's
+                           keywords + subjects (the score matched_mentor_list
+                           falls back to when there is no ML score)
+
+MATCH_STRATEGY is the default (MATCH_ENGINE when unset). A post can ask for
+another one with QuestionIn.strategy; shadow.py runs a candidate next to it.
+A new strategy is a function registered under a name:
+
+    @strategies.register("mine")
+    def mine(question_text, subject, db, top_k, keywords=None, char_ngrams=True, candidates=None): ...
+
+keywords, when given, are the question's already extracted top 8 keywords.
+char_ngrams=False and candidates (mentor ids) come from the time budget of
+matching_service: skip char n-gram features / score only these mentors.
+"""
+import os
+
+from ml import matcher, mentor_profiles
+from ml.advanced_matcher import MATCH_ENGINE, extract_keywords, match_mentors
+from ml.mentor_snapshot import get_snapshot
+
+MATCH_STRATEGY = os.environ.get("MATCH_STRATEGY") or MATCH_ENGINE
+
+_registry = {}
+
+
+def register(name: str):
+    def decorator(fn):
+        _registry[name] = fn
+        return fn
+    return decorator
+
+
+def names():
+    return sorted(_registry)
+
+
+def match(name: str, question_text: str, subject: str, db, top_k: int = 5, keywords=None, char_ngrams=True,
+          candidates=None):
+    """Run strategy name (KeyError if unknown)."""
+    return _registry[name](question_text, subject, db, top_k, keywords=keywords, char_ngrams=char_ngrams,
+                           candidates=candidates)
+
+
+def uses_char_ngrams(name: str) -> bool:
+    """Whether char_ngrams=False makes strategy name cheaper."""
+    return name == "tfidf" or (name in ENGINES and mentor_profiles.PROFILE_FEATURES == "hashed")
+
+
+def _engine(engine):
+    def run(question_text, subject, db, top_k, keywords=None, char_ngrams=True, candidates=None):
+        return match_mentors(question_text, subject, db, top_k=top_k, engine=engine, keywords=keywords,
+                             char_ngrams=char_ngrams, candidates=candidates)
+    return run
+
+
+ENGINES = ("profile", "ann", "sharded", "fts", "tfidf")
+for _name in ENGINES:
+    register(_name)(_engine(_name))
+
+
+@register("knn")
+def knn(question_text, subject, db, top_k, keywords=None, char_ngrams=True, candidates=None):
+    ids = [mid for mid in matcher.load_model_and_match(question_text, subject) if str(mid).isdigit()]
+    # kneighbors order only: score by rank
+    return [{"mentor_id": int(mid), "score": 100.0 * (len(ids) - i) / len(ids)} for i, mid in enumerate(ids[:top_k])]
+
+
+def overlap_score(mentor, question_keywords) -> float:
+    """Share (0..1) of the question keywords in the mentor's keywords + subjects."""
+    mk = list(dict.fromkeys(mentor.keywords + mentor.subjects))
+    if not mk or not question_keywords:
+        return 0.0
+    overlap = sum(1 for k in question_keywords if k.lower() in mk)
+    return round(overlap / max(1, len(question_keywords)), 4)
+
+
+@register("overlap")
+def overlap(question_text, subject, db, top_k, keywords=None, char_ngrams=True, candidates=None):
+    if keywords is None:
+        keywords = extract_keywords(question_text, top_k=8)
+    scored = [{"mentor_id": m.id, "score": 100.0 * overlap_score(m, keywords)}
+              for m in get_snapshot(db).mentors(candidates)]
+    scored = [s for s in scored if s["score"] > 0]
+    scored.sort(key=lambda x: x["score"], reverse=True)
+    return scored[:top_k]
@@ -1,84 +1,255 @@
 # ml/train_advanced.py
+"""
+Retrain the price model used by advanced_matcher.predict_price.
+
+    python -m ml.train_advanced                         # questions + questions_archive in expert_link.db
+    python -m ml.train_advanced --source csv            # data/synthetic_questions.csv
+    python -m ml.train_advanced --n-jobs 4 --n-estimators 100 --force
+
+Rows (text, subject, price > 0) are streamed in chunks of TRAIN_CHUNK_ROWS, from
+a server-side cursor or the CSV reader, and each chunk is turned into float32
+features at once (advanced_matcher.price_features, the exact serving features),
+so memory holds numbers, never the question texts. A RandomForestRegressor is
+fit on 80% of them with n_jobs workers; the rest gives MAE / R2.
+
+The saved model holds only what serving reads (price_model, subject_map) plus
+version, features and stats. The forest is stored with n_jobs=1, because
+predict_price scores one row per request and a joblib pool per call costs more
+than the trees. Every run is written as ml/model_advanced.v<N>.pkl (the last
+KEEP_VERSIONS are kept for rollback) and then atomically replaces
+ml/model_advanced.pkl.
+
+Before that, the single-row latency of the new and the live model is measured
+on the same held-out rows. If the new median exceeds the live one by more than
+PRICE_LATENCY_TOLERANCE, or PRICE_MAX_LATENCY_MS when set, the model is not
+promoted and the command exits with status 1 (--force promotes anyway).
+Writes ml/reports/price_model.json and price_model.txt.
+"""
+import io
 import os
+import csv
+import glob
+import json
+import time
+import argparse
+import itertools
+
 import joblib
 import numpy as np
-import random
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
 from sklearn.ensemble import RandomForestRegressor
-
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "model_advanced.pkl")
-
-def generate_synthetic_questions(num=500):
-    subjects = ["math", "physics", "chemistry", "cs"]
-    topics = {
-        "math": ["algebra", "calculus integrals", "geometry theorems", "differential equations"],
-        "physics": ["mechanics dynamics", "optics light", "thermodynamics", "electricity magnetism"],
-        "chemistry": ["organic reactions", "periodic table", "chemical bonding", "titration"],
-        "cs": ["graphs dp", "recursion", "sorting algorithms", "data structures"]
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from ml.advanced_matcher import MODEL_PATH, price_features
+
+HERE = os.path.dirname(__file__)
+CSV_PATH = os.path.join(HERE, "..", "data", "synthetic_questions.csv")
+REPORT_DIR = os.path.join(HERE, "reports")
+FEATURES = ["length", "complexity", "demand", "subject"]
+
+TRAIN_CHUNK_ROWS = int(os.environ.get("TRAIN_CHUNK_ROWS", "5000"))
+PRICE_LATENCY_TOLERANCE = float(os.environ.get("PRICE_LATENCY_TOLERANCE", "1.25"))
+PRICE_MAX_LATENCY_MS = float(os.environ.get("PRICE_MAX_LATENCY_MS", "0"))   # 0 = no absolute limit
+KEEP_VERSIONS = 3
+LATENCY_SAMPLES = 300
+HOLDOUT = 0.2
+
+
+def db_rows(db):
+    """(text, subject, price) of every priced question, live and archived, from a server-side cursor."""
+    from sqlalchemy import select, union_all, inspect
+    from models import Question, QuestionArchive
+
+    def part(model):
+        return select(model.text, model.subject, model.price).where(model.price > 0)
+
+    stmt = part(Question)
+    if inspect(db.get_bind()).has_table(QuestionArchive.__tablename__):   # created by migrations.py
+        stmt = union_all(stmt, part(QuestionArchive))
+    yield from db.execute(stmt.execution_options(yield_per=TRAIN_CHUNK_ROWS))
+
+
+def csv_rows(path=CSV_PATH):
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if float(row["price"] or 0) > 0:
+                yield row["text"], row["subject"], float(row["price"])
+
+
+def featurize(rows, chunk_rows=TRAIN_CHUNK_ROWS):
+    """rows -> (X float32 [n, 4], y float32 [n], subject_map), converted one chunk at a time."""
+    subject_map, xs, ys = {}, [], []
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            break
+        for _, subject, _ in chunk:
+            subject_map.setdefault((subject or "").lower(), len(subject_map))
+        xs.append(np.array([price_features(text, subject, subject_map) for text, subject, _ in chunk],
+                           dtype=np.float32))
+        ys.append(np.array([price for _, _, price in chunk], dtype=np.float32))
+    if not xs:
+        return np.zeros((0, len(FEATURES)), np.float32), np.zeros(0, np.float32), subject_map
+    return np.concatenate(xs), np.concatenate(ys), subject_map
+
+
+def single_row_latency(models, X):
+    """Median and p99 ms of one-row predict() per model, calls interleaved so load hits all alike."""
+    times = [[] for _ in models]
+    for reg in models:
+        reg.predict(X[:1])   # warm-up
+    for row in X:
+        row = row.reshape(1, -1)
+        for i, reg in enumerate(models):
+            t = time.perf_counter()
+            reg.predict(row)
+            times[i].append((time.perf_counter() - t) * 1000)
+    return [(float(np.median(t)), float(np.percentile(t, 99))) for t in times]
+
+
+def versions():
+    """[(version, path)] of the saved model versions, oldest first."""
+    out = []
+    for path in glob.glob(os.path.join(HERE, "model_advanced.v*.pkl")):
+        tag = os.path.basename(path)[len("model_advanced.v"):-len(".pkl")]
+        if tag.isdigit():
+            out.append((int(tag), path))
+    return sorted(out)
+
+
+def save(model):
+    """Write the next version file, make it the live model and prune old versions -> path."""
+    path = os.path.join(HERE, f"model_advanced.v{model['version']}.pkl")
+    joblib.dump(model, path, compress=3)
+    tmp = MODEL_PATH + ".tmp"
+    joblib.dump(model, tmp, compress=3)
+    os.replace(tmp, MODEL_PATH)
+    for _, old in versions()[:-KEEP_VERSIONS]:
+        os.remove(old)
+    return path
+
+
+def _load_live():
+    if not os.path.exists(MODEL_PATH):
+        return None
+    try:
+        return joblib.load(MODEL_PATH)
+    except Exception as e:
+        print(f"live model unreadable ({e}), no latency baseline")
+        return None
+
+
+def write_report(stats):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, "price_model.json"), "w") as f:
+        json.dump(stats, f, indent=2)
+    lat, live = stats["latency_ms"], stats.get("live_latency_ms")
+    lines = [
+        "=== Price model retraining ===",
+        "",
+        f"version          v{stats['version']} ({'promoted' if stats['promoted'] else 'NOT promoted: ' + stats['reason']})",
+        f"source           {stats['source']}: {stats['rows']} rows ({stats['train_rows']} train / "
+        f"{stats['holdout_rows']} holdout), {len(stats['subject_map'])} subjects",
+        f"forest           {stats['params']['n_estimators']} trees, max_depth {stats['params']['max_depth']}, "
+        f"min_samples_leaf {stats['params']['min_samples_leaf']}, {stats['n_nodes']} nodes",
+        f"load             {stats['load_seconds']:.2f} s",
+        f"fit              {stats['train_seconds']:.2f} s with n_jobs={stats['params']['n_jobs']}",
+        f"model file       {stats['model_bytes'] / 1024:.1f} KB",
+        f"holdout          MAE {stats['holdout']['MAE']:.2f}  R2 {stats['holdout']['R2']:.3f}",
+        f"single-row ms    p50 {lat['p50']:.3f}  p99 {lat['p99']:.3f}",
+    ]
+    if live:
+        lines.append(f"live model ms    p50 {live['p50']:.3f}  p99 {live['p99']:.3f}  (version {live['version']})")
+    with open(os.path.join(REPORT_DIR, "price_model.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return lines
+
+
+def train_and_save_advanced(source="db", n_estimators=50, n_jobs=-1, max_depth=10, min_samples_leaf=3,
+                            force=False, seed=42):
+    """Retrain from source ("db" or "csv"), gate on latency and promote -> stats (stats["promoted"])."""
+    t = time.perf_counter()
+    if source == "db":
+        from db import SessionLocal
+        db = SessionLocal()
+        try:
+            X, y, subject_map = featurize(db_rows(db))
+        finally:
+            db.close()
+    else:
+        X, y, subject_map = featurize(csv_rows())
+    load_s = time.perf_counter() - t
+    if len(y) < 10:
+        raise SystemExit(f"only {len(y)} priced questions in {source}, not retraining")
+
+    rng = np.random.RandomState(seed)
+    test = rng.rand(len(y)) < HOLDOUT
+    params = {"n_estimators": n_estimators, "n_jobs": n_jobs, "max_depth": max_depth or None,
+              "min_samples_leaf": min_samples_leaf}
+    reg = RandomForestRegressor(random_state=seed, **params)
+    t = time.perf_counter()
+    reg.fit(X[~test], y[~test])
+    train_s = time.perf_counter() - t
+    reg.n_jobs = 1   # serving predicts one row at a time
+    pred = reg.predict(X[test])
+
+    live = _load_live()
+    sample = X[test][:LATENCY_SAMPLES]
+    live_reg = live.get("price_model") if live else None
+    lat = single_row_latency([reg] + ([live_reg] if live_reg is not None else []), sample)
+
+    version = max([v for v, _ in versions()] + [int((live or {}).get("version", 0))]) + 1
+    stats = {
+        "version": version,
+        "source": source,
+        "rows": int(len(y)),
+        "train_rows": int((~test).sum()),
+        "holdout_rows": int(test.sum()),
+        "subject_map": subject_map,
+        "params": params,
+        "n_nodes": int(sum(e.tree_.node_count for e in reg.estimators_)),
+        "load_seconds": round(load_s, 3),
+        "train_seconds": round(train_s, 3),
+        "holdout": {"MAE": float(mean_absolute_error(y[test], pred)), "R2": float(r2_score(y[test], pred))},
+        "latency_ms": {"p50": lat[0][0], "p99": lat[0][1]},
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
     }
-
-    data = []
-    for _ in range(num):
-        subject = random.choice(subjects)
-        text = random.choice(topics[subject])
-        complexity = random.uniform(0.5, 3.0)  # ML feature
-        length = random.randint(5, 30)         # ML feature
-        demand = random.uniform(0.5, 2.0)      # ML feature
-
-        # Price rule for synthetic training
-        price = 20 + (complexity * 50) + (length * 2) + (demand * 20) + random.uniform(-10, 10)
-
-        data.append((text, subject, length, complexity, demand, price))
-
-    return data
-
-
-def train_and_save_advanced():
-    print("Training advanced ML model...")
-
-    data = generate_synthetic_questions(500)
-
-    texts = [d[0] for d in data]
-    subjects = [d[1] for d in data]
-    lengths = [d[2] for d in data]
-    complexity = [d[3] for d in data]
-    demand = [d[4] for d in data]
-    prices = [d[5] for d in data]
-
-    # TF-IDF Vectorizer
-    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
-    X_text = vectorizer.fit_transform(texts)
-
-    # Mentor matching model (Nearest Neighbors)
-    nn = NearestNeighbors(n_neighbors=3, metric="cosine")
-    nn.fit(X_text)
-
-    # Subject encoding
-    subject_map = {s: i for i, s in enumerate(set(subjects))}
-    X_subject = np.array([subject_map[s] for s in subjects]).reshape(-1, 1)
-
-    # Combine structured features
-    X_extra = np.column_stack((lengths, complexity, demand, X_subject.flatten()))
-
-    # Price prediction model
-    reg = RandomForestRegressor(n_estimators=200)
-    reg.fit(X_extra, prices)
-
-    # Save all models
-    joblib.dump({
-        "vectorizer": vectorizer,
-        "nn": nn,
-        "price_model": reg,
-        "subject_map": subject_map
-    }, MODEL_PATH)
-
-    print("Advanced model trained and saved.")
+    if live_reg is not None:
+        stats["live_latency_ms"] = {"p50": lat[1][0], "p99": lat[1][1], "version": live.get("version")}
+
+    reason = ""
+    if PRICE_MAX_LATENCY_MS and lat[0][0] > PRICE_MAX_LATENCY_MS:
+        reason = f"p50 {lat[0][0]:.3f} ms over PRICE_MAX_LATENCY_MS={PRICE_MAX_LATENCY_MS:g}"
+    elif live_reg is not None and lat[0][0] > lat[1][0] * PRICE_LATENCY_TOLERANCE:
+        reason = f"p50 {lat[0][0]:.3f} ms over {PRICE_LATENCY_TOLERANCE:g} x live {lat[1][0]:.3f} ms"
+    stats["promoted"] = not reason or force
+    stats["reason"] = reason
+    model = {"price_model": reg, "subject_map": subject_map, "version": version,
+             "features": FEATURES, "stats": stats}
+    buf = io.BytesIO()
+    joblib.dump(model, buf, compress=3)
+    stats["model_bytes"] = buf.tell()
+    if stats["promoted"]:
+        save(model)
+    return stats
 
 
 def ensure_advanced_trained():
     if not os.path.exists(MODEL_PATH):
-        train_and_save_advanced()
+        train_and_save_advanced(source="csv", force=True)
+
 
 if __name__ == "__main__":
-    train_and_save_advanced()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", choices=["db", "csv"], default="db")
+    ap.add_argument("--n-estimators", type=int, default=50)
+    ap.add_argument("--n-jobs", type=int, default=-1)
+    ap.add_argument("--max-depth", type=int, default=10, help="0 = unlimited")
+    ap.add_argument("--min-samples-leaf", type=int, default=3)
+    ap.add_argument("--force", action="store_true", help="promote even if latency regressed")
+    args = ap.parse_args()
+    stats = train_and_save_advanced(args.source, args.n_estimators, args.n_jobs, args.max_depth,
+                                    args.min_samples_leaf, args.force)
+    print("\n".join(write_report(stats)))
+    if not stats["promoted"]:
+        raise SystemExit(1)
@@ -1,10 +1,10 @@
 # models.py
 
-from sqlalchemy import Column, Integer, String, Text, Float, Enum, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, Enum, Boolean, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 from db import Base
 from sqlalchemy.sql import func
-from sqlalchemy import DateTime
+from sqlalchemy import DateTime, Index
 
 class User(Base):
     __tablename__ = "users"
@@ -21,12 +21,16 @@ class User(Base):
 
     solved_count = Column(Integer, default=0)                  # total number solved
     solved_keywords = Column(Text, default="")                 # comma-separated keywords
-    balance = Column(Float, default=0.0)                       # earnings
+    balance = Column(Float, default=0.0)                       # legacy; earnings live in earnings_ledger
     expertise_score = Column(Float, default=1.0)               # ML score
 
     rating = Column(Float, default=4.5)
     is_active = Column(Boolean, default=True)
 
+    __table_args__ = (
+        Index("ix_users_role_id", "role", "id"),   # mentor list / snapshot: role = 'mentor' ORDER BY id
+    )
+
 
 class Question(Base):
     __tablename__ = "questions"
@@ -44,3 +48,195 @@ class Question(Base):
     matched_mentors = Column(String, nullable=True)
     meeting_link = Column(String, nullable=True)
     status = Column(String, default="matched")
+    duplicate_of = Column(Integer, nullable=True)   # near-duplicate of this question; its match was reused
+    # client-side default: SQLite cannot ALTER in a column with a CURRENT_TIMESTAMP default;
+    # NULL on rows from before the column existed
+    created_at = Column(DateTime, default=func.now())
+    accepted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # student history: student_id = ? ORDER BY id DESC
+        Index("ix_questions_student_id_id", "student_id", "id"),
+        # mentor inbox: accepted_mentor IS NULL AND status != 'closed', covering matched_mentors
+        # so the membership scan never reads the table rows
+        Index("ix_questions_open", "accepted_mentor", "status", "matched_mentors"),
+    )
+
+
+class QuestionArchive(Base):
+    __tablename__ = "questions_archive"
+
+    # cold copy of old accepted / closed questions, moved in batches by archive.py;
+    # same columns as questions so rows move with INSERT ... SELECT
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=True)
+    subject = Column(String, nullable=True)
+    keywords = Column(String, nullable=True)
+    price = Column(Float, default=0.0)
+    difficulty = Column(Float, default=1.0)
+    accepted_mentor = Column(Integer, nullable=True)
+    matched_mentors = Column(String, nullable=True)
+    meeting_link = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    duplicate_of = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    accepted_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_questions_archive_student_id_id", "student_id", "id"),
+    )
+
+
+class MentorKeywordStat(Base):
+    __tablename__ = "mentor_keyword_stats"
+
+    # one row per (mentor, keyword); updated with an upsert on every accept
+    mentor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    keyword = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=1)
+    last_seen = Column(DateTime, server_default=func.now())
+
+
+class MentorProfileVector(Base):
+    __tablename__ = "mentor_profile_vectors"
+
+    # sparse TF-IDF profile: int32 indices + float32 values (see ml/mentor_profiles.py)
+    mentor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    space = Column(String, nullable=False)        # feature-space id of the vectorizer
+    indices = Column(LargeBinary, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    n_updates = Column(Integer, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class MentorSubject(Base):
+    __tablename__ = "mentor_subjects"
+
+    # normalized copy of User.subjects; kept in sync by ml/mentor_subjects.py
+    mentor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    subject = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_mentor_subjects_subject_mentor", "subject", "mentor_id"),
+    )
+
+
+class MentorChange(Base):
+    __tablename__ = "mentor_changes"
+
+    # append-only change log; the max version is the mentor data version that
+    # process-local caches (ml/mentor_snapshot.py) compare against
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    mentor_id = Column(Integer, nullable=True)   # NULL = every mentor may have changed
+    changed_at = Column(DateTime, server_default=func.now())
+
+
+class MatchJob(Base):
+    __tablename__ = "match_jobs"
+
+    # background matching of questions posted in async mode (see match_jobs.py / worker.py)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, unique=True)
+    status = Column(String, nullable=False, default="queued")   # queued / running / done / failed
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, server_default=func.now())   # not claimed before this (retry backoff)
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_match_jobs_status_available", "status", "available_at"),
+    )
+
+
+class QuestionSignature(Base):
+    __tablename__ = "question_signatures"
+
+    # MinHash signature of a question's normalized text (ml/near_duplicates.py)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    subject = Column(String, nullable=True)
+    signature = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    # ML scores of the question's match, "mentor_id:score,..." (percent), handed to duplicates that reuse it
+    ml_scores = Column(String, nullable=True)
+
+
+class QuestionLSH(Base):
+    __tablename__ = "question_lsh"
+
+    # one row per (LSH band, bucket) of a question's signature; candidates = same bucket in any band
+    band = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+
+
+class EarningsEntry(Base):
+    __tablename__ = "earnings_ledger"
+
+    # append-only: one row per accepted question (see earnings.py); never updated
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    mentor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    question_id = Column(Integer, nullable=True, unique=True)   # NULL = opening balance
+    amount = Column(Float, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_earnings_ledger_mentor_id_id", "mentor_id", "id"),
+    )
+
+
+class MentorBalance(Base):
+    __tablename__ = "mentor_balances"
+
+    # rollup of earnings_ledger up to (and including) entry through_id
+    mentor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)
+    through_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class QuestionStat(Base):
+    __tablename__ = "question_stats"
+
+    # per (subject, status) question counts, kept current by triggers (stats.py);
+    # archived questions keep counting
+    subject = Column(String, primary_key=True)     # lower-cased, '' if none
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    price_sum = Column(Float, nullable=False, default=0.0)
+    priced = Column(Integer, nullable=False, default=0)   # questions with a price > 0
+
+
+class MentorLeaderboardRow(Base):
+    __tablename__ = "mentor_leaderboard"
+
+    # one row per mentor under subject '*' (all subjects) and one per subject the
+    # mentor teaches or has solved in; kept current by triggers (stats.py)
+    subject = Column(String, primary_key=True)
+    mentor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    solved = Column(Integer, nullable=False, default=0)
+    earnings = Column(Float, nullable=False, default=0.0)
+    rating = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # top-k per metric: subject = ? ORDER BY metric DESC LIMIT k walks one of these
+        Index("ix_mentor_leaderboard_solved", "subject", "solved"),
+        Index("ix_mentor_leaderboard_earnings", "subject", "earnings"),
+        Index("ix_mentor_leaderboard_rating", "subject", "rating"),
+    )
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # stored response of a POST sent with an Idempotency-Key header (idempotency.py)
+    scope = Column(String, primary_key=True)          # "post", "accept"
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)     # sha256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response = Column(Text, nullable=False)           # JSON body as sent
+    created_at = Column(DateTime, server_default=func.now(), index=True)
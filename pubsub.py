@@ -0,0 +1,96 @@
+# pubsub.py
+"""
+In-process pub/sub for push feeds (GET /questions/for_mentor/{mentor_id}/stream).
+
+Each subscriber gets a bounded asyncio.Queue on the event loop that serves its
+stream. publish() may be called from any thread (sync endpoints run in the
+threadpool); delivery is handed to the subscriber's loop with
+call_soon_threadsafe. A subscriber whose queue is full is evicted instead of
+blocking the publisher or buffering without bound: its stream ends with an
+"evicted" event and the client reconnects, which starts from a fresh snapshot.
+
+Only subscribers of this process are reached; with several worker processes a
+mentor receives events published by the process that serves their stream.
+"""
+import os
+import asyncio
+import threading
+
+FEED_QUEUE_SIZE = int(os.environ.get("FEED_QUEUE_SIZE", "100"))
+FEED_KEEPALIVE_SECONDS = float(os.environ.get("FEED_KEEPALIVE_SECONDS", "15"))
+
+
+class Subscription:
+    def __init__(self, channel, loop, maxsize):
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.evicted = False
+
+    async def get(self, timeout: float):
+        """Next event, or None after timeout seconds (caller sends a keep-alive)."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    def __init__(self, queue_size=FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subs = {}              # channel -> set of Subscription
+        self._lock = threading.Lock()
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, channel) -> Subscription:
+        """Must be called from the event loop that will consume the subscription."""
+        sub = Subscription(channel, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subs.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.channel]
+
+    def publish(self, channels, event: dict):
+        """Queue event for every subscriber of the given channels. Never blocks."""
+        with self._lock:
+            targets = [s for ch in channels for s in self._subs.get(ch, ())]
+            self.published += 1
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(self._deliver, sub, event)
+            except RuntimeError:
+                # the subscriber's loop is closed: the stream is gone
+                self.unsubscribe(sub)
+
+    def _deliver(self, sub: Subscription, event: dict):
+        # runs on the subscriber's loop
+        if sub.evicted:
+            return
+        try:
+            sub.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            sub.evicted = True
+            self.evictions += 1
+            self.unsubscribe(sub)
+
+    def stats(self):
+        with self._lock:
+            return {"channels": len(self._subs),
+                    "subscribers": sum(len(s) for s in self._subs.values()),
+                    "published": self.published,
+                    "evictions": self.evictions}
+
+
+broker = Broker()
+
+
+def mentor_channel(mentor_id: int) -> str:
+    return f"mentor:{int(mentor_id)}"
@@ -0,0 +1,69 @@
+# queries.py
+"""
+Cached Core statements for the hot read paths of the routers.
+
+Each statement is a lambda_stmt: SQLAlchemy builds and compiles it once per call
+site and afterwards only binds the closure variables (student_id, ...), so a
+request does not rebuild the ORM query. Rows are plain Core rows, no ORM
+objects. The supporting indexes are declared on the models (ix_users_role_id,
+ix_questions_student_id_id, ix_questions_open) and created on existing
+databases by migrations.py; bench_hot_queries.py asserts the query plans.
+The archived_* statements read questions_archive (archive.py) and only run when
+a request asks for archived questions.
+"""
+from sqlalchemy import select, lambda_stmt
+
+from models import Question, QuestionArchive, User
+
+
+def user_by_id(db, user_id: int):
+    stmt = lambda_stmt(lambda: select(User.id, User.name, User.email, User.role, User.subjects)
+                       .where(User.id == user_id))
+    return db.execute(stmt).first()
+
+
+def mentors(db):
+    stmt = lambda_stmt(lambda: select(User.id, User.name, User.email, User.subjects, User.rating,
+                                      User.experience_years)
+                       .where(User.role == "mentor").order_by(User.id))
+    return db.execute(stmt).all()
+
+
+def question_by_id(db, question_id: int):
+    stmt = lambda_stmt(lambda: select(*Question.__table__.c).where(Question.id == question_id))
+    return db.execute(stmt).first()
+
+
+def questions_by_student(db, student_id: int):
+    stmt = lambda_stmt(lambda: select(Question.id, Question.text, Question.subject, Question.keywords,
+                                      Question.price, Question.status, Question.accepted_mentor,
+                                      Question.meeting_link)
+                       .where(Question.student_id == student_id).order_by(Question.id.desc()))
+    return db.execute(stmt).all()
+
+
+def open_question_matches(db):
+    """(id, matched_mentors) of unaccepted, not closed questions; served from ix_questions_open alone."""
+    stmt = lambda_stmt(lambda: select(Question.id, Question.matched_mentors)
+                       .where(Question.accepted_mentor.is_(None), Question.status != "closed"))
+    return db.execute(stmt).all()
+
+
+def questions_by_ids(db, ids):
+    stmt = lambda_stmt(lambda: select(Question.id, Question.text, Question.subject, Question.keywords,
+                                      Question.price, Question.status)
+                       .where(Question.id.in_(ids)).order_by(Question.id))
+    return db.execute(stmt).all()
+
+
+def archived_question_by_id(db, question_id: int):
+    stmt = lambda_stmt(lambda: select(*QuestionArchive.__table__.c).where(QuestionArchive.id == question_id))
+    return db.execute(stmt).first()
+
+
+def archived_questions_by_student(db, student_id: int):
+    stmt = lambda_stmt(lambda: select(QuestionArchive.id, QuestionArchive.text, QuestionArchive.subject,
+                                      QuestionArchive.keywords, QuestionArchive.price, QuestionArchive.status,
+                                      QuestionArchive.accepted_mentor, QuestionArchive.meeting_link)
+                       .where(QuestionArchive.student_id == student_id).order_by(QuestionArchive.id.desc()))
+    return db.execute(stmt).all()
@@ -3,8 +3,10 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from db import SessionLocal, engine, Base
 from models import User
-from schemas import RegisterIn, LoginIn
+from schemas import RegisterIn, LoginIn, LoginOut, RegisterOut
 from utils import hash_password, verify_password, create_jwt
+from ml import mentor_profiles, mentor_subjects
+from ml.mentor_snapshot import mark_changed
 from typing import Generator
 
 # create DB tables if not exist
@@ -19,7 +21,7 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-@router.post("/register")
+@router.post("/register", response_model=RegisterOut)
 def register(payload: RegisterIn, db: Session = Depends(get_db)):
     # check exists
     existing = db.query(User).filter(User.email == payload.email).first()
@@ -33,11 +35,20 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
         subjects=payload.subjects or ""
     )
     db.add(user)
+    db.flush()
+    profile_vec = None
+    if user.role == "mentor":
+        mentor_subjects.set_mentor_subjects(db, user.id, user.subjects)
+        profile_vec = mentor_profiles.seed_profile(db, user.id, user.subjects)
+        mark_changed(db, user.id)
     db.commit()
     db.refresh(user)
+    if profile_vec is not None:
+        mentor_subjects.invalidate(user.id)
+        mentor_profiles.invalidate(user.id, profile_vec)
     return {"status": "registered", "user_id": user.id}
 
-@router.post("/login")
+@router.post("/login", response_model=LoginOut)
 def login(payload: LoginIn, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email).first()
     if not user:
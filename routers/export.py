@@ -0,0 +1,35 @@
+# routers/export.py
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import export
+
+router = APIRouter()
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "gzip": "application/gzip"}
+
+
+def _response(stmt, columns, name, format, gzip):
+    if format not in export.EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(export.EXPORT_FORMATS)}")
+    # gzip: a .gz file download, not Content-Encoding, so clients keep the compressed bytes
+    filename = f"{name}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    # the generator opens its own session: it outlives the request handler
+    return StreamingResponse(export.stream(stmt, columns, format, gzip),
+                             media_type=MEDIA_TYPES["gzip" if gzip else format], headers=headers)
+
+
+@router.get("/questions")
+def export_questions(format: str = "ndjson", gzip: bool = False, status: Optional[str] = None,
+                     subject: Optional[str] = None, min_id: Optional[int] = None, max_id: Optional[int] = None,
+                     include_archived: bool = False):
+    stmt = export.questions_stmt(status, subject, min_id, max_id, include_archived)
+    return _response(stmt, export.QUESTION_COLUMNS, "questions", format, gzip)
+
+
+@router.get("/mentors")
+def export_mentors(format: str = "ndjson", gzip: bool = False, subject: Optional[str] = None,
+                   min_id: Optional[int] = None, max_id: Optional[int] = None):
+    stmt = export.mentors_stmt(subject, min_id, max_id)
+    return _response(stmt, export.MENTOR_COLUMNS, "mentors", format, gzip)
@@ -1,10 +1,13 @@
 # routers/mentors.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from db import SessionLocal
 from sqlalchemy.orm import Session
-from models import User
 from utils import generate_meeting_link
+import queries
+from schemas import BalanceOut, LeaderboardOut, MentorsOut
+import earnings
+import stats
 
 router = APIRouter()
 
@@ -15,17 +18,32 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/")
+@router.get("/", response_model=MentorsOut)
 def get_mentors(db: Session = Depends(get_db)):
-    mentors = db.query(User).filter(User.role == "mentor").all()
+    # Core rows go straight into the response model
+    return {"mentors": queries.mentors(db)}
+
+
+@router.get("/leaderboard", response_model=LeaderboardOut)
+def get_leaderboard(by: str = "solved", subject: str = None, limit: int = 10, db: Session = Depends(get_db)):
+    """Top mentors by solved / earnings / rating, overall or in one subject (stats.py)."""
+    if by not in stats.LEADERBOARD_METRICS:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(stats.LEADERBOARD_METRICS)}")
     out = []
-    for m in mentors:
+    for mid, name, solved, earned, rating in stats.leaderboard(db, by, subject, max(1, min(limit, 100))):
         out.append({
-            "id": m.id,
-            "name": m.name,
-            "email": m.email,
-            "subjects": m.subjects,
-            "rating": m.rating,
-            "experience_years": m.experience_years
+            "id": mid,
+            "name": name,
+            "solved": solved,
+            "earnings": round(earned, 2),
+            "rating": rating
         })
-    return {"mentors": out}
+    return {"by": by, "subject": subject, "mentors": out}
+
+@router.get("/{mentor_id}/balance", response_model=BalanceOut)
+def get_mentor_balance(mentor_id: int, db: Session = Depends(get_db)):
+    """Earnings: last rollup plus ledger entries since (earnings.py)."""
+    m = queries.user_by_id(db, mentor_id)
+    if not m or m.role != "mentor":
+        raise HTTPException(status_code=404, detail="Mentor not found")
+    return {"mentor_id": mentor_id, "balance": earnings.get_balance(db, mentor_id)}
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 from db import SessionLocal, engine
 from models import Question, User, Base
-from schemas import QuestionIn
-from ml.advanced_matcher import extract_keywords, match_mentors, predict_price
+from schemas import (AcceptOut, DuplicateStatsOut, JobStatsOut, PendingOut, PostQuestionOut, QuestionIn,
+                     QuestionOut, SearchHit, ShadowStatsOut, StudentQuestionsOut)
+from ml import mentor_keywords, mentor_profiles, fts_search, near_duplicates, strategies
+from ml.mentor_snapshot import mark_changed
+import earnings
+import idempotency
+import match_jobs
+import queries
+import shadow
+from matching_service import (POST_MODE, apply_match, dedupe_stats, feed_item, match_question,
+                              matched_mentor_list, publish_new, reuse_duplicate)
 from utils import generate_meeting_link
+from pubsub import FEED_KEEPALIVE_SECONDS, broker, mentor_channel
 from sqlalchemy.exc import IntegrityError
 
 Base.metadata.create_all(bind=engine)
@@ -18,179 +33,186 @@ def get_db():
     finally:
         db.close()
 
-@router.post("/post")
-def post_question(payload: QuestionIn, db: Session = Depends(get_db)):
-    student = db.query(User).filter(User.id == payload.student_id).first()
+def _replay(db, scope: str, key: Optional[str], req_hash: str):
+    """Stored response of an earlier request with this Idempotency-Key, or None."""
+    if not key:
+        return None
+    row = idempotency.lookup(db, scope, key)
+    if row is None:
+        return None
+    if row.request_hash != req_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return Response(content=row.response, status_code=row.status_code, media_type="application/json",
+                    headers={idempotency.REPLAY_HEADER: "true"})
+
+def _commit(db, scope: str, key: Optional[str], req_hash: str, model, out: dict, **dump):
+    """
+    Store out under the Idempotency-Key (if any) and commit -> None, or the response
+    to replay when a concurrent request with the same key committed first.
+    """
+    if key:
+        idempotency.store(db, scope, key, req_hash, 200, model.model_validate(out).model_dump_json(**dump))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        replay = _replay(db, scope, key, req_hash)
+        if replay is None:
+            raise
+        return replay
+    return None
+
+@router.post("/post", response_model=PostQuestionOut, response_model_exclude_unset=True)
+def post_question(payload: QuestionIn, db: Session = Depends(get_db),
+                  idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH)):
+    # a retry with the same Idempotency-Key gets the stored response: no ML, no second question
+    # newer optional fields left out when unset, so keys stored before they existed still match
+    req_hash = idempotency.request_hash(payload.model_dump(
+        exclude={f for f in ("strategy", "budget_ms") if getattr(payload, f) is None}))
+    replay = _replay(db, "post", idempotency_key, req_hash)
+    if replay is not None:
+        return replay
+
+    if payload.strategy is not None and payload.strategy not in strategies.names():
+        raise HTTPException(status_code=422, detail=f"Unknown strategy, expected one of {strategies.names()}")
+    student = queries.user_by_id(db, payload.student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    # ML keyword extraction
-    keywords = extract_keywords(payload.text)
-
-    # ML price prediction (unchanged technique)
-    price = predict_price(payload.text, payload.subject)
-
-    # ML mentor matching - returns list of {"mentor_id":.., "score":..}
-    ml_matches = match_mentors(payload.text, payload.subject, db) or []
-
-    # Build maps/lists from ML output (handle older format if ml returned ints)
-    ml_ids = []
-    ml_scores_map = {}
-    for entry in ml_matches:
-        # entry may be dict {"mentor_id":..., "score":...} or an int string/id
-        if isinstance(entry, dict) and "mentor_id" in entry:
-            mid = int(entry["mentor_id"])
-            ml_ids.append(mid)
-            ml_scores_map[mid] = float(entry.get("score", 0.0))
-        else:
-            # try convert raw value to int
-            try:
-                mid = int(entry)
-                ml_ids.append(mid)
-            except Exception:
-                pass
-
-    # DB mentors who teach the subject (fallback / boost)
-    db_matched = db.query(User).filter(
-        User.role == "mentor",
-        User.subjects.contains(payload.subject)
-    ).all()
-    db_ids = [m.id for m in db_matched] if db_matched else []
-
-    # Combine: keep ML ordering, but ensure DB subject mentors are included
-    combined_order = []
-    for mid in ml_ids:
-        if mid not in combined_order:
-            combined_order.append(mid)
-    for mid in db_ids:
-        if mid not in combined_order:
-            combined_order.append(mid)
-
-    # absolute fallback: all mentors
-    if not combined_order:
-        all_mentors = db.query(User).filter(User.role == "mentor").all()
-        combined_order = [m.id for m in all_mentors]
-
-    matched_ids = combined_order
+    if payload.strategy is None:
+        # near-duplicate of a recent question: reuse its match instead of running the pipeline
+        result, duplicate_of, sig = reuse_duplicate(db, payload.text, payload.subject)
+    else:
+        # an explicitly chosen strategy always runs (the worker uses MATCH_STRATEGY for async posts)
+        result, duplicate_of, sig = None, None, near_duplicates.signature(payload.text)
+
+    async_match = POST_MODE == "async" if payload.async_match is None else payload.async_match
+    if async_match and result is None:
+        # two-phase: store now, match + price in worker.py; poll /questions/{id} or the inbox stream
+        q = Question(
+            student_id=payload.student_id,
+            text=payload.text,
+            subject=payload.subject,
+            status="pending_match"
+        )
+        db.add(q)
+        db.flush()
+        match_jobs.enqueue(db, q.id)
+        near_duplicates.index_question(db, q.id, payload.subject, sig)
+        out = {"question_id": q.id, "status": q.status}
+        replay = _commit(db, "post", idempotency_key, req_hash, PostQuestionOut, out, exclude_unset=True)
+        return replay if replay is not None else out
+
+    if result is None:
+        result = match_question(db, payload.text, payload.subject, payload.strategy, payload.budget_ms)
 
     # Save question (store matched mentors as CSV for compatibility)
     q = Question(
         student_id=payload.student_id,
         text=payload.text,
         subject=payload.subject,
-        keywords=",".join(keywords),
-        price=price,
-        matched_mentors=",".join([str(x) for x in matched_ids]),
-        status="matched"
+        duplicate_of=duplicate_of,
     )
+    apply_match(q, result)
     db.add(q)
-    db.commit()
+    db.flush()
+    near_duplicates.index_question(db, q.id, payload.subject, sig, result.ml_scores)
+    out = {
+        "question_id": q.id,
+        "duplicate_of": q.duplicate_of,
+        "keywords": result.keywords,
+        "price": result.price,
+        "matched": matched_mentor_list(result),
+        "tier": result.tier,
+    }
+    replay = _commit(db, "post", idempotency_key, req_hash, PostQuestionOut, out, exclude_unset=True)
+    if replay is not None:
+        return replay
     db.refresh(q)
 
-    # Build mentor objects for frontend (name, subjects, computed score 0..1)
-    mentor_rows = db.query(User).filter(User.id.in_(matched_ids)).all()
-    mentor_map = {m.id: m for m in mentor_rows}
-
-    def compute_overlap_score(mentor: User, question_keywords):
-        # fallback overlap-based score (0..1)
-        mk = []
-        if mentor.solved_keywords:
-            mk += [k.strip().lower() for k in mentor.solved_keywords.split(",") if k.strip()]
-        if mentor.subjects:
-            mk += [s.strip().lower() for s in mentor.subjects.split(",") if s.strip()]
-        mk = list(dict.fromkeys(mk))
-        if not mk or not question_keywords:
-            return 0.0
-        overlap = sum(1 for k in question_keywords if k.lower() in mk)
-        return round(overlap / max(1, len(question_keywords)), 4)
-
-    mentors_list = []
-    for mid in matched_ids:
-        m = mentor_map.get(int(mid))
-        if not m:
-            continue
-        # prefer ML-provided score if present (ml_scores_map stores percent 0..100)
-        raw_score = ml_scores_map.get(m.id)
-        if raw_score is None:
-            # fallback to overlap 0..1
-            normalized_score = compute_overlap_score(m, keywords)
-        else:
-            # ml returned percent (0..100) — convert to 0..1 to keep frontend expectation
-            try:
-                normalized_score = float(raw_score) / 100.0
-            except Exception:
-                normalized_score = compute_overlap_score(m, keywords)
-
-        mentors_list.append({
-            "id": m.id,
-            "name": m.name,
-            "subjects": m.subjects.split(",") if m.subjects else [],
-            "score": normalized_score  # 0..1 float (frontend expects this)
-        })
+    # push to the matched mentors' inbox streams; a reused duplicate goes to the same mentors
+    # as the question it copies, so it only shows up in their inbox listing
+    if duplicate_of is None:
+        publish_new(q, result.matched_ids)
 
-    return {
-        "question_id": q.id,
-        "keywords": keywords,
-        "price": price,
-        "matched": mentors_list
-    }
+    return out
 
 
-@router.post("/accept")
-def accept_question(body: dict, db: Session = Depends(get_db)):
+@router.post("/accept", response_model=AcceptOut)
+def accept_question(body: dict, db: Session = Depends(get_db),
+                    idempotency_key: Optional[str] = Header(None, max_length=idempotency.MAX_KEY_LENGTH)):
     """
-    Mentor accepts a question. To avoid races (especially on SQLite which lacks
-    strong row-level locking), we:
-      1. load the question,
-      2. ensure it's unaccepted,
-      3. apply changes in-session,
-      4. flush and re-check the DB row,
-      5. commit or rollback on collision/error.
+    Mentor accepts a question. To stay correct with several workers on SQLite:
+      1. claim the question with a conditional UPDATE (accepted_mentor IS NULL);
+         only one concurrent accept can match the row, the others get a collision,
+      2. bump solved_count in SQL and append the payout to earnings_ledger
+         instead of read-modify-writing the mentor row,
+      3. commit, or rollback on collision/error.
+    With an Idempotency-Key, a retry of an accept that went through gets the
+    original response instead of "Already accepted".
     """
+    req_hash = idempotency.request_hash(body)
+    replay = _replay(db, "accept", idempotency_key, req_hash)
+    if replay is not None:
+        return replay
+
     qid = int(body["question_id"])
     mid = int(body["mentor_id"])
 
     # initial load
-    q = db.query(Question).filter(Question.id == qid).first()
+    q = queries.question_by_id(db, qid)
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
 
     if q.accepted_mentor:
         raise HTTPException(status_code=400, detail="Already accepted")
 
-    mentor = db.query(User).filter(User.id == mid, User.role == "mentor").first()
-    if not mentor:
+    mentor = queries.user_by_id(db, mid)
+    if not mentor or mentor.role != "mentor":
         raise HTTPException(status_code=404, detail="Mentor not found")
 
-    # Apply updates (in-memory)
-    q.accepted_mentor = mid
-    q.status = "accepted"
-    q.meeting_link = generate_meeting_link()
-
-    # Update mentor stats safely (handle None values)
-    mentor.solved_count = (mentor.solved_count or 0) + 1
+    meeting_link = generate_meeting_link()
+    try:
+        claimed = db.execute(
+            update(Question)
+            .where(Question.id == qid, Question.accepted_mentor.is_(None))
+            .values(accepted_mentor=mid, status="accepted", accepted_at=func.now(), meeting_link=meeting_link)
+        ).rowcount
+        if claimed != 1:
+            db.rollback()
+            # the original of this retry may have committed since the lookup above
+            replay = _replay(db, "accept", idempotency_key, req_hash)
+            if replay is not None:
+                return replay
+            raise HTTPException(status_code=400, detail="Collision detected: already accepted by another mentor")
 
-    new_keywords = [k.strip().lower() for k in (q.keywords or "").split(",") if k.strip()]
-    existing_keywords = [k.strip().lower() for k in (mentor.solved_keywords or "").split(",") if k.strip()]
-    updated_keywords = list(dict.fromkeys(existing_keywords + new_keywords))
-    mentor.solved_keywords = ",".join(updated_keywords)
+        solved_count = db.execute(
+            update(User).where(User.id == mid)
+            .values(solved_count=func.coalesce(User.solved_count, 0) + 1)
+            .returning(User.solved_count)
+        ).scalar()
+        earnings.record_earning(db, mid, qid, q.price)
 
-    mentor.balance = (mentor.balance or 0.0) + (q.price or 0.0)
+        # keyword stats: one upsert per keyword instead of rewriting solved_keywords
+        new_keywords = list(dict.fromkeys(mentor_keywords.split_keywords(q.keywords)))
+        mentor_keywords.record_keywords(db, mid, new_keywords)
 
-    db.add(mentor)
-    db.add(q)
+        # online profile update: decayed running sum of accepted question vectors
+        profile_vec = mentor_profiles.update_on_accept(db, mid, q.text, q.subject, new_keywords)
+        mark_changed(db, mid)
 
-    try:
-        # flush to push to DB layer (not commit). This will raise on constraint errors.
+        # the response is read inside the transaction, so it can be stored with it
         db.flush()
-
-        # Re-check the question from DB — if another process accepted it meanwhile, abort.
-        recheck = db.query(Question).filter(Question.id == qid).first()
-        if recheck.accepted_mentor and recheck.accepted_mentor != mid:
-            db.rollback()
-            raise HTTPException(status_code=400, detail="Collision detected: already accepted by another mentor")
-
-        db.commit()
+        out = {
+            "status": "accepted",
+            "meeting_link": meeting_link,
+            "mentor_balance": earnings.get_balance(db, mid),
+            "mentor_keywords": mentor_keywords.read_mentor_keywords(db, mid),
+            "solved_count": solved_count
+        }
+        replay = _commit(db, "accept", idempotency_key, req_hash, AcceptOut, out)
+        if replay is not None:
+            return replay
     except HTTPException:
         # propagate HTTP exceptions raised above (like collision)
         raise
@@ -198,28 +220,72 @@ def accept_question(body: dict, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=400, detail="Failed to accept question")
 
-    return {
-        "status": "accepted",
-        "meeting_link": q.meeting_link,
-        "mentor_balance": mentor.balance,
-        "mentor_keywords": updated_keywords,
-        "solved_count": mentor.solved_count
-    }
+    mentor_keywords.invalidate(mid)
+    mentor_profiles.invalidate(mid, profile_vec)
+    broker.publish([mentor_channel(m) for m in _matched_ids(q)],
+                   {"type": "taken", "data": {"question_id": q.id, "mentor_id": mid}})
 
-@router.get("/{question_id}")
-def get_question(question_id: int, db: Session = Depends(get_db)):
+    return out
+
+@router.get("/search", response_model=List[SearchHit])
+def search_questions(q: str, subject: str = None, limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Full-text search over question text/subject/keywords (FTS5, BM25-ranked, best first).
+    Declared before /{question_id} so "search" is not parsed as an id.
+    """
+    limit = max(1, min(limit, 100))
+    ranked = fts_search.search_questions(db, q, subject=subject, limit=limit)
+    rows = {r.id: r for r in queries.questions_by_ids(db, [qid for qid, _ in ranked])} if ranked else {}
+    out = []
+    for qid, score in ranked:
+        r = rows.get(qid)
+        if not r:
+            continue
+        out.append({
+            "id": r.id,
+            "text": r.text,
+            "subject": r.subject,
+            "keywords": r.keywords,
+            "price": r.price,
+            "status": r.status,
+            "score": round(-score, 4)   # bm25() is lower-is-better; flip so higher = more relevant
+        })
+    return out
+
+@router.get("/jobs/stats", response_model=JobStatsOut)
+def get_match_job_stats(db: Session = Depends(get_db)):
+    """Async matching queue depth (match_jobs by status, oldest queued age, retries)."""
+    return match_jobs.queue_stats(db)
+
+@router.get("/duplicates/stats", response_model=DuplicateStatsOut)
+def get_duplicate_stats():
+    """Near-duplicate match reuse in this process: hit rate and matching time saved."""
+    return dedupe_stats()
+
+@router.get("/shadow/stats", response_model=ShadowStatsOut)
+def get_shadow_stats():
+    """Shadow matching strategy vs the primary in this process: latency and top-k agreement."""
+    return shadow.stats()
+
+@router.get("/{question_id}", response_model=QuestionOut)
+def get_question(question_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
     """
     Return a single question by id.
     Endpoint path will be /questions/{question_id} because router is included
-    with prefix '/questions' in app.py.
+    with prefix '/questions' in app.py. Archived questions (archive.py) are only
+    found with ?include_archived=true.
     """
-    q = db.query(Question).filter(Question.id == question_id).first()
+    q = queries.question_by_id(db, question_id)
+    archived = False
+    if not q and include_archived:
+        q = queries.archived_question_by_id(db, question_id)
+        archived = q is not None
     if not q:
         raise HTTPException(status_code=404, detail="Question not found")
 
     mentor_info = None
     if q.accepted_mentor:
-        m = db.query(User).filter(User.id == q.accepted_mentor).first()
+        m = queries.user_by_id(db, q.accepted_mentor)
         if m:
             mentor_info = {
                 "id": m.id,
@@ -239,48 +305,41 @@ def get_question(question_id: int, db: Session = Depends(get_db)):
         "matched_mentors": q.matched_mentors,
         "accepted_mentor": q.accepted_mentor,
         "meeting_link": q.meeting_link,
+        "duplicate_of": q.duplicate_of,
+        "created_at": q.created_at,
+        "accepted_at": q.accepted_at,
+        "archived": archived,
         "mentor": mentor_info
     }
 
 
-@router.get("/student/{student_id}")
-def get_questions_by_student(student_id: int, db: Session = Depends(get_db)):
+@router.get("/student/{student_id}", response_model=StudentQuestionsOut)
+def get_questions_by_student(student_id: int, include_archived: bool = False, db: Session = Depends(get_db)):
     """
-    Return all questions posted by a student (most recent first)
+    Return all questions posted by a student (most recent first);
+    archived ones only with ?include_archived=true
     """
-    qs = db.query(Question).filter(Question.student_id == student_id).order_by(Question.id.desc()).all()
-    out = []
-    for q in qs:
-        out.append({
-            "id": q.id,
-            "text": q.text,
-            "subject": q.subject,
-            "keywords": q.keywords,
-            "price": q.price,
-            "status": q.status,
-            "accepted_mentor": q.accepted_mentor,
-            "meeting_link": q.meeting_link
-        })
-    return {"questions": out}
-
-@router.get("/for_mentor/{mentor_id}")
-def get_questions_for_mentor(mentor_id: int, db: Session = Depends(get_db)):
-    mentor = db.query(User).filter(User.id == mentor_id).first()
+    qs = queries.questions_by_student(db, student_id)
+    if include_archived:
+        qs = sorted(list(qs) + list(queries.archived_questions_by_student(db, student_id)),
+                    key=lambda q: q.id, reverse=True)
+    # Core rows go straight into the response model
+    return {"questions": qs}
+
+def _pending_for_mentor(db, mentor_id: int):
+    """Unaccepted questions whose matched_mentors include mentor_id (None if no such mentor)."""
+    mentor = queries.user_by_id(db, mentor_id)
     if not mentor:
-        raise HTTPException(status_code=404, detail="Mentor not found")
+        return None
 
-    questions = db.query(Question).filter(
-        Question.accepted_mentor.is_(None),
-        Question.status != "closed"
-    ).all()
-
-    result = []
-    for q in questions:
-        if not q.matched_mentors:
+    # membership scan over (id, matched_mentors) only, then load the matching questions
+    wanted = []
+    for qid, matched in queries.open_question_matches(db):
+        if not matched:
             continue
 
         # normalize stored ids
-        ids = [s.strip() for s in q.matched_mentors.split(",") if s.strip()]
+        ids = [s.strip() for s in matched.split(",") if s.strip()]
 
         # convert safely to int
         try:
@@ -289,13 +348,65 @@ def get_questions_for_mentor(mentor_id: int, db: Session = Depends(get_db)):
             continue  # skip invalid rows
 
         if mentor_id in ids:
-            result.append({
-                "id": q.id,
-                "text": q.text,
-                "subject": q.subject,
-                "keywords": q.keywords,
-                "price": q.price,
-                "status": q.status,
-            })
-    
+            wanted.append(qid)
+    return [feed_item(q) for q in queries.questions_by_ids(db, wanted)] if wanted else []
+
+def _matched_ids(q: Question):
+    out = []
+    for s in (q.matched_mentors or "").split(","):
+        try:
+            out.append(int(s))
+        except ValueError:
+            continue
+    return out
+
+@router.get("/for_mentor/{mentor_id}", response_model=PendingOut)
+def get_questions_for_mentor(mentor_id: int, db: Session = Depends(get_db)):
+    result = _pending_for_mentor(db, mentor_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Mentor not found")
     return {"pending": result}
+
+def _pending_snapshot(mentor_id: int):
+    db = SessionLocal()
+    try:
+        return _pending_for_mentor(db, mentor_id)
+    finally:
+        db.close()
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/for_mentor/{mentor_id}/stream")
+async def stream_questions_for_mentor(mentor_id: int, request: Request):
+    """
+    Server-Sent Events inbox, replacing polling of /for_mentor/{mentor_id}:
+      snapshot {"pending": [...]}                  current inbox, sent once on connect
+      new      {"question": {...}}                 a new question matched this mentor
+      taken    {"question_id": .., "mentor_id": ..} accepted by someone; drop it
+      evicted  {}                                  consumer too slow; reconnect
+    Subscribes before the snapshot is read, so a "new" event may repeat a snapshot item.
+    """
+    sub = broker.subscribe(mentor_channel(mentor_id))
+    pending = await run_in_threadpool(_pending_snapshot, mentor_id)
+    if pending is None:
+        broker.unsubscribe(sub)
+        raise HTTPException(status_code=404, detail="Mentor not found")
+
+    async def events():
+        try:
+            yield _sse("snapshot", {"pending": pending})
+            while not await request.is_disconnected():
+                event = await sub.get(FEED_KEEPALIVE_SECONDS)
+                if sub.evicted:
+                    yield _sse("evicted", {})
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(event["type"], event["data"])
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,20 @@
+# routers/stats.py
+from fastapi import APIRouter, Depends
+from db import SessionLocal
+from sqlalchemy.orm import Session
+import stats
+from schemas import StatsOut
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/", response_model=StatsOut)
+def get_stats(db: Session = Depends(get_db)):
+    """Questions per status and subject, average price per subject (question_stats)."""
+    return stats.platform_stats(db)
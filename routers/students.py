@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from db import SessionLocal
 from sqlalchemy.orm import Session
-from models import User
+import queries
+from schemas import StudentOut
 
 router = APIRouter()
 
@@ -13,9 +14,9 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/{student_id}")
+@router.get("/{student_id}", response_model=StudentOut)
 def get_student(student_id: int, db: Session = Depends(get_db)):
-    s = db.query(User).filter(User.id == student_id, User.role == "student").first()
-    if not s:
+    s = queries.user_by_id(db, student_id)
+    if not s or s.role != "student":
         raise HTTPException(status_code=404, detail="Student not found")
     return {"id": s.id, "name": s.name, "email": s.email}
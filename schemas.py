@@ -1,6 +1,7 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, List, Optional
 
 class RegisterIn(BaseModel):
     name: str
@@ -18,3 +19,169 @@ class QuestionIn(BaseModel):
     text: Optional[str] = None
     subject: Optional[str] = None
     price: Optional[float] = 0.0
+    async_match: Optional[bool] = None  # None = server default (POST_MODE)
+    strategy: Optional[str] = None      # matching strategy (ml/strategies.py), None = MATCH_STRATEGY
+    budget_ms: Optional[float] = None   # matching time budget, None = MATCH_BUDGET_MS, 0 = none
+
+
+# --- responses ---------------------------------------------------------------
+# Declaring these as response_model lets FastAPI serialize straight to JSON bytes
+# in pydantic-core, skipping jsonable_encoder. Row models validate attributes, so
+# endpoints can return Core result rows (queries.py) without building dicts.
+
+class RowModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+class MessageOut(BaseModel):
+    message: str
+
+class RegisterOut(BaseModel):
+    status: str
+    user_id: int
+
+class LoginUser(BaseModel):
+    id: int
+    name: str
+    role: str
+
+class LoginOut(BaseModel):
+    token: str
+    user: LoginUser
+
+class MentorOut(RowModel):
+    id: int
+    name: str
+    email: str
+    subjects: Optional[str] = None
+    rating: Optional[float] = None
+    experience_years: Optional[int] = None
+
+class MentorsOut(BaseModel):
+    mentors: List[MentorOut]
+
+class LeaderboardEntry(BaseModel):
+    id: int
+    name: str
+    solved: int
+    earnings: float
+    rating: Optional[float] = None
+
+class LeaderboardOut(BaseModel):
+    by: str
+    subject: Optional[str] = None
+    mentors: List[LeaderboardEntry]
+
+class BalanceOut(BaseModel):
+    mentor_id: int
+    balance: float
+
+class StudentOut(BaseModel):
+    id: int
+    name: str
+    email: str
+
+class MatchedMentor(BaseModel):
+    id: int
+    name: str
+    subjects: List[str]
+    score: float
+
+class PostQuestionOut(BaseModel):
+    # async posting returns only question_id and status (response_model_exclude_unset)
+    question_id: int
+    status: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    keywords: List[str] = []
+    price: Optional[float] = None
+    matched: List[MatchedMentor] = []
+    tier: Optional[str] = None   # matching tier under the time budget (matching_service.TIERS) or "reused"
+
+class AcceptOut(BaseModel):
+    status: str
+    meeting_link: Optional[str] = None
+    mentor_balance: float
+    mentor_keywords: List[str]
+    solved_count: Optional[int] = None
+
+class QuestionItem(RowModel):
+    id: int
+    text: Optional[str] = None
+    subject: Optional[str] = None
+    keywords: Optional[str] = None
+    price: Optional[float] = None
+    status: Optional[str] = None
+
+class SearchHit(QuestionItem):
+    score: float
+
+class StudentQuestion(QuestionItem):
+    accepted_mentor: Optional[int] = None
+    meeting_link: Optional[str] = None
+
+class StudentQuestionsOut(BaseModel):
+    questions: List[StudentQuestion]
+
+class PendingOut(BaseModel):
+    pending: List[QuestionItem]
+
+class MentorInfo(BaseModel):
+    id: int
+    name: str
+    subjects: List[str]
+
+class QuestionOut(StudentQuestion):
+    student_id: int
+    matched_mentors: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    created_at: Optional[datetime] = None
+    accepted_at: Optional[datetime] = None
+    archived: bool = False
+    mentor: Optional[MentorInfo] = None
+
+class JobStatsOut(BaseModel):
+    queued: int
+    running: int
+    done: int
+    failed: int
+    oldest_queued_seconds: Optional[float] = None
+    retried: int
+
+class DuplicateStatsOut(BaseModel):
+    checks: int
+    hits: int
+    hit_rate: float
+    mean_check_ms: float
+    mean_pipeline_ms: float
+    saved_ms: float
+
+class ShadowStatsOut(BaseModel):
+    primary: str
+    candidate: Optional[str] = None
+    sample_rate: float
+    sampled: int
+    compared: int
+    dropped: int
+    errors: int
+    window: int
+    primary_p50_ms: Optional[float] = None
+    primary_p99_ms: Optional[float] = None
+    candidate_p50_ms: Optional[float] = None
+    candidate_p99_ms: Optional[float] = None
+    overlap_at_k: Optional[float] = None
+    top1_agreement: Optional[float] = None
+
+class StatsOut(BaseModel):
+    questions: int
+    questions_by_status: Dict[str, int]
+    questions_by_subject: Dict[str, int]
+    avg_price_by_subject: Dict[str, float]
+
+class TimingOut(BaseModel):
+    count: int
+    mean: float
+    max: float
+
+class MetricsOut(BaseModel):
+    counters: Dict[str, int]
+    timings: Dict[str, TimingOut]
+    gauges: Dict[str, float]
@@ -2,6 +2,8 @@
 from db import SessionLocal, engine
 from models import Base, User
 from utils import hash_password
+from ml.mentor_subjects import set_mentor_subjects
+from ml.mentor_snapshot import mark_changed
 
 Base.metadata.create_all(bind=engine)
 
@@ -31,6 +33,10 @@ def seed():
             experience_years=u.get("experience_years",0)
         )
         db.add(user)
+        if user.role == "mentor":
+            db.flush()
+            set_mentor_subjects(db, user.id, user.subjects)
+    mark_changed(db)
     db.commit()
     db.close()
     print("Seed complete")
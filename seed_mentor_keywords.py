@@ -3,6 +3,10 @@ import os, collections
 import pandas as pd
 from db import SessionLocal
 from models import User
+from ml import ann_index, mentor_profiles
+from ml.mentor_keywords import get_keyword_vectors, replace_keywords, invalidate
+from ml.mentor_subjects import get_subject_map
+from ml.mentor_snapshot import mark_changed
 
 CSV_PATH = os.path.join(os.path.dirname(__file__), "data", "synthetic_questions.csv")
 
@@ -19,18 +23,29 @@ def seed_keywords_per_subject(top_k_per_subject=30):
         common = [k for k,_ in counter.most_common(top_k_per_subject)]
         by_sub[subj] = common
 
-    mentors = db.query(User).filter(User.role == "mentor").all()
-    for m in mentors:
-        subj_list = [s.strip().lower() for s in (m.subjects or "").split(",") if s.strip()]
+    subject_map = get_subject_map(db)
+    old_keywords = get_keyword_vectors(db)
+    mentors = db.query(User.id, User.subjects).filter(User.role == "mentor").all()
+    for mid, subjects in mentors:
+        subj_list = subject_map.get(mid, ())
         combined = []
         for s in subj_list:
             combined += by_sub.get(s, [])[:10]
-        # dedupe and assign
-        final = ",".join(list(dict.fromkeys([k for k in combined if k])))
+        # dedupe and assign (stored in mentor_keyword_stats)
+        final = list(dict.fromkeys([k for k in combined if k]))
         if final:
-            m.solved_keywords = final
+            replace_keywords(db, mid, final)
+            # stored profile vectors embed the keywords: rebuild them in the same transaction
+            mentor_profiles.reseed_profile(db, mid, subjects, [k for k, _ in old_keywords.get(mid, ())], final)
+    mark_changed(db)
     try:
+        if os.path.exists(ann_index.INDEX_PATH):
+            # from this transaction's vectors, before the commit makes workers reload the file
+            db.flush()
+            ann_index.build_and_save(db)
         db.commit()
+        invalidate()
+        mentor_profiles.invalidate()   # also republishes the shared index
         print("Mentor keywords seeded.")
     except Exception as e:
         db.rollback()
@@ -0,0 +1,271 @@
+# serve.py
+"""
+Production entry point: preload the app once, then fork uvicorn workers.
+
+    python serve.py                              # SERVE_WORKERS workers on :8000
+    python serve.py --workers 4 --port 8080
+    python serve.py --no-preload                 # every worker imports and warms itself
+
+`uvicorn app:app --workers N` starts N fresh interpreters. Each one imports
+the app, runs the migrations and loads the models, subject_vocab.json, YAKE,
+sklearn, the profile vectorizer and the mentor snapshot and index on its own.
+This launcher imports the app and calls warm() in the parent instead. warm()
+runs one read-only match so that every lazy cache is loaded. The parent then
+binds the socket and forks the workers. Each worker starts with everything
+loaded and shares those pages copy-on-write with the parent and its siblings.
+gc.freeze() moves the preloaded objects out of the collector's generations, so
+collections in the workers do not write to (and un-share) their pages.
+
+Signals to the parent:
+  SIGHUP           graceful reload: reload model files, vocab and indexes in the
+                   parent, fork a new set of workers, then stop the old set once
+                   the new one is serving. The socket stays open the whole time,
+                   so no connection is refused. Code changes need a restart.
+  SIGTERM/SIGINT   stop the workers gracefully (in-flight requests finish) and exit.
+A worker that dies is replaced.
+
+Migrations run once in the parent in both modes. Several uvicorn --workers
+processes importing the app on a database that needs a migration step race
+each other through it, and all but one fail.
+
+Per-worker state (match worker threads, SSE subscribers, metrics) is started
+after the fork by the app lifespan, as with uvicorn --workers.
+"""
+import gc
+import os
+import sys
+import time
+import select
+import signal
+import struct
+import argparse
+
+import uvicorn
+
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", "2"))
+SERVE_READY_TIMEOUT = float(os.environ.get("SERVE_READY_TIMEOUT", "120"))
+SERVE_GRACEFUL_SECONDS = int(os.environ.get("SERVE_GRACEFUL_SECONDS", "30"))
+WARM_TEXT = "How do I integrate x sin x by parts?"
+WARM_SUBJECT = "math"
+
+
+def warm():
+    """Load every lazy model, vocab and index the request path uses (read-only) -> seconds taken."""
+    from db import SessionLocal
+    from matching_service import match_question
+    from ml import advanced_matcher, ann_index, mentor_profiles, strategies
+
+    t = time.perf_counter()
+    advanced_matcher.load_model()
+    advanced_matcher._get_automaton()
+    for mode in ("yake", "automaton"):
+        advanced_matcher.extract_keywords(WARM_TEXT, mode=mode)
+    ann_index.load_index()
+    mentor_profiles.load_vectorizer()
+    db = SessionLocal()
+    try:
+        mentor_profiles.get_index(db)
+        # never start shard processes here: forked workers would share their pipes (sharded_matcher)
+        strategy = "profile" if strategies.MATCH_STRATEGY == "sharded" else None
+        match_question(db, WARM_TEXT, WARM_SUBJECT, strategy=strategy)
+    finally:
+        db.close()
+    return time.perf_counter() - t
+
+
+def unwarm():
+    """Drop the caches warm() filled so the next warm() reloads them from disk / the database."""
+    from ml import (advanced_matcher, ann_index, hashed_features, mentor_keywords, mentor_profiles, mentor_snapshot,
+                    mentor_subjects, sharded_matcher)
+
+    advanced_matcher.model = None
+    advanced_matcher._subject_vocab = None
+    advanced_matcher._automaton = None
+    ann_index._index = None
+    mentor_profiles._vectorizer = None
+    hashed_features._features = None   # re-read hashed_idf.npz after `python -m ml.hashed_features update`
+    mentor_profiles._index = None
+    mentor_snapshot.invalidate()
+    mentor_keywords.invalidate()
+    mentor_subjects.invalidate()
+    sharded_matcher.close_pool()
+
+
+def preload():
+    """Import the app (migrations run here) and warm it -> app."""
+    from app import app
+    warm()
+    return app
+
+
+class _Worker(uvicorn.Server):
+    """uvicorn server that reports its pid on the ready pipe once it is serving."""
+
+    def __init__(self, config, ready_fd):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if self.started:
+            os.write(self.ready_fd, struct.pack("i", os.getpid()))
+
+
+class Launcher:
+    def __init__(self, args):
+        self.args = args
+        self.workers = set()      # pids of the serving generation
+        self.retiring = set()     # pids stopping after a reload
+        self.starting = set()     # pids forked by spawn_generation, not yet serving
+        self.app = None
+        self.sock = None
+        self.ready_r, self.ready_w = os.pipe()
+        self.stopping = False
+        self.reload_requested = False
+
+    # -- workers
+    def spawn(self):
+        config = uvicorn.Config(self.app if self.app is not None else "app:app", host=self.args.host,
+                                port=self.args.port, log_level=self.args.log_level,
+                                timeout_graceful_shutdown=SERVE_GRACEFUL_SECONDS)
+        pid = os.fork()
+        if pid:
+            return pid
+        code = 0
+        try:
+            for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            os.close(self.ready_r)
+            # pooled SQLite connections were opened by the parent: never use them across a fork
+            from db import engine
+            engine.dispose(close=False)
+            # (a shard pool the parent started is dropped by sharded_matcher's at-fork hook)
+            if self.app is None:
+                # --no-preload: what every uvicorn --workers process does on its own
+                config.app = preload()
+            _Worker(config, self.ready_w).run(sockets=[self.sock])
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def spawn_generation(self):
+        """Fork args.workers workers and wait until all of them serve -> pids, or None if they did not."""
+        self.starting = {self.spawn() for _ in range(self.args.workers)}
+        pids, ready = set(self.starting), set()
+        deadline = time.monotonic() + SERVE_READY_TIMEOUT
+        while ready != pids and time.monotonic() < deadline and not self.stopping:
+            self.reap()
+            if not pids <= self.starting:
+                break   # one of them exited during startup
+            try:
+                readable, _, _ = select.select([self.ready_r], [], [], 0.5)
+            except InterruptedError:
+                continue
+            if readable:
+                data = os.read(self.ready_r, 4 * len(pids))
+                ready.update(pid for (pid,) in struct.iter_unpack("i", data) if pid in pids)
+        self.starting = set()
+        if ready != pids:
+            self.retiring |= pids
+            self.stop_workers(pids)
+            return None
+        return pids
+
+    def stop_workers(self, pids, sig=signal.SIGTERM):
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def reap(self):
+        """Collect exited workers -> pids of serving workers that died."""
+        died = set()
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if pid in self.workers:
+                died.add(pid)
+            self.workers.discard(pid)
+            self.retiring.discard(pid)
+            self.starting.discard(pid)
+        return died
+
+    # -- lifecycle
+    def start(self):
+        t = time.perf_counter()
+        if not self.args.no_preload:
+            self.app = preload()
+            gc.freeze()
+        else:
+            # workers importing the app concurrently would race each other through the migrations
+            from migrations import run_migrations
+            run_migrations()
+        config = uvicorn.Config("app:app", host=self.args.host, port=self.args.port)
+        self.sock = config.bind_socket()
+        self.workers = self.spawn_generation()
+        if self.workers is None:
+            sys.exit("workers failed to start")
+        print(f"[serve] {len(self.workers)} workers ready in {time.perf_counter() - t:.2f}s "
+              f"({'preloaded' if self.app is not None else 'no preload'}), pids {sorted(self.workers)}",
+              flush=True)
+
+    def reload(self):
+        t = time.perf_counter()
+        if self.app is not None:
+            gc.unfreeze()
+            unwarm()
+            warm()
+            gc.freeze()
+        pids = self.spawn_generation()
+        if pids is None:
+            print("[serve] reload failed: new workers did not start, keeping the old ones", flush=True)
+            return
+        old, self.workers = self.workers, pids
+        self.retiring |= old
+        self.stop_workers(old)
+        print(f"[serve] reloaded in {time.perf_counter() - t:.2f}s, pids {sorted(pids)}", flush=True)
+
+    def run(self):
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stopping", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stopping", True))
+        self.start()
+        while not self.stopping:
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            for pid in self.reap():
+                if not self.stopping:
+                    print(f"[serve] worker {pid} died, replacing it", flush=True)
+                    self.workers.add(self.spawn())
+            time.sleep(0.5)
+        self.stop_workers(self.workers | self.retiring)
+        deadline = time.monotonic() + SERVE_GRACEFUL_SECONDS + 5
+        while (self.workers | self.retiring) and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.stop_workers(self.workers | self.retiring, signal.SIGKILL)
+        print("[serve] stopped", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--log-level", default="warning")
+    ap.add_argument("--no-preload", action="store_true",
+                    help="import and warm the app in every worker (like uvicorn --workers)")
+    Launcher(ap.parse_args()).run()
+
+
+if __name__ == "__main__":
+    main()
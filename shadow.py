@@ -0,0 +1,123 @@
+# shadow.py
+"""
+Shadow runs of a candidate matching strategy (ml/strategies.py) next to the
+primary one, to compare a new engine on real traffic before switching to it.
+
+With SHADOW_STRATEGY set, match_question submits SHADOW_SAMPLE_RATE of the
+matches made with the primary strategy (MATCH_STRATEGY; posts that name their
+own strategy are not sampled): text, subject, the primary's ranking and its
+latency. One background thread per process runs the candidate on its own
+session and records its latency and how far its top-k agrees with the
+primary's:
+
+    overlap@k   |primary top-k & candidate top-k| / k
+    top-1       both put the same mentor first
+
+The response never waits for the candidate and never sees its result.
+Submissions wait in a queue of SHADOW_QUEUE entries; when it is full they are
+dropped (shadow.dropped), so a slow candidate does not pile up work, and only
+one comparison runs at a time.
+
+GET /questions/shadow/stats summarises the last SHADOW_WINDOW comparisons of
+this process. Counters and timings are also on GET /metrics (shadow.*).
+"""
+import os
+import queue
+import random
+import threading
+import time
+import collections
+
+import numpy as np
+
+import metrics
+from db import SessionLocal
+from ml import strategies
+
+SHADOW_STRATEGY = os.environ.get("SHADOW_STRATEGY", "")
+SHADOW_SAMPLE_RATE = float(os.environ.get("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_QUEUE = int(os.environ.get("SHADOW_QUEUE", "100"))
+SHADOW_WINDOW = int(os.environ.get("SHADOW_WINDOW", "1000"))
+SHADOW_TOP_K = 5
+
+_lock = threading.Lock()
+_queue = None
+_pid = None
+_recent = collections.deque(maxlen=SHADOW_WINDOW)   # (primary_ms, candidate_ms, overlap@k, top-1 agrees)
+
+
+def maybe_submit(text: str, subject: str, primary: str, primary_ids, primary_ms: float):
+    """Queue a sampled match made with strategy primary for the candidate; never blocks."""
+    if (not SHADOW_STRATEGY or primary != strategies.MATCH_STRATEGY or SHADOW_STRATEGY == primary
+            or random.random() >= SHADOW_SAMPLE_RATE):
+        return
+    metrics.incr("shadow.sampled")
+    try:
+        _start().put_nowait((text, subject, list(primary_ids)[:SHADOW_TOP_K], primary_ms))
+    except queue.Full:
+        metrics.incr("shadow.dropped")
+
+
+def _start():
+    global _queue, _pid
+    with _lock:
+        if _pid != os.getpid():   # first use, or forked (serve.py) from a process that had the thread
+            _queue, _pid = queue.Queue(SHADOW_QUEUE), os.getpid()
+            threading.Thread(target=_run, args=(_queue,), name="shadow-matcher", daemon=True).start()
+        return _queue
+
+
+def compare(primary_ids, candidate_ids, k: int = SHADOW_TOP_K):
+    """-> (overlap@k, top-1 agrees)"""
+    a, b = list(primary_ids)[:k], list(candidate_ids)[:k]
+    if not a and not b:
+        return 1.0, True
+    return len(set(a) & set(b)) / k, bool(a and b and a[0] == b[0])
+
+
+def _run(jobs):
+    while True:
+        text, subject, primary_ids, primary_ms = jobs.get()
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            found = strategies.match(SHADOW_STRATEGY, text, subject, db, top_k=SHADOW_TOP_K) or []
+            candidate_ms = (time.perf_counter() - start) * 1000
+        except Exception:
+            metrics.incr("shadow.errors")
+            continue
+        finally:
+            db.close()
+        overlap, top1 = compare(primary_ids, [int(e["mentor_id"]) for e in found])
+        metrics.incr("shadow.compared")
+        metrics.observe(f"shadow.{SHADOW_STRATEGY}_ms", candidate_ms)
+        metrics.observe("shadow.overlap_at_k", overlap)
+        with _lock:
+            _recent.append((primary_ms, candidate_ms, overlap, top1))
+
+
+def stats():
+    """Shadow comparison summary of this process (p50 / p99 over the recent window)."""
+    with _lock:
+        recent = list(_recent)
+    out = {
+        "primary": strategies.MATCH_STRATEGY,
+        "candidate": SHADOW_STRATEGY or None,
+        "sample_rate": SHADOW_SAMPLE_RATE,
+        "sampled": metrics.count("shadow.sampled"),
+        "compared": metrics.count("shadow.compared"),
+        "dropped": metrics.count("shadow.dropped"),
+        "errors": metrics.count("shadow.errors"),
+        "window": len(recent),
+    }
+    if recent:
+        primary_ms, candidate_ms, overlap, top1 = (np.asarray(col, dtype=float) for col in zip(*recent))
+        out.update({
+            "primary_p50_ms": round(float(np.percentile(primary_ms, 50)), 3),
+            "primary_p99_ms": round(float(np.percentile(primary_ms, 99)), 3),
+            "candidate_p50_ms": round(float(np.percentile(candidate_ms, 50)), 3),
+            "candidate_p99_ms": round(float(np.percentile(candidate_ms, 99)), 3),
+            "overlap_at_k": round(float(overlap.mean()), 4),
+            "top1_agreement": round(float(top1.mean()), 4),
+        })
+    return out
@@ -0,0 +1,181 @@
+# stats.py
+"""
+Platform stats and mentor leaderboards from incrementally maintained summary tables:
+
+  question_stats       (subject, status) -> count, price_sum, priced
+  mentor_leaderboard   (subject, mentor_id) -> solved, earnings, rating;
+                       subject '*' ranks all mentors (solved = users.solved_count)
+
+Triggers keep both current inside the writing transaction, so every writer
+(post, accept, match workers, match_jobs.fail, seed scripts, raw SQL) updates
+them without code changes. Questions moved by archive.py keep counting.
+GET /stats and GET /mentors/leaderboard read them: a leaderboard is one index
+walk of k rows, platform stats read a few rows per subject.
+
+ensure_stats() creates the triggers and fills the tables the first time (run by
+migrations.py). rebuild() recomputes both tables from the source rows and
+repairs any drift (e.g. rows written before the triggers existed):
+    python stats.py
+"""
+from sqlalchemy import text
+
+from db import SessionLocal
+
+LEADERBOARD_METRICS = ("solved", "earnings", "rating")
+ALL_SUBJECTS = "*"
+
+_SUBJECT = "lower(trim(coalesce({}.subject, '')))"
+
+_ADD_QUESTION = (
+    "INSERT INTO question_stats (subject, status, count, price_sum, priced) "
+    "VALUES (" + _SUBJECT.format("NEW") + ", coalesce(NEW.status, ''), 1, coalesce(NEW.price, 0), "
+    "coalesce(NEW.price > 0, 0)) "
+    "ON CONFLICT(subject, status) DO UPDATE SET count = count + 1, "
+    "price_sum = price_sum + excluded.price_sum, priced = priced + excluded.priced;"
+)
+_REMOVE_QUESTION = (
+    "UPDATE question_stats SET count = count - 1, price_sum = price_sum - coalesce(OLD.price, 0), "
+    "priced = priced - coalesce(OLD.price > 0, 0) "
+    "WHERE subject = " + _SUBJECT.format("OLD") + " AND status = coalesce(OLD.status, '');"
+)
+
+_DDL = {
+    "questions_stats_ai": "AFTER INSERT ON questions BEGIN " + _ADD_QUESTION + " END",
+    "questions_stats_au": "AFTER UPDATE OF status, price, subject ON questions BEGIN "
+                          + _REMOVE_QUESTION + " " + _ADD_QUESTION + " END",
+    # a newly accepted question: +1 solved in its subject
+    "questions_leaderboard_au": (
+        "AFTER UPDATE OF accepted_mentor ON questions "
+        "WHEN OLD.accepted_mentor IS NULL AND NEW.accepted_mentor IS NOT NULL BEGIN "
+        "INSERT INTO mentor_leaderboard (subject, mentor_id, solved, earnings, rating) "
+        "SELECT " + _SUBJECT.format("NEW") + ", u.id, 1, 0, u.rating FROM users u WHERE u.id = NEW.accepted_mentor "
+        "ON CONFLICT(subject, mentor_id) DO UPDATE SET solved = solved + 1; END"),
+    "earnings_leaderboard_ai": (
+        "AFTER INSERT ON earnings_ledger BEGIN "
+        "UPDATE mentor_leaderboard SET earnings = earnings + NEW.amount "
+        "WHERE mentor_id = NEW.mentor_id AND (subject = '*' OR subject = "
+        "(SELECT " + _SUBJECT.format("q") + " FROM questions q WHERE q.id = NEW.question_id)); END"),
+    "users_leaderboard_ai": (
+        "AFTER INSERT ON users WHEN NEW.role = 'mentor' BEGIN "
+        "INSERT OR IGNORE INTO mentor_leaderboard (subject, mentor_id, solved, earnings, rating) "
+        "VALUES ('*', NEW.id, coalesce(NEW.solved_count, 0), 0, NEW.rating); END"),
+    "users_leaderboard_au": (
+        "AFTER UPDATE OF solved_count, rating ON users BEGIN "
+        "UPDATE mentor_leaderboard SET rating = NEW.rating WHERE mentor_id = NEW.id; "
+        "UPDATE mentor_leaderboard SET solved = coalesce(NEW.solved_count, 0) "
+        "WHERE subject = '*' AND mentor_id = NEW.id; END"),
+    "mentor_subjects_leaderboard_ai": (
+        "AFTER INSERT ON mentor_subjects BEGIN "
+        "INSERT OR IGNORE INTO mentor_leaderboard (subject, mentor_id, solved, earnings, rating) "
+        "SELECT lower(trim(NEW.subject)), u.id, 0, 0, u.rating FROM users u WHERE u.id = NEW.mentor_id; END"),
+    "mentor_subjects_leaderboard_ad": (
+        "AFTER DELETE ON mentor_subjects BEGIN "
+        "DELETE FROM mentor_leaderboard WHERE subject = lower(trim(OLD.subject)) "
+        "AND mentor_id = OLD.mentor_id AND solved = 0 AND earnings = 0; END"),
+}
+
+_REBUILD = [
+    "DELETE FROM question_stats",
+    "INSERT INTO question_stats (subject, status, count, price_sum, priced) "
+    "SELECT " + _SUBJECT.format("q") + ", coalesce(q.status, ''), count(*), coalesce(sum(q.price), 0), "
+    "       sum(coalesce(q.price > 0, 0)) "
+    "FROM (SELECT subject, status, price FROM questions "
+    "      UNION ALL SELECT subject, status, price FROM questions_archive) q "
+    "GROUP BY 1, 2",
+
+    "DELETE FROM mentor_leaderboard",
+    # all subjects: users.solved_count (includes accepts from before the ledger) + all earnings
+    "INSERT INTO mentor_leaderboard (subject, mentor_id, solved, earnings, rating) "
+    "SELECT '*', u.id, coalesce(u.solved_count, 0), "
+    "       coalesce((SELECT sum(amount) FROM earnings_ledger l WHERE l.mentor_id = u.id), 0), u.rating "
+    "FROM users u WHERE u.role = 'mentor'",
+    # per subject: subjects taught, plus subjects the mentor accepted questions in
+    "INSERT INTO mentor_leaderboard (subject, mentor_id, solved, earnings, rating) "
+    "SELECT s.subject, u.id, coalesce(a.solved, 0), coalesce(e.earnings, 0), u.rating "
+    "FROM (SELECT lower(trim(subject)) AS subject, mentor_id FROM mentor_subjects "
+    "      UNION SELECT " + _SUBJECT.format("q") + ", accepted_mentor FROM questions q "
+    "            WHERE accepted_mentor IS NOT NULL "
+    "      UNION SELECT " + _SUBJECT.format("q") + ", accepted_mentor FROM questions_archive q "
+    "            WHERE accepted_mentor IS NOT NULL) s "
+    "JOIN users u ON u.id = s.mentor_id "
+    "LEFT JOIN (SELECT " + _SUBJECT.format("q") + " AS subject, accepted_mentor, count(*) AS solved "
+    "           FROM (SELECT subject, accepted_mentor FROM questions "
+    "                 UNION ALL SELECT subject, accepted_mentor FROM questions_archive) q "
+    "           WHERE accepted_mentor IS NOT NULL GROUP BY 1, 2) a "
+    "       ON a.subject = s.subject AND a.accepted_mentor = u.id "
+    "LEFT JOIN (SELECT " + _SUBJECT.format("q") + " AS subject, l.mentor_id, sum(l.amount) AS earnings "
+    "           FROM earnings_ledger l "
+    "           JOIN (SELECT id, subject FROM questions UNION ALL SELECT id, subject FROM questions_archive) q "
+    "             ON q.id = l.question_id "
+    "           GROUP BY 1, 2) e "
+    "       ON e.subject = s.subject AND e.mentor_id = u.id",
+]
+
+
+def _dump(db):
+    # key -> values; sums rounded so float summation order is not reported as drift, and
+    # emptied (subject, status) rows left behind by the triggers count as absent
+    out = {}
+    for table, where in (("question_stats", "count != 0"), ("mentor_leaderboard", "1")):
+        for row in db.execute(text(f"SELECT * FROM {table} WHERE {where}")):
+            out[(table,) + tuple(row[:2])] = tuple(round(v, 6) if isinstance(v, float) else v for v in row[2:])
+    return out
+
+
+def rebuild(db) -> int:
+    """Recompute both summary tables -> number of rows that were missing, wrong or stale. Does not commit."""
+    before = _dump(db)
+    for stmt in _REBUILD:
+        db.execute(text(stmt))
+    after = _dump(db)
+    return sum(1 for key in before.keys() | after.keys() if before.get(key) != after.get(key))
+
+
+def ensure_stats(db) -> bool:
+    """Create the triggers if missing, filling the tables the first time -> True if filled. Does not commit."""
+    existing = {name for (name,) in db.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))}
+    missing = [name for name in _DDL if name not in existing]
+    for name in missing:
+        db.execute(text(f"CREATE TRIGGER {name} {_DDL[name]}"))
+    if missing:
+        rebuild(db)
+    return bool(missing)
+
+
+def platform_stats(db):
+    rows = db.execute(text("SELECT subject, status, count, price_sum, priced FROM question_stats")).all()
+    by_status, by_subject, prices = {}, {}, {}
+    for subject, status, count, price_sum, priced in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        by_subject[subject] = by_subject.get(subject, 0) + count
+        total, n = prices.get(subject, (0.0, 0))
+        prices[subject] = (total + price_sum, n + priced)
+    return {
+        "questions": sum(by_status.values()),
+        "questions_by_status": {s: n for s, n in sorted(by_status.items()) if n},
+        "questions_by_subject": {s: n for s, n in sorted(by_subject.items()) if n},
+        "avg_price_by_subject": {s: round(total / n, 2) for s, (total, n) in sorted(prices.items()) if n},
+    }
+
+
+def leaderboard(db, metric: str = "solved", subject: str = None, limit: int = 10):
+    """Top mentors by metric, overall or in one subject -> [(mentor_id, name, solved, earnings, rating)]."""
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError(f"metric must be one of {LEADERBOARD_METRICS}")
+    subject = (subject or "").strip().lower() or ALL_SUBJECTS
+    return db.execute(text(
+        f"SELECT b.mentor_id, u.name, b.solved, b.earnings, b.rating FROM mentor_leaderboard b "
+        f"INDEXED BY ix_mentor_leaderboard_{metric} JOIN users u ON u.id = b.mentor_id "
+        f"WHERE b.subject = :subject ORDER BY b.{metric} DESC LIMIT :limit"),
+        {"subject": subject, "limit": limit}).all()
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        ensure_stats(db)
+        n = rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"rebuilt question_stats and mentor_leaderboard ({n} rows repaired)")
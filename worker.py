@@ -0,0 +1,145 @@
+# worker.py
+"""
+Background matcher for questions posted in async mode (status "pending_match").
+Workers also fold new earnings_ledger entries into mentor_balances every
+EARNINGS_ROLLUP_SECONDS (earnings.rollup), drop expired idempotency keys
+every IDEMPOTENCY_PURGE_SECONDS (idempotency.purge) and near-duplicate
+signatures past the reuse window every SIGNATURE_TRIM_SECONDS
+(near_duplicates.trim_signatures).
+
+Each worker claims jobs from match_jobs, runs the same pipeline as sync posting
+(matching_service.match_question), stores the result on the question (status
+"matched") and pushes it to the matched mentors' inbox streams.
+
+    python worker.py                  # one worker process
+    python worker.py --processes 4    # four worker processes
+
+The API also runs MATCH_WORKER_THREADS worker threads in-process (app.py), whose
+completions reach SSE subscribers of that process; separate worker processes
+only update the database (visible on GET /questions/{id} and the inbox).
+"""
+import os
+import time
+import socket
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+
+from db import SessionLocal
+from models import Question
+from ml import near_duplicates
+import match_jobs
+import earnings
+import idempotency
+from matching_service import apply_match, match_question, publish_new
+
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "0.5"))
+REQUEUE_EVERY_SECONDS = 30
+
+
+def process_job(db, job_id: int, question_id: int):
+    q = db.query(Question).filter(Question.id == question_id).first()
+    if q is None or q.status != "pending_match":
+        # deleted, or already handled (e.g. re-run after an expired lease)
+        match_jobs.finish(db, job_id)
+        db.commit()
+        return None
+    result = match_question(db, q.text, q.subject)
+    apply_match(q, result)
+    near_duplicates.set_scores(db, q.id, result.ml_scores)
+    match_jobs.finish(db, job_id)
+    db.commit()
+    publish_new(q, result.matched_ids)
+    return q
+
+
+def run_once(db, name: str):
+    """Process one job -> True if a job was claimed."""
+    job = match_jobs.claim(db, name)
+    if job is None:
+        return False
+    job_id, question_id, attempts = job
+    try:
+        process_job(db, job_id, question_id)
+    except Exception:
+        db.rollback()
+        gave_up = match_jobs.fail(db, job_id, attempts, traceback.format_exc(limit=5))
+        print(f"[{name}] job {job_id} (question {question_id}) attempt {attempts} failed"
+              + (", giving up" if gave_up else ", will retry"))
+    return True
+
+
+def run_worker(stop: threading.Event = None, name: str = None):
+    name = name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    stop = stop or threading.Event()
+    db = SessionLocal()
+    last_requeue, last_rollup = 0.0, time.monotonic()
+    last_purge = last_trim = time.monotonic()
+    try:
+        while not stop.is_set():
+            if time.monotonic() - last_requeue > REQUEUE_EVERY_SECONDS:
+                match_jobs.requeue_expired(db)
+                last_requeue = time.monotonic()
+            if time.monotonic() - last_rollup > earnings.EARNINGS_ROLLUP_SECONDS:
+                try:
+                    earnings.rollup(db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    traceback.print_exc()
+                last_rollup = time.monotonic()
+            if time.monotonic() - last_purge > idempotency.IDEMPOTENCY_PURGE_SECONDS:
+                try:
+                    idempotency.purge(db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    traceback.print_exc()
+                last_purge = time.monotonic()
+            if time.monotonic() - last_trim > near_duplicates.SIGNATURE_TRIM_SECONDS:
+                try:
+                    near_duplicates.trim_signatures(db)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    traceback.print_exc()
+                last_trim = time.monotonic()
+            try:
+                busy = run_once(db, name)
+            except Exception:
+                # e.g. "database is locked": back off and keep the worker alive
+                db.rollback()
+                traceback.print_exc()
+                busy = False
+            if not busy:
+                stop.wait(JOB_POLL_SECONDS)
+    finally:
+        db.close()
+
+
+def start_threads(n: int):
+    """Start n daemon worker threads in this process -> stop event."""
+    stop = threading.Event()
+    for i in range(n):
+        threading.Thread(target=run_worker, args=(stop, f"{socket.gethostname()}:{os.getpid()}:t{i}"),
+                         daemon=True, name=f"match-worker-{i}").start()
+    return stop
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--processes", type=int, default=1)
+    args = ap.parse_args()
+    if args.processes <= 1:
+        run_worker()
+        return
+    procs = [mp.Process(target=run_worker) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()